@@ -15,10 +15,13 @@ from decimal import Decimal
 
 from django.http import JsonResponse, HttpRequest
 from django.views.decorators.http import require_GET
-from django.db.models import Q, Min, Max, Avg, Count
+from django.db import connection
+from django.db.models import Q, Count, Prefetch
 from django.conf import settings
 
 from listings.models import Listing, ListingImage
+from listings.search_index import get_snapshot
+from listings.stats import listing_stats
 
 
 def _get_base_url(request: HttpRequest) -> str:
@@ -35,6 +38,51 @@ def _build_image_url(request: HttpRequest, image_path: str) -> str:
     return f"{base}/{media_url}/{image_path}"
 
 
+def _with_visible_images(qs):
+    """Prefetch visible images in gallery order and annotate their count.
+
+    The serializers below read ``visible_image_list`` and
+    ``visible_image_count`` so a page of listings costs two queries no
+    matter how many rows it holds.
+    """
+    return qs.annotate(
+        visible_image_count=Count('images', filter=Q(images__is_visible=True)),
+    ).prefetch_related(
+        Prefetch(
+            'images',
+            queryset=ListingImage.objects.filter(is_visible=True).order_by('order', 'id'),
+            to_attr='visible_image_list',
+        )
+    )
+
+
+def _visible_images(listing: Listing) -> List[ListingImage]:
+    """Visible images of a listing, from the prefetch when available."""
+    images = getattr(listing, 'visible_image_list', None)
+    if images is None:
+        images = list(listing.images.filter(is_visible=True).order_by('order', 'id'))
+    return images
+
+
+class _QueryCounter:
+    """Count SQL statements issued on the default connection."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._wrapper.__exit__(*exc)
+
+
 def _listing_to_full_dict(request: HttpRequest, listing: Listing, include_images: bool = True) -> Dict[str, Any]:
     """Convert a Listing object to a comprehensive dictionary for AI consumption."""
     
@@ -125,9 +173,9 @@ def _listing_to_full_dict(request: HttpRequest, listing: Listing, include_images
     
     # Add images if requested
     if include_images:
-        images = listing.images.filter(is_visible=True).order_by('order', 'id')
+        images = _visible_images(listing)
         data['images'] = {
-            'count': images.count(),
+            'count': len(images),
             'primary': None,
             'gallery': [],
         }
@@ -154,9 +202,10 @@ def _listing_to_summary_dict(request: HttpRequest, listing: Listing) -> Dict[str
     """Convert a Listing to a compact summary for list views."""
     
     # Get primary image
-    primary_img = listing.images.filter(is_visible=True, is_primary=True).first()
-    if not primary_img:
-        primary_img = listing.images.filter(is_visible=True).first()
+    images = _visible_images(listing)
+    primary_img = next((img for img in images if img.is_primary), None)
+    if not primary_img and images:
+        primary_img = images[0]
     
     try:
         from django.urls import reverse
@@ -183,7 +232,7 @@ def _listing_to_summary_dict(request: HttpRequest, listing: Listing) -> Dict[str
         'latitude': listing.latitude,
         'longitude': listing.longitude,
         'primary_image': _build_image_url(request, str(primary_img.image)) if primary_img and primary_img.image else None,
-        'image_count': listing.images.filter(is_visible=True).count(),
+        'image_count': getattr(listing, 'visible_image_count', len(images)),
         'detail_url': detail_url,
     }
 
@@ -215,13 +264,16 @@ def chatbot_listings_search(request: HttpRequest) -> JsonResponse:
     - has_images: 'true' to only return listings with images
     
     Geo Filtering:
-    - lat, lng, radius_km: Find listings within radius of a point
+    - lat, lng, radius_km: Find listings within a great-circle radius of a point
+    - lat, lng, nearest: The k listings closest to a point (ordered by distance)
     - bbox: "minLon,minLat,maxLon,maxLat" bounding box
+    When lat/lng are given every result carries ``distance_km``.
     
     Pagination & Ordering:
     - limit: Max results (default 50, max 200)
     - offset: Skip first N results
-    - order_by: 'price', '-price', 'date', '-date', 'sqft', '-sqft'
+    - order_by: 'price', '-price', 'date', '-date', 'sqft', '-sqft',
+      'distance', '-distance' (distance needs lat/lng)
     
     Output Control:
     - format: 'summary' (default) or 'full'
@@ -238,159 +290,95 @@ def chatbot_listings_search(request: HttpRequest) -> JsonResponse:
         "filters_applied": {...},
         "results": [...]
     }
+
+    With DEBUG on, the X-Queries-Executed header reports how many SQL
+    statements the request issued; it should not grow with ``limit``.
     """
-    
-    qs = Listing.objects.filter(is_published=True)
+
+    with _QueryCounter() as queries:
+        resp = _listings_search(request)
+    if settings.DEBUG:
+        resp['X-Queries-Executed'] = str(queries.count)
+    return resp
+
+
+def _listings_search(request: HttpRequest) -> JsonResponse:
+    snapshot = get_snapshot()
+    q = snapshot.query()
     filters_applied = {}
     
     # Deal Type Filter
     deal_type = request.GET.get('deal_type')
     if deal_type in ['kiralik', 'satis']:
-        qs = qs.filter(deal_type=deal_type)
+        q.equals('deal_type', deal_type)
         filters_applied['deal_type'] = deal_type
     
     # Property Type Filter
     property_type = request.GET.get('property_type')
     if property_type:
-        qs = qs.filter(property_type__icontains=property_type)
+        q.contains('property_type', property_type)
         filters_applied['property_type'] = property_type
     
     # Location Filters
     city = request.GET.get('city')
     if city:
-        qs = qs.filter(city__icontains=city)
+        q.contains('city', city)
         filters_applied['city'] = city
     
     state = request.GET.get('state')
     if state:
-        qs = qs.filter(state__icontains=state)
+        q.contains('state', state)
         filters_applied['state'] = state
     
-    # Price Range
-    try:
-        min_price = request.GET.get('min_price')
-        if min_price:
-            qs = qs.filter(price__gte=int(min_price))
-            filters_applied['min_price'] = int(min_price)
-    except (ValueError, TypeError):
-        pass
-    
-    try:
-        max_price = request.GET.get('max_price')
-        if max_price:
-            qs = qs.filter(price__lte=int(max_price))
-            filters_applied['max_price'] = int(max_price)
-    except (ValueError, TypeError):
-        pass
-    
-    # Bedroom Range
-    try:
-        min_bedrooms = request.GET.get('min_bedrooms')
-        if min_bedrooms:
-            qs = qs.filter(bedrooms__gte=int(min_bedrooms))
-            filters_applied['min_bedrooms'] = int(min_bedrooms)
-    except (ValueError, TypeError):
-        pass
-    
-    try:
-        max_bedrooms = request.GET.get('max_bedrooms')
-        if max_bedrooms:
-            qs = qs.filter(bedrooms__lte=int(max_bedrooms))
-            filters_applied['max_bedrooms'] = int(max_bedrooms)
-    except (ValueError, TypeError):
-        pass
-    
-    # Bathroom Range
-    try:
-        min_bathrooms = request.GET.get('min_bathrooms')
-        if min_bathrooms:
-            qs = qs.filter(bathrooms__gte=int(min_bathrooms))
-            filters_applied['min_bathrooms'] = int(min_bathrooms)
-    except (ValueError, TypeError):
-        pass
-    
-    try:
-        max_bathrooms = request.GET.get('max_bathrooms')
-        if max_bathrooms:
-            qs = qs.filter(bathrooms__lte=int(max_bathrooms))
-            filters_applied['max_bathrooms'] = int(max_bathrooms)
-    except (ValueError, TypeError):
-        pass
-    
-    # Square Footage / M2 Range
-    try:
-        min_sqft = request.GET.get('min_sqft')
-        if min_sqft:
-            qs = qs.filter(sqft__gte=int(min_sqft))
-            filters_applied['min_sqft'] = int(min_sqft)
-    except (ValueError, TypeError):
-        pass
-    
-    try:
-        max_sqft = request.GET.get('max_sqft')
-        if max_sqft:
-            qs = qs.filter(sqft__lte=int(max_sqft))
-            filters_applied['max_sqft'] = int(max_sqft)
-    except (ValueError, TypeError):
-        pass
-    
-    try:
-        min_m2 = request.GET.get('min_m2')
-        if min_m2:
-            qs = qs.filter(m2_net__gte=int(min_m2))
-            filters_applied['min_m2'] = int(min_m2)
-    except (ValueError, TypeError):
-        pass
-    
-    try:
-        max_m2 = request.GET.get('max_m2')
-        if max_m2:
-            qs = qs.filter(m2_net__lte=int(max_m2))
-            filters_applied['max_m2'] = int(max_m2)
-    except (ValueError, TypeError):
-        pass
+    # Numeric ranges: (query param, snapshot column, bound)
+    numeric_filters = [
+        ('min_price', 'price', 'low'),
+        ('max_price', 'price', 'high'),
+        ('min_bedrooms', 'bedrooms', 'low'),
+        ('max_bedrooms', 'bedrooms', 'high'),
+        ('min_bathrooms', 'bathrooms', 'low'),
+        ('max_bathrooms', 'bathrooms', 'high'),
+        ('min_sqft', 'sqft', 'low'),
+        ('max_sqft', 'sqft', 'high'),
+        ('min_m2', 'm2_net', 'low'),
+        ('max_m2', 'm2_net', 'high'),
+    ]
+    for param, field, bound in numeric_filters:
+        try:
+            raw = request.GET.get(param)
+            if raw:
+                value = int(raw)
+                q.between(field, **{bound: value})
+                filters_applied[param] = value
+        except (ValueError, TypeError):
+            pass
     
     # Rooms configuration
     rooms = request.GET.get('rooms')
     if rooms:
-        qs = qs.filter(rooms_text__icontains=rooms)
+        q.contains('rooms_text', rooms)
         filters_applied['rooms'] = rooms
     
     # Boolean Filters
-    furnished = request.GET.get('furnished')
-    if furnished == 'true':
-        qs = qs.filter(furnished=True)
-        filters_applied['furnished'] = True
-    elif furnished == 'false':
-        qs = qs.filter(furnished=False)
-        filters_applied['furnished'] = False
-    
-    elevator = request.GET.get('elevator')
-    if elevator == 'true':
-        qs = qs.filter(elevator=True)
-        filters_applied['elevator'] = True
-    elif elevator == 'false':
-        qs = qs.filter(elevator=False)
-        filters_applied['elevator'] = False
+    for field in ('furnished', 'elevator', 'in_complex'):
+        value = request.GET.get(field)
+        if value == 'true':
+            q.flag(field, True)
+            filters_applied[field] = True
+        elif value == 'false':
+            q.flag(field, False)
+            filters_applied[field] = False
     
     parking = request.GET.get('parking')
     if parking == 'true':
-        qs = qs.exclude(Q(parking_area='') | Q(parking_area__isnull=True))
+        q.flag('has_parking', True)
         filters_applied['parking'] = True
     
-    in_complex = request.GET.get('in_complex')
-    if in_complex == 'true':
-        qs = qs.filter(in_complex=True)
-        filters_applied['in_complex'] = True
-    elif in_complex == 'false':
-        qs = qs.filter(in_complex=False)
-        filters_applied['in_complex'] = False
-    
     # Building Age
     try:
         max_building_age = request.GET.get('max_building_age')
         if max_building_age:
-            qs = qs.filter(building_age__lte=int(max_building_age))
+            q.between('building_age', high=int(max_building_age))
             filters_applied['max_building_age'] = int(max_building_age)
     except (ValueError, TypeError):
         pass
@@ -399,7 +387,7 @@ def chatbot_listings_search(request: HttpRequest) -> JsonResponse:
     try:
         floor = request.GET.get('floor')
         if floor:
-            qs = qs.filter(floor_number=int(floor))
+            q.equals('floor_number', int(floor))
             filters_applied['floor'] = int(floor)
     except (ValueError, TypeError):
         pass
@@ -407,7 +395,7 @@ def chatbot_listings_search(request: HttpRequest) -> JsonResponse:
     # Has Images Filter
     has_images = request.GET.get('has_images')
     if has_images == 'true':
-        qs = qs.filter(images__is_visible=True).distinct()
+        q.has_images()
         filters_applied['has_images'] = True
     
     # Geo Filtering - Bounding Box
@@ -415,39 +403,38 @@ def chatbot_listings_search(request: HttpRequest) -> JsonResponse:
     if bbox:
         try:
             min_lon, min_lat, max_lon, max_lat = [float(x.strip()) for x in bbox.split(',')]
-            qs = qs.filter(
-                latitude__gte=min_lat,
-                latitude__lte=max_lat,
-                longitude__gte=min_lon,
-                longitude__lte=max_lon,
-            )
+            q.within_bbox(min_lon, min_lat, max_lon, max_lat)
             filters_applied['bbox'] = bbox
         except Exception:
             pass
     
-    # Geo Filtering - Radius (approximate using lat/lng degrees)
-    lat = request.GET.get('lat')
-    lng = request.GET.get('lng')
-    radius_km = request.GET.get('radius_km')
-    if lat and lng and radius_km:
+    # Geo Filtering - Great-circle radius and k-nearest around lat/lng
+    center = None
+    try:
+        if request.GET.get('lat') and request.GET.get('lng'):
+            center = (float(request.GET['lat']), float(request.GET['lng']))
+    except (ValueError, TypeError):
+        center = None
+    if center:
+        lat, lng = center
+        geo_center = {'lat': lat, 'lng': lng}
         try:
-            lat = float(lat)
-            lng = float(lng)
-            radius_km = float(radius_km)
-            # Approximate: 1 degree latitude ≈ 111 km
-            lat_delta = radius_km / 111.0
-            # Longitude varies by latitude
-            lng_delta = radius_km / (111.0 * abs(cos(radians(lat))) if lat != 0 else 111.0)
-            
-            qs = qs.filter(
-                latitude__gte=lat - lat_delta,
-                latitude__lte=lat + lat_delta,
-                longitude__gte=lng - lng_delta,
-                longitude__lte=lng + lng_delta,
-            )
-            filters_applied['geo_center'] = {'lat': lat, 'lng': lng, 'radius_km': radius_km}
-        except Exception:
+            radius_km = request.GET.get('radius_km')
+            if radius_km:
+                q.within_radius(lat, lng, float(radius_km))
+                geo_center['radius_km'] = float(radius_km)
+        except (ValueError, TypeError):
+            pass
+        try:
+            nearest = request.GET.get('nearest')
+            if nearest and int(nearest) > 0:
+                q.nearest(lat, lng, int(nearest))
+                filters_applied['nearest'] = int(nearest)
+        except (ValueError, TypeError):
             pass
+        if 'radius_km' not in geo_center and 'nearest' not in filters_applied:
+            q.with_distance_from(lat, lng)
+        filters_applied['geo_center'] = geo_center
     
     # Ordering
     order_by = request.GET.get('order_by', '-list_date')
@@ -461,14 +448,18 @@ def chatbot_listings_search(request: HttpRequest) -> JsonResponse:
         'bedrooms': 'bedrooms',
         '-bedrooms': '-bedrooms',
     }
+    if center:
+        order_map.update({'distance': 'distance', '-distance': '-distance'})
     if order_by in order_map:
-        qs = qs.order_by(order_map[order_by])
+        order_field = order_map[order_by]
         filters_applied['order_by'] = order_by
+    elif 'nearest' in filters_applied:
+        order_field = 'distance'
     else:
-        qs = qs.order_by('-list_date')
+        order_field = '-list_date'
     
     # Get total count before pagination
-    total_count = qs.count()
+    total_count = q.count()
     
     # Pagination
     try:
@@ -481,7 +472,14 @@ def chatbot_listings_search(request: HttpRequest) -> JsonResponse:
     except (ValueError, TypeError):
         offset = 0
     
-    qs = qs[offset:offset + limit]
+    page_ids = q.ids(
+        order_field.lstrip('-'),
+        descending=order_field.startswith('-'),
+        offset=max(offset, 0),
+        limit=max(limit, 0),
+    )
+    by_id = _with_visible_images(Listing.objects.filter(is_published=True)).in_bulk(page_ids)
+    qs = [by_id[pk] for pk in page_ids if pk in by_id]
     
     # Format output
     output_format = request.GET.get('format', 'summary')
@@ -492,6 +490,12 @@ def chatbot_listings_search(request: HttpRequest) -> JsonResponse:
     else:
         results = [_listing_to_summary_dict(request, listing) for listing in qs]
     
+    if center:
+        distances = q.distances_km()
+        for item in results:
+            distance = distances.get(item['id'])
+            item['distance_km'] = round(distance, 3) if distance is not None else None
+    
     response_data = {
         'success': True,
         'count': total_count,
@@ -507,6 +511,7 @@ def chatbot_listings_search(request: HttpRequest) -> JsonResponse:
     resp['Access-Control-Allow-Origin'] = '*'
     resp['Access-Control-Allow-Methods'] = 'GET'
     resp['Access-Control-Allow-Headers'] = 'Content-Type'
+    resp['X-Listing-Index-Version'] = str(snapshot.version)
     return resp
 
 
@@ -524,7 +529,7 @@ def chatbot_listing_detail(request: HttpRequest, pk: int) -> JsonResponse:
     Returns full listing data including all fields and images.
     """
     try:
-        listing = Listing.objects.get(pk=pk, is_published=True)
+        listing = _with_visible_images(Listing.objects.filter(is_published=True)).get(pk=pk)
     except Listing.DoesNotExist:
         resp = JsonResponse({
             'success': False,
@@ -554,107 +559,18 @@ def chatbot_listings_stats(request: HttpRequest) -> JsonResponse:
     - city: Filter stats by city
     
     Returns aggregate statistics useful for AI to understand the inventory.
+    Price buckets come from settings.LISTING_STATS_PRICE_BUCKETS.
     """
-    qs = Listing.objects.filter(is_published=True)
-    
     # Optional filters
     deal_type = request.GET.get('deal_type')
-    if deal_type in ['kiralik', 'satis']:
-        qs = qs.filter(deal_type=deal_type)
-    
     city = request.GET.get('city')
-    if city:
-        qs = qs.filter(city__icontains=city)
-    
-    # Aggregate stats
-    stats = qs.aggregate(
-        total_count=Count('id'),
-        min_price=Min('price'),
-        max_price=Max('price'),
-        avg_price=Avg('price'),
-        min_sqft=Min('sqft'),
-        max_sqft=Max('sqft'),
-        avg_sqft=Avg('sqft'),
-        min_bedrooms=Min('bedrooms'),
-        max_bedrooms=Max('bedrooms'),
-    )
-    
-    # Count by deal type
-    by_deal_type = list(
-        Listing.objects.filter(is_published=True)
-        .values('deal_type')
-        .annotate(count=Count('id'))
-    )
-    
-    # Count by city (top 10)
-    by_city = list(
-        qs.values('city')
-        .annotate(count=Count('id'))
-        .order_by('-count')[:10]
-    )
-    
-    # Count by property type
-    by_property_type = list(
-        qs.exclude(property_type='')
-        .values('property_type')
-        .annotate(count=Count('id'))
-        .order_by('-count')[:10]
-    )
-    
-    # Count by bedroom count
-    by_bedrooms = list(
-        qs.values('bedrooms')
-        .annotate(count=Count('id'))
-        .order_by('bedrooms')
-    )
-    
-    # Price ranges
-    price_ranges = {
-        'under_10k': qs.filter(price__lt=10000).count(),
-        '10k_25k': qs.filter(price__gte=10000, price__lt=25000).count(),
-        '25k_50k': qs.filter(price__gte=25000, price__lt=50000).count(),
-        '50k_100k': qs.filter(price__gte=50000, price__lt=100000).count(),
-        '100k_250k': qs.filter(price__gte=100000, price__lt=250000).count(),
-        '250k_500k': qs.filter(price__gte=250000, price__lt=500000).count(),
-        '500k_1m': qs.filter(price__gte=500000, price__lt=1000000).count(),
-        'over_1m': qs.filter(price__gte=1000000).count(),
-    }
-    
-    # Features availability
-    features = {
-        'with_elevator': qs.filter(elevator=True).count(),
-        'furnished': qs.filter(furnished=True).count(),
-        'in_complex': qs.filter(in_complex=True).count(),
-        'with_parking': qs.exclude(Q(parking_area='') | Q(parking_area__isnull=True)).count(),
-        'with_images': qs.filter(images__is_visible=True).distinct().count(),
-        'with_coordinates': qs.exclude(Q(latitude__isnull=True) | Q(longitude__isnull=True)).count(),
-    }
     
     response_data = {
         'success': True,
-        'statistics': {
-            'total_listings': stats['total_count'],
-            'price': {
-                'min': stats['min_price'],
-                'max': stats['max_price'],
-                'avg': round(stats['avg_price']) if stats['avg_price'] else None,
-                'ranges': price_ranges,
-            },
-            'size': {
-                'min_sqft': stats['min_sqft'],
-                'max_sqft': stats['max_sqft'],
-                'avg_sqft': round(stats['avg_sqft']) if stats['avg_sqft'] else None,
-            },
-            'bedrooms': {
-                'min': stats['min_bedrooms'],
-                'max': stats['max_bedrooms'],
-                'distribution': by_bedrooms,
-            },
-            'by_deal_type': by_deal_type,
-            'by_city': by_city,
-            'by_property_type': by_property_type,
-            'features': features,
-        },
+        'statistics': listing_stats(
+            deal_type=deal_type if deal_type in ['kiralik', 'satis'] else None,
+            city=city or None,
+        ),
         'filters_applied': {
             'deal_type': deal_type,
             'city': city,
@@ -753,12 +669,13 @@ def chatbot_api_docs(request: HttpRequest) -> JsonResponse:
                     },
                     'geo': {
                         'bbox': 'Bounding box: minLon,minLat,maxLon,maxLat',
-                        'lat/lng/radius_km': 'Center point and radius for proximity search',
+                        'lat/lng/radius_km': 'Center point and great-circle radius for proximity search',
+                        'lat/lng/nearest': 'Center point and number of closest listings to return',
                     },
                     'pagination': {
                         'limit': 'Max results (default 50, max 200)',
                         'offset': 'Skip first N results',
-                        'order_by': "Sort by: 'price', '-price', 'date', '-date', 'sqft', '-sqft'",
+                        'order_by': "Sort by: 'price', '-price', 'date', '-date', 'sqft', '-sqft', 'distance' (needs lat/lng)",
                     },
                     'output': {
                         'format': "'summary' (default) or 'full'",
@@ -821,8 +738,6 @@ def chatbot_api_docs(request: HttpRequest) -> JsonResponse:
     return resp
 
 
-# Import math functions for geo calculations
-from math import cos, radians
 import os
 
 
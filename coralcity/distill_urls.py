@@ -55,7 +55,7 @@ urlpatterns = [
                  name='new_map_simplified'),
     # Generate static JSON for map data so the map works on the static site
     distill_path('listings/map-data/',
-                 listing_views.map_data,
+                 listing_views.map_data_static,
                  name='listings_map_data'),
     distill_path('new/404-preview/',
                  TemplateView.as_view(template_name='newfrontend/page-404.html'),
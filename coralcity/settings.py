@@ -280,3 +280,53 @@ THUMBNAIL_BASEDIR = 'thumbnails'
 THUMBNAIL_DEFAULT_OPTIONS = {
     'quality': 85,
 }
+
+# Lower bounds (TL) between the price buckets reported by /api/bot/stats
+LISTING_STATS_PRICE_BUCKETS = [10000, 25000, 50000, 100000, 250000, 500000, 1000000]
+
+# Server-side map clustering (/listings/map-tiles/<z>/<x>/<y>.json): clusters
+# are merged within this many pixels up to this zoom; deeper zooms return
+# individual listings.
+LISTING_MAP_CLUSTER_MAX_ZOOM = 15
+LISTING_MAP_CLUSTER_RADIUS = 60
+
+# Sources for the nearest-amenity engine behind /listings/<id>/map-data/
+AMENITY_CONTEXTS_DIR = os.path.join(BASE_DIR, 'templates', 'newfrontend', 'mapstandalone', 'contexts')
+AMENITY_MALLS_PARKS_CSV = os.path.join(BASE_DIR, 'mallsnparks.csv')
+
+# Entries kept in the in-memory LRU of parsed pre-generated map files
+LISTING_MAP_FILE_CACHE_SIZE = 64
+
+# Lifetime (seconds) of the cached listing detail blocks. A change to the
+# listing or its images gives them a new key (Listing.updated_at) right
+# away; the timeout only bounds how long superseded blocks stay cached
+LISTING_DETAIL_FRAGMENT_TIMEOUT = 24 * 3600
+
+# One JSONL journal per import run (for --resume <run_id>), and the
+# on-disk cache of fetched listing pages used with --cache; cached pages
+# older than the TTL (seconds) are fetched again
+LISTING_IMPORT_RUNS_DIR = os.path.join(BASE_DIR, 'listings', 'import_runs')
+LISTING_FETCH_CACHE_DIR = os.path.join(BASE_DIR, 'listings', 'fetch_cache')
+LISTING_FETCH_CACHE_TTL = 7 * 24 * 3600
+
+# Geocode queue worker (process_geocode_queue): Nominatim allows one request
+# per second; failed lookups are retried up to LISTING_GEOCODE_MAX_ATTEMPTS
+LISTING_GEOCODER_USER_AGENT = 'coralcity_geocoder'
+LISTING_GEOCODE_MIN_DELAY = 1.0
+LISTING_GEOCODE_MAX_ATTEMPTS = 3
+# Resolved addresses are cached in GeocodeCache for good; addresses the
+# provider could not find are asked again after this many seconds
+LISTING_GEOCODE_NEGATIVE_TTL = 7 * 24 * 3600
+# Offline gazetteer for geocode_missing_listings --provider gazetteer: path
+# to a CSV of city,district,neighborhood,latitude,longitude rows. None ships
+# with the repo; without one, --provider gazetteer needs --gazetteer PATH
+LISTING_GEOCODE_GAZETTEER = None
+
+# Saved listing photos get every THUMBNAIL_ALIASES rendition generated after
+# commit (listings.thumbnails). 0 renders them in one background thread of
+# the saving process. N > 0 starts N worker processes in EVERY process that
+# saves photos (each gunicorn worker, each import command), and each one
+# loads Django and Pillow: budget roughly 90 MB of RAM per worker process.
+# Backfills use generate_thumbnails, which has its own --workers pool
+LISTING_THUMBNAILS_ON_SAVE = True
+LISTING_THUMBNAIL_WORKERS = 0
@@ -8,9 +8,11 @@ from django.utils import timezone
 from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.core.management import call_command
-from .models import Listing, ListingImage, ListingImportJob
+from .models import GeocodeCache, GeocodeTask, Listing, ListingImage, ListingImportJob
 from .importer import start_import_job_async
+from . import fragments, search_index
 from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
 from django.http import JsonResponse, Http404
 from django.urls import path, reverse
 from django.core.files.base import ContentFile
@@ -154,14 +156,14 @@ class ListingImageAdmin(admin.ModelAdmin):
             try:
                 if not getattr(img, 'image', None):
                     continue
-                add_logo_watermark_to_file(
-                    img.image.path,
+                img.rewrite_image(lambda path: add_logo_watermark_to_file(
+                    path,
                     logo_path,
                     position=pos,
                     opacity=opacity,
                     scale=scale,
                     margin_px=margin,
-                )
+                ))
                 try:
                     from easy_thumbnails.files import get_thumbnailer
                     get_thumbnailer(img.image).delete_thumbnails()
@@ -248,7 +250,7 @@ class ListingImageAdmin(admin.ModelAdmin):
         if not content:
             return JsonResponse({'ok': False, 'error': 'No image data'}, status=400)
 
-        # Overwrite existing file keeping same storage path
+        # Stored as a new content-addressed blob; the old one is released on save
         storage_name = obj.image.name or f'photos/listing_{obj.listing_id}/edited.png'
         try:
             obj.image.save(storage_name, ContentFile(content), save=True)
@@ -263,12 +265,18 @@ class ListingImageAdmin(admin.ModelAdmin):
             return JsonResponse({'ok': False, 'error': str(e)}, status=500)
 
     def make_visible(self, request, queryset):
+        listing_ids = list(queryset.values_list('listing_id', flat=True))
         updated = queryset.update(is_visible=True)
+        search_index.mark_stale()
+        fragments.invalidate_listings(listing_ids)
         self.message_user(request, _("Marked %d images as visible") % updated)
     make_visible.short_description = _('Mark selected images as visible')
 
     def make_hidden(self, request, queryset):
+        listing_ids = list(queryset.values_list('listing_id', flat=True))
         updated = queryset.update(is_visible=False)
+        search_index.mark_stale()
+        fragments.invalidate_listings(listing_ids)
         self.message_user(request, _("Marked %d images as hidden") % updated)
     make_hidden.short_description = _('Mark selected images as hidden')
 
@@ -308,7 +316,7 @@ class ListingImageAdmin(admin.ModelAdmin):
             try:
                 if not getattr(img, 'image', None):
                     continue
-                process_image(img.image.path, opts)
+                img.rewrite_image(lambda path: process_image(path, opts))
                 try:
                     get_thumbnailer(img.image).delete_thumbnails()
                 except Exception:
@@ -333,7 +341,7 @@ class ListingImageAdmin(admin.ModelAdmin):
             try:
                 if not getattr(img, 'image', None):
                     continue
-                add_corner_triangle_to_file(img.image.path, corner='bottom_left', size_ratio=size_ratio, color=color, opacity=opacity)
+                img.rewrite_image(lambda path: add_corner_triangle_to_file(path, corner='bottom_left', size_ratio=size_ratio, color=color, opacity=opacity))
                 try:
                     from easy_thumbnails.files import get_thumbnailer
                     get_thumbnailer(img.image).delete_thumbnails()
@@ -442,8 +450,10 @@ class ListingImportJobAdmin(admin.ModelAdmin):
     list_filter = ('status', 'realtor')
     search_fields = ('id', 'realtor__name', 'created_by__username', 'single_url')
     readonly_fields = (
-        'status', 'log', 'created_at', 'started_at', 'finished_at', 'created_by', 'effective_csv_path'
+        'status', 'log_output', 'created_at', 'started_at', 'finished_at', 'created_by', 'effective_csv_path'
     )
+    # Lines shown on the change page; the page then follows the tail endpoint.
+    log_tail_lines = 500
     fieldsets = (
         (_("Source"), {
             'fields': ('realtor', 'single_url', 'csv_file', 'cookie_file')
@@ -452,10 +462,50 @@ class ListingImportJobAdmin(admin.ModelAdmin):
             'fields': ('delay', 'debug', 'skip_geocode', 'headed', 'images_max', 'no_images')
         }),
         (_("Execution"), {
-            'fields': ('status', 'effective_csv_path', 'created_by', 'created_at', 'started_at', 'finished_at', 'log')
+            'fields': ('status', 'effective_csv_path', 'created_by', 'created_at', 'started_at', 'finished_at', 'log_output')
         }),
     )
 
+    def get_urls(self):
+        urls = super().get_urls()
+        custom = [
+            path('<int:pk>/log/', self.admin_site.admin_view(self.log_tail_view), name='listings_listingimportjob_log'),
+        ]
+        return custom + urls
+
+    def log_tail_view(self, request, pk):
+        """JSON lines logged after ``?after=<line id>``, for following a running job."""
+        obj = self.get_object(request, pk)
+        if obj is None or not self.has_view_permission(request, obj):
+            return JsonResponse({'ok': False, 'error': 'Not found'}, status=404)
+        try:
+            after = max(0, int(request.GET.get('after') or 0))
+        except ValueError:
+            after = 0
+        rows = list(obj.log_lines.filter(id__gt=after).order_by('id').values_list('id', 'text')[:1000])
+        return JsonResponse({
+            'ok': True,
+            'status': obj.status,
+            'finished': obj.finished_at is not None,
+            'last': rows[-1][0] if rows else after,
+            'lines': [text for _, text in rows],
+        })
+
+    def log_output(self, obj):
+        if obj is None or obj.pk is None:
+            return ''
+        rows = list(obj.log_lines.order_by('-id').values_list('id', 'text')[:self.log_tail_lines])
+        rows.reverse()
+        return render_to_string('admin/listings/import_job_log.html', {
+            'legacy_log': obj.log or '',
+            'text': '\n'.join(text for _, text in rows),
+            'last': rows[-1][0] if rows else 0,
+            'truncated': len(rows) == self.log_tail_lines,
+            'tail_url': reverse('admin:listings_listingimportjob_log', args=[obj.pk]),
+            'follow': obj.finished_at is None,
+        })
+    log_output.short_description = _('Log')
+
     def effective_csv_path(self, obj):
         return getattr(obj, 'csv_path_cached', '') or ''
     effective_csv_path.short_description = _('CSV path used')
@@ -479,3 +529,24 @@ class ListingImportJobAdmin(admin.ModelAdmin):
                 self.message_user(request, _("Import job started."), level=messages.INFO)
             except Exception as e:
                 self.message_user(request, _("Failed to start job: %s") % e, level=messages.ERROR)
+
+
+@admin.register(GeocodeTask)
+class GeocodeTaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'listing', 'status', 'attempts', 'query', 'updated_at')
+    list_filter = ('status',)
+    search_fields = ('query', 'listing__title', 'listing__id')
+    readonly_fields = ('listing', 'query', 'attempts', 'last_error', 'created_at', 'updated_at')
+    actions = ['requeue']
+
+    @admin.action(description=_("Queue selected tasks again"))
+    def requeue(self, request, queryset):
+        n = queryset.update(status=GeocodeTask.PENDING, attempts=0, last_error='')
+        self.message_user(request, _("%d task(s) queued.") % n, level=messages.SUCCESS)
+
+
+@admin.register(GeocodeCache)
+class GeocodeCacheAdmin(admin.ModelAdmin):
+    list_display = ('key', 'latitude', 'longitude', 'provider', 'updated_at')
+    list_filter = ('provider',)
+    search_fields = ('key', 'query')
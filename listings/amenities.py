@@ -0,0 +1,299 @@
+"""Nearest-amenity engine for listing maps.
+
+The pre-generated ``newfrontend/maps/listing_<id>*.html`` files each embed
+a ``const DATA`` blob with the transit stops, shops and lines closest to
+the listing. This module computes the same structure on demand: amenity
+sets are loaded once from the exported context JSONs and
+``mallsnparks.csv``, indexed in :class:`listings.geo.GridIndex` grids, and
+queried per listing in a few milliseconds.
+
+Note that the exported contexts only carry the amenities that were near
+some already-exported listing, so coverage grows as more contexts are
+exported.
+"""
+
+from __future__ import annotations
+
+import csv
+import glob
+import json
+import math
+import os
+import threading
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from .geo import EARTH_RADIUS_KM, GridIndex, haversine_km
+
+try:
+    from geographiclib.geodesic import Geodesic
+except Exception:
+    Geodesic = None
+
+
+class Category(NamedTuple):
+    name: str          # key in the exported context JSONs
+    data_key: str      # key in the map DATA object
+    distance_key: str  # key in DATA['nearest_distances_m']
+    limit: int
+    max_distance_m: float
+    kind: str = 'point'
+
+
+# Limits and radii mirror what the exported map files contain.
+CATEGORIES = (
+    Category('metro', 'closest_stations', 'metro_m', 6, 10000),
+    Category('metrobus', 'closest_metrobus', 'metrobus_m', 6, 10000),
+    Category('bus', 'closest_bus_stops', 'bus_m', 8, 10000),
+    Category('grocery', 'closest_grocery_stores', 'grocery_m', 6, 10000),
+    Category('clothing', 'closest_clothing_stores', 'clothing_m', 4, 1200),
+    Category('malls', 'closest_malls', 'malls_m', 6, 12000),
+    Category('parks', 'closest_parks', 'parks_m', 7, 15000),
+    Category('taxi', 'taxi', 'taxi_m', 10, 8000),
+    Category('minibus', 'minibus', 'minibus_m', 10, 10000, 'line'),
+    Category('bicycle', 'bicycle', 'bicycle_m', 10, 10000, 'line'),
+)
+
+_M_PER_DEGREE = math.pi / 180.0 * EARTH_RADIUS_KM * 1000.0
+
+
+def geodesic_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """WGS84 distance in metres (the exported files used ellipsoidal distances)."""
+    if Geodesic is not None:
+        return Geodesic.WGS84.Inverse(lat1, lng1, lat2, lng2)['s12']
+    return float(haversine_km(lat1, lng1, np.array([lat2]), np.array([lng2]))[0]) * 1000.0
+
+
+class PointLayer:
+    """Named points of one amenity category, grid-indexed."""
+
+    def __init__(self, items: List[Dict[str, Any]]):
+        self.items = items
+        self.lats = np.array([it['lat'] for it in items], dtype=np.float64)
+        self.lngs = np.array([it['lng'] for it in items], dtype=np.float64)
+        self.grid = GridIndex()
+        self.grid.add_many(range(len(items)), self.lats, self.lngs)
+
+    def nearest(self, lat: float, lng: float, limit: int, max_distance_m: float) -> List[Dict[str, Any]]:
+        rows = self.grid.candidates(lat, lng, max_distance_m * 1.01 / 1000.0)
+        if not len(rows):
+            return []
+        distances = haversine_km(lat, lng, self.lats[rows], self.lngs[rows]) * 1000.0
+        # Haversine and WGS84 distances differ by well under 1%, so the
+        # spherical distance is a safe pre-filter for the exact cut-off.
+        keep = distances <= max_distance_m * 1.01
+        rows, distances = rows[keep], distances[keep]
+        order = np.argsort(distances, kind='stable')
+        results = []
+        for i, approx in zip(rows[order], distances[order]):
+            if len(results) >= limit and approx > results[limit - 1]['distance_m'] * 1.01:
+                break
+            item = self.items[i]
+            distance = round(geodesic_m(lat, lng, item['lat'], item['lng']), 8)
+            if distance > max_distance_m:
+                continue
+            results.append({
+                'id': item['id'],
+                'name': item['name'],
+                'distance_m': distance,
+                'location': {'type': 'Point', 'coordinates': [item['lng'], item['lat']]},
+            })
+            results.sort(key=lambda r: r['distance_m'])
+        return results[:limit]
+
+
+class LineLayer:
+    """Line features (routes, paths) indexed by segment midpoints."""
+
+    def __init__(self, items: List[Dict[str, Any]]):
+        self.items = items
+        owners, ax, ay, bx, by = [], [], [], [], []
+        for index, item in enumerate(items):
+            for part in _line_parts(item['geometry']):
+                for (x0, y0), (x1, y1) in zip(part, part[1:]):
+                    owners.append(index)
+                    ax.append(x0)
+                    ay.append(y0)
+                    bx.append(x1)
+                    by.append(y1)
+        self.owner = np.array(owners, dtype=np.int64)
+        self.ax, self.ay = np.array(ax, dtype=np.float64), np.array(ay, dtype=np.float64)
+        self.bx, self.by = np.array(bx, dtype=np.float64), np.array(by, dtype=np.float64)
+        # Any point of a segment lies within half its length of the midpoint
+        # (measured in degrees, which over-estimates east-west extents).
+        self.pad_km = 0.0
+        if len(self.owner):
+            half_degrees = np.hypot(self.bx - self.ax, self.by - self.ay).max() / 2.0
+            self.pad_km = float(half_degrees) * _M_PER_DEGREE / 1000.0
+        self.grid = GridIndex()
+        self.grid.add_many(range(len(self.owner)), (self.ay + self.by) / 2.0, (self.ax + self.bx) / 2.0)
+
+    def nearest(self, lat: float, lng: float, limit: int, max_distance_m: float) -> Tuple[List[Dict[str, Any]], Optional[float]]:
+        """The closest ``limit`` lines and the distance to the closest one."""
+        segs = self.grid.candidates(lat, lng, max_distance_m / 1000.0 + self.pad_km)
+        if not len(segs):
+            return [], None
+        # Local equirectangular projection around the listing, in metres.
+        kx = math.cos(math.radians(lat)) * _M_PER_DEGREE
+        ax = (self.ax[segs] - lng) * kx
+        ay = (self.ay[segs] - lat) * _M_PER_DEGREE
+        dx = (self.bx[segs] - lng) * kx - ax
+        dy = (self.by[segs] - lat) * _M_PER_DEGREE - ay
+        length2 = dx * dx + dy * dy
+        t = np.clip(-(ax * dx + ay * dy) / np.where(length2 == 0, 1.0, length2), 0.0, 1.0)
+        distances = np.hypot(ax + t * dx, ay + t * dy)
+
+        per_line: Dict[int, float] = {}
+        for owner, distance in zip(self.owner[segs].tolist(), distances.tolist()):
+            if distance < per_line.get(owner, math.inf):
+                per_line[owner] = distance
+        ranked = sorted((d, i) for i, d in per_line.items() if d <= max_distance_m)
+        if not ranked:
+            return [], None
+        results = [
+            {'id': self.items[i]['id'], 'name': self.items[i]['name'], 'geometry': self.items[i]['geometry']}
+            for _, i in ranked[:limit]
+        ]
+        return results, ranked[0][0]
+
+
+def _line_parts(geometry: Dict[str, Any]) -> List[List[List[float]]]:
+    if geometry.get('type') == 'LineString':
+        return [geometry['coordinates']]
+    if geometry.get('type') == 'MultiLineString':
+        return geometry['coordinates']
+    return []
+
+
+def _parse_coord(value: str) -> Optional[float]:
+    try:
+        return float(str(value).strip().rstrip('°'))
+    except ValueError:
+        return None
+
+
+def _read_malls_and_parks(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Parse ``mallsnparks.csv``: blank rows separate groups, the last group is parks."""
+    groups: List[List[Tuple[str, float, float]]] = [[]]
+    with open(path, encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # header
+        for row in reader:
+            name = (row[0] if row else '').strip()
+            lat = _parse_coord(row[1]) if len(row) > 1 else None
+            lng = _parse_coord(row[2]) if len(row) > 2 else None
+            if not name or lat is None or lng is None:
+                if groups[-1]:
+                    groups.append([])
+                continue
+            groups[-1].append((name, lat, lng))
+    groups = [g for g in groups if g]
+    named = {'malls': [row for g in groups[:-1] for row in g], 'parks': groups[-1] if groups else []}
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    for category, rows in named.items():
+        seen, items = set(), []
+        for name, lat, lng in rows:
+            if name in seen:
+                continue
+            seen.add(name)
+            items.append({'id': len(items) + 1, 'name': name, 'lat': lat, 'lng': lng})
+        out[category] = items
+    return out
+
+
+def _iter_contexts(contexts_dir: str) -> Iterable[Dict[str, Any]]:
+    for path in sorted(glob.glob(os.path.join(contexts_dir, '*.json'))):
+        try:
+            with open(path, encoding='utf-8') as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for context in payload if isinstance(payload, list) else [payload]:
+            if isinstance(context, dict) and 'listing' in context:
+                yield context
+
+
+class AmenityEngine:
+    """Per-category amenity layers plus the DATA builder."""
+
+    def __init__(self, points: Dict[str, List[Dict[str, Any]]], lines: Dict[str, List[Dict[str, Any]]],
+                 fingerprint: str = ''):
+        self.fingerprint = fingerprint
+        self.layers: Dict[str, Any] = {}
+        for category in CATEGORIES:
+            if category.kind == 'line':
+                self.layers[category.name] = LineLayer(lines.get(category.name, []))
+            else:
+                self.layers[category.name] = PointLayer(points.get(category.name, []))
+
+    @classmethod
+    def from_sources(cls, contexts_dir: str, malls_csv: Optional[str] = None) -> 'AmenityEngine':
+        points: Dict[str, Dict[Any, Dict[str, Any]]] = {}
+        lines: Dict[str, Dict[Any, Dict[str, Any]]] = {}
+        stamps = []
+        if malls_csv and os.path.exists(malls_csv):
+            stamps.append(os.path.getmtime(malls_csv))
+            for category, items in _read_malls_and_parks(malls_csv).items():
+                bucket = points.setdefault(category, {})
+                for item in items:
+                    bucket[(item['id'], item['name'], round(item['lat'], 5), round(item['lng'], 5))] = item
+        if os.path.isdir(contexts_dir):
+            stamps.extend(os.path.getmtime(p) for p in glob.glob(os.path.join(contexts_dir, '*.json')))
+        for context in _iter_contexts(contexts_dir):
+            for category in CATEGORIES:
+                for entry in context.get(category.name) or []:
+                    if category.kind == 'line':
+                        geometry = entry.get('geometry') or {}
+                        key = (entry.get('id'), entry.get('name'), json.dumps(geometry.get('coordinates')))
+                        lines.setdefault(category.name, {})[key] = {
+                            'id': entry.get('id'), 'name': entry.get('name'), 'geometry': geometry,
+                        }
+                        continue
+                    coords = (entry.get('location') or {}).get('coordinates') or []
+                    if len(coords) != 2:
+                        continue
+                    lng, lat = float(coords[0]), float(coords[1])
+                    key = (entry.get('id'), entry.get('name'), round(lat, 5), round(lng, 5))
+                    points.setdefault(category.name, {}).setdefault(key, {
+                        'id': entry.get('id'), 'name': entry.get('name'), 'lat': lat, 'lng': lng,
+                    })
+        fingerprint = str(int(max(stamps))) if stamps else ''
+        return cls(
+            {name: list(items.values()) for name, items in points.items()},
+            {name: list(items.values()) for name, items in lines.items()},
+            fingerprint=fingerprint,
+        )
+
+    def nearby(self, lat: float, lng: float) -> Dict[str, Any]:
+        """Closest amenities of every category plus ``nearest_distances_m``."""
+        data: Dict[str, Any] = {}
+        nearest: Dict[str, Optional[float]] = {}
+        for category in CATEGORIES:
+            layer = self.layers[category.name]
+            if category.kind == 'line':
+                items, closest = layer.nearest(lat, lng, category.limit, category.max_distance_m)
+            else:
+                items = layer.nearest(lat, lng, category.limit, category.max_distance_m)
+                closest = items[0]['distance_m'] if items else None
+            data[category.data_key] = items
+            nearest[category.distance_key] = closest
+        data['nearest_distances_m'] = nearest
+        return data
+
+
+_lock = threading.Lock()
+_engine: Optional[AmenityEngine] = None
+
+
+def get_amenity_engine() -> AmenityEngine:
+    """The process-wide engine, loaded from the configured sources on first use."""
+    global _engine
+    with _lock:
+        if _engine is None:
+            _engine = AmenityEngine.from_sources(
+                settings.AMENITY_CONTEXTS_DIR,
+                getattr(settings, 'AMENITY_MALLS_PARKS_CSV', None),
+            )
+        return _engine
@@ -0,0 +1,193 @@
+"""Resumable import runs and the on-disk cache of fetched listing pages.
+
+Every importer run gets an ``ImportJournal``: a JSONL file that records
+each URL's outcome once it is final, that is, after its listing was
+committed. ``--resume <run_id>`` reopens the journal and skips the URLs
+that already reached a done state, so a run that died halfway carries on
+in one process instead of starting over.
+
+``FetchCache`` keeps fetched detail pages gzipped on disk, keyed by the
+SHA-256 of their URL. Entries older than the TTL count as missing. Rerunning
+an import after a parser fix therefore reparses the saved pages without
+going to the network.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import secrets
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+
+from . import import_pool
+
+# A URL in one of these states is not fetched again on --resume.
+DONE_STATES = frozenset({import_pool.CREATED, import_pool.UPDATED, import_pool.UNCHANGED})
+
+_RUN_ID_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]*$")
+
+
+def runs_dir() -> str:
+    return getattr(settings, 'LISTING_IMPORT_RUNS_DIR', os.path.join(settings.BASE_DIR, 'listings', 'import_runs'))
+
+
+def new_run_id() -> str:
+    return f"{datetime.now():%Y%m%d-%H%M%S}-{secrets.token_hex(2)}"
+
+
+class ImportJournal:
+    """Append-only log of URL outcomes for one import run.
+
+    The first line holds the run metadata; every later line is one URL's
+    outcome, and the last line for a URL wins. A line cut short by a crash
+    is ignored on load.
+    """
+
+    def __init__(self, path: str, run_id: str, meta: Optional[dict] = None, states: Optional[Dict[str, dict]] = None):
+        self.path = path
+        self.run_id = run_id
+        self.meta = meta or {}
+        self.states: Dict[str, dict] = states or {}
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    @classmethod
+    def start(cls, meta: Optional[dict] = None, directory: Optional[str] = None) -> 'ImportJournal':
+        directory = directory or runs_dir()
+        os.makedirs(directory, exist_ok=True)
+        run_id = new_run_id()
+        meta = dict(meta or {}, run=run_id, started=datetime.now().isoformat(timespec='seconds'))
+        path = os.path.join(directory, f'{run_id}.jsonl')
+        journal = cls(path, run_id, meta)
+        journal._append(meta)
+        return journal
+
+    @classmethod
+    def resume(cls, run_id: str, directory: Optional[str] = None) -> 'ImportJournal':
+        """Reopen run ``run_id``; raises ValueError if there is no such run."""
+        if not _RUN_ID_RE.match(run_id or ''):
+            raise ValueError(f"Invalid import run id: {run_id!r}")
+        path = os.path.join(directory or runs_dir(), f'{run_id}.jsonl')
+        if not os.path.isfile(path):
+            raise ValueError(f"No import run {run_id} in {os.path.dirname(path)}")
+        meta: dict = {}
+        states: Dict[str, dict] = {}
+        with open(path, encoding='utf-8') as f:
+            for n, line in enumerate(f):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if n == 0 and 'run' in entry:
+                    meta = entry
+                elif entry.get('url'):
+                    states[entry['url']] = entry
+        return cls(path, run_id, meta, states)
+
+    def _append(self, entry: dict) -> None:
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def record(self, url: str, status: str, index: Optional[int] = None,
+               listing_id: Optional[int] = None, message: str = '') -> None:
+        entry = {'url': url, 'status': status, 'at': datetime.now().isoformat(timespec='seconds')}
+        if index is not None:
+            entry['index'] = index
+        if listing_id is not None:
+            entry['listing_id'] = listing_id
+        if message:
+            entry['message'] = message
+        self.states[url] = entry
+        self._append(entry)
+
+    def is_done(self, url: str) -> bool:
+        entry = self.states.get(url)
+        return entry is not None and entry.get('status') in DONE_STATES
+
+    def pending(self, urls: Iterable[str]) -> List[str]:
+        return [url for url in urls if not self.is_done(url)]
+
+    @property
+    def counts(self) -> Counter:
+        return Counter(entry.get('status') for entry in self.states.values())
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self) -> 'ImportJournal':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def open_journal(resume: str, meta: dict, dry_run: bool = False) -> Optional[ImportJournal]:
+    """The run to resume, else a new run; a fresh dry run gets no journal.
+
+    Raises ValueError for an unknown run id.
+    """
+    if resume:
+        return ImportJournal.resume(resume)
+    return None if dry_run else ImportJournal.start(meta)
+
+
+class FetchCache:
+    """Fetched HTML by URL, gzipped under ``directory``.
+
+    ``ttl`` defaults to LISTING_FETCH_CACHE_TTL; 0 keeps entries forever.
+    """
+
+    def __init__(self, directory: Optional[str] = None, ttl: Optional[float] = None):
+        self.directory = directory or getattr(
+            settings, 'LISTING_FETCH_CACHE_DIR', os.path.join(settings.BASE_DIR, 'listings', 'fetch_cache'),
+        )
+        self.ttl = getattr(settings, 'LISTING_FETCH_CACHE_TTL', 0) if ttl is None else ttl
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, url: str) -> str:
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], f'{digest}.html.gz')
+
+    def get(self, url: str) -> Optional[str]:
+        path = self.path(url)
+        try:
+            if self.ttl and time.time() - os.path.getmtime(path) > self.ttl:
+                self.misses += 1
+                return None
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                html = f.read()
+        except (OSError, EOFError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return html
+
+    def put(self, url: str, html: str) -> None:
+        path = self.path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as f:
+                f.write(html.encode('utf-8'))
+            # Readers never see a half-written entry.
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
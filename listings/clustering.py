@@ -0,0 +1,172 @@
+"""Hierarchical point clustering for the listings map (supercluster-style).
+
+Listing coordinates are projected to Web Mercator unit space and merged
+greedily from the deepest zoom upwards: at each zoom, clusters of the
+zoom below that lie within ``radius`` pixels of each other are combined.
+Every level keeps its clusters in NumPy arrays, so answering a tile is a
+single vectorized range mask. The index is rebuilt lazily whenever the
+search index version moves; that counter lives in the database, so a
+listing written by any process reaches every web worker's index.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from .search_index import get_snapshot
+
+DEFAULT_MAX_ZOOM = 15
+DEFAULT_RADIUS_PX = 60
+TILE_EXTENT_PX = 512
+
+
+def project(lat: np.ndarray, lng: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Longitude/latitude to Web Mercator unit square coordinates."""
+    x = lng / 360.0 + 0.5
+    sin = np.sin(np.radians(lat))
+    with np.errstate(divide='ignore'):
+        y = 0.5 - 0.25 * np.log((1 + sin) / (1 - sin)) / math.pi
+    return x, np.clip(y, 0.0, 1.0)
+
+
+def unproject(x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Inverse of :func:`project`; returns (lat, lng)."""
+    lng = (x - 0.5) * 360.0
+    lat = np.degrees(2 * np.arctan(np.exp((0.5 - y) * 2 * math.pi)) - math.pi / 2)
+    return lat, lng
+
+
+class _Level:
+    """Clusters at one zoom level, stored column-wise."""
+
+    __slots__ = ('x', 'y', 'count', 'price_min', 'price_max', 'listing_id', 'parent')
+
+    def __init__(self, x, y, count, price_min, price_max, listing_id):
+        self.x = x
+        self.y = y
+        self.count = count
+        self.price_min = price_min
+        self.price_max = price_max
+        # Listing id for single-point clusters, -1 otherwise.
+        self.listing_id = listing_id
+        # Index of the cluster one zoom up that absorbed this one.
+        self.parent: Optional[np.ndarray] = None
+
+
+class ClusterIndex:
+    """Per-zoom cluster levels over a set of listing points."""
+
+    def __init__(self, ids: np.ndarray, lats: np.ndarray, lngs: np.ndarray, prices: np.ndarray,
+                 max_zoom: int = DEFAULT_MAX_ZOOM, radius_px: int = DEFAULT_RADIUS_PX):
+        self.max_zoom = max_zoom
+        self.radius_px = radius_px
+        x, y = project(lats, lngs)
+        points = _Level(
+            x, y, np.ones(len(ids), dtype=np.int64),
+            prices.astype(np.float64), prices.astype(np.float64), ids.astype(np.int64),
+        )
+        # levels[z] holds the clusters shown at zoom z; levels[max_zoom + 1]
+        # are the raw points.
+        self.levels: Dict[int, _Level] = {max_zoom + 1: points}
+        for z in range(max_zoom, -1, -1):
+            self.levels[z] = self._cluster(self.levels[z + 1], z)
+
+    def _cluster(self, below: _Level, zoom: int) -> _Level:
+        r = self.radius_px / (TILE_EXTENT_PX * 2 ** zoom)
+        n = len(below.x)
+        cells: Dict[Tuple[int, int], List[int]] = {}
+        cx = np.floor(below.x / r).astype(np.int64)
+        cy = np.floor(below.y / r).astype(np.int64)
+        for i in range(n):
+            cells.setdefault((int(cx[i]), int(cy[i])), []).append(i)
+
+        parent = np.full(n, -1, dtype=np.int64)
+        out_x, out_y, out_count, out_min, out_max, out_id = [], [], [], [], [], []
+        r2 = r * r
+        for i in range(n):
+            if parent[i] != -1:
+                continue
+            members = [i]
+            gx, gy = int(cx[i]), int(cy[i])
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for j in cells.get((gx + dx, gy + dy), ()):
+                        if j == i or parent[j] != -1:
+                            continue
+                        if (below.x[j] - below.x[i]) ** 2 + (below.y[j] - below.y[i]) ** 2 <= r2:
+                            members.append(j)
+            members = np.asarray(members)
+            parent[members] = len(out_x)
+            weights = below.count[members]
+            total = int(weights.sum())
+            out_x.append(float((below.x[members] * weights).sum() / total))
+            out_y.append(float((below.y[members] * weights).sum() / total))
+            out_count.append(total)
+            out_min.append(float(below.price_min[members].min()))
+            out_max.append(float(below.price_max[members].max()))
+            out_id.append(int(below.listing_id[i]) if len(members) == 1 else -1)
+        below.parent = parent
+        return _Level(
+            np.asarray(out_x, dtype=np.float64), np.asarray(out_y, dtype=np.float64),
+            np.asarray(out_count, dtype=np.int64),
+            np.asarray(out_min, dtype=np.float64), np.asarray(out_max, dtype=np.float64),
+            np.asarray(out_id, dtype=np.int64),
+        )
+
+    def level_for(self, zoom: int) -> Tuple[int, _Level]:
+        z = max(0, min(zoom, self.max_zoom + 1))
+        return z, self.levels[z]
+
+    def tile(self, z: int, x: int, y: int) -> Tuple[int, np.ndarray]:
+        """(level zoom, cluster indices) of the clusters inside tile z/x/y."""
+        level_zoom, level = self.level_for(z)
+        scale = 2 ** z
+        inside = (
+            (level.x >= x / scale) & (level.x < (x + 1) / scale)
+            & (level.y >= y / scale) & (level.y < (y + 1) / scale)
+        )
+        return level_zoom, np.flatnonzero(inside)
+
+    def expansion_zoom(self, zoom: int, index: int) -> int:
+        """First zoom at which cluster ``index`` of level ``zoom`` splits up."""
+        count = int(self.levels[zoom].count[index])
+        members = np.array([index])
+        z = zoom
+        while z < self.max_zoom + 1:
+            below = self.levels[z + 1]
+            members = np.flatnonzero(np.isin(below.parent, members))
+            z += 1
+            if len(members) > 1 or count == 1:
+                break
+        return z
+
+
+_lock = threading.Lock()
+_index: Optional[ClusterIndex] = None
+_index_version: Optional[int] = None
+
+
+def get_cluster_index() -> ClusterIndex:
+    """The cluster index for the current listing snapshot, built on demand."""
+    global _index, _index_version
+    # Caught up with the shared version, so _index_version is that counter.
+    snapshot = get_snapshot()
+    with _lock:
+        if _index is None or _index_version != snapshot.version:
+            q = snapshot.query()
+            lats = q.values('latitude')
+            lngs = q.values('longitude')
+            valid = ~(np.isnan(lats) | np.isnan(lngs))
+            valid &= (np.abs(lats) <= 90) & (np.abs(lngs) <= 180) & ~((lats == 0) & (lngs == 0))
+            _index = ClusterIndex(
+                q.values('id')[valid], lats[valid], lngs[valid], q.values('price')[valid],
+                max_zoom=getattr(settings, 'LISTING_MAP_CLUSTER_MAX_ZOOM', DEFAULT_MAX_ZOOM),
+                radius_px=getattr(settings, 'LISTING_MAP_CLUSTER_RADIUS', DEFAULT_RADIUS_PX),
+            )
+            _index_version = snapshot.version
+        return _index
@@ -0,0 +1,45 @@
+"""Template fragment caching for the listing detail page.
+
+``newfrontend/property-details.html`` caches its gallery, details and map
+blocks with ``{% cache %}``, varied on the listing id, its ``updated_at``
+change stamp and the language (the map block also on the map file
+version). The stamp lives in the database, so a change made by any
+process, whether a web worker, an import command or the geocoder, gives
+every worker a new key once it commits. Old entries simply expire.
+
+``Listing.save()`` moves the stamp itself; ``invalidate_listing(s)`` moves
+it for writes that bypass save(), such as image changes, update() and
+bulk_update().
+"""
+
+from __future__ import annotations
+
+from typing import Iterable
+
+from django.conf import settings
+from django.utils import timezone
+
+GALLERY = 'listing_detail_gallery'
+DETAILS = 'listing_detail_info'
+MAP = 'listing_detail_map'
+
+DEFAULT_TIMEOUT = 24 * 3600
+
+
+def fragment_timeout():
+    """Seconds a fragment stays cached."""
+    return getattr(settings, 'LISTING_DETAIL_FRAGMENT_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def invalidate_listing(listing_id) -> None:
+    """Give one listing's gallery and details blocks a new cache key."""
+    invalidate_listings([listing_id])
+
+
+def invalidate_listings(listing_ids: Iterable) -> None:
+    from .models import Listing
+
+    ids = {pk for pk in listing_ids if pk is not None}
+    if ids:
+        # Part of the caller's transaction: the new key appears on commit.
+        Listing.objects.filter(pk__in=ids).update(updated_at=timezone.now())
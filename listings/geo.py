@@ -0,0 +1,104 @@
+"""Great-circle helpers and a uniform-grid spatial index for listings.
+
+The grid buckets listing rows by (lat, lng) cell so radius and k-nearest
+queries only look at cells near the query point; distances are then
+computed exactly with the haversine formula.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Dict, Iterable, Set, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+# No two points on Earth are further apart than this.
+MAX_DISTANCE_KM = math.pi * EARTH_RADIUS_KM
+
+DEFAULT_CELL_KM = 1.0
+
+
+def haversine_km(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Great-circle distance in km from (lat, lng) to each of (lats, lngs)."""
+    lat1 = math.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlng = np.radians(lngs) - math.radians(lng)
+    a = np.sin(dlat / 2.0) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def bounding_box(lat: float, lng: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """(min_lat, min_lng, max_lat, max_lng) enclosing the circle."""
+    lat_delta = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = math.cos(math.radians(min(abs(lat) + lat_delta, 89.9)))
+    lng_delta = min(radius_km / (KM_PER_DEGREE_LAT * cos_lat), 180.0)
+    return lat - lat_delta, lng - lng_delta, lat + lat_delta, lng + lng_delta
+
+
+class GridIndex:
+    """Buckets integer row positions into square lat/lng cells.
+
+    Cells are ``cell_km`` tall; in longitude they use the same number of
+    degrees, so they narrow towards the poles but never miss a point
+    because lookups expand by the true longitude span at that latitude.
+    """
+
+    def __init__(self, cell_km: float = DEFAULT_CELL_KM):
+        self.cell_km = float(cell_km)
+        self._step = self.cell_km / KM_PER_DEGREE_LAT
+        self._cells: Dict[Tuple[int, int], Set[int]] = {}
+        self._cell_of: Dict[int, Tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._cell_of)
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self._step)), int(math.floor(lng / self._step))
+
+    def add(self, pos: int, lat: float, lng: float) -> None:
+        """Index ``pos`` at (lat, lng), moving it if already indexed."""
+        self.discard(pos)
+        if lat is None or lng is None or math.isnan(lat) or math.isnan(lng):
+            return
+        cell = self._cell(lat, lng)
+        self._cells.setdefault(cell, set()).add(pos)
+        self._cell_of[pos] = cell
+
+    def add_many(self, positions: Iterable[int], lats: np.ndarray, lngs: np.ndarray) -> None:
+        for pos, lat, lng in zip(positions, lats, lngs):
+            self.add(int(pos), float(lat), float(lng))
+
+    def discard(self, pos: int) -> None:
+        cell = self._cell_of.pop(pos, None)
+        if cell is None:
+            return
+        bucket = self._cells[cell]
+        bucket.discard(pos)
+        if not bucket:
+            del self._cells[cell]
+
+    def candidates(self, lat: float, lng: float, radius_km: float) -> np.ndarray:
+        """Positions in every cell that intersects the circle's bounding box.
+
+        This is a superset of the rows within ``radius_km``; callers
+        post-filter with :func:`haversine_km`.
+        """
+        min_lat, min_lng, max_lat, max_lng = bounding_box(lat, lng, radius_km)
+        i0, j0 = self._cell(min_lat, min_lng)
+        i1, j1 = self._cell(max_lat, max_lng)
+        found = []
+        if (i1 - i0 + 1) * (j1 - j0 + 1) <= len(self._cells):
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    bucket = self._cells.get((i, j))
+                    if bucket:
+                        found.extend(bucket)
+        else:
+            # A huge radius spans more cells than are occupied: walk those instead.
+            for (i, j), bucket in self._cells.items():
+                if i0 <= i <= i1 and j0 <= j <= j1:
+                    found.extend(bucket)
+        return np.fromiter(found, dtype=np.int64, count=len(found))
@@ -0,0 +1,440 @@
+"""Geocoding work queue for listings.
+
+Saving a listing never calls the geocoder. A listing without coordinates
+gets a ``GeocodeTask`` row instead (``enqueue`` / ``enqueue_many``), and
+one ``GeocodeWorker``, run by ``process_geocode_queue``, drains the queue
+at the provider's rate limit. Coordinates are written with a single
+UPDATE that only matches while the listing still has the geocoded
+address. That UPDATE also moves ``Listing.updated_at``, the stamp in the
+detail page fragment keys, and the worker bumps the search index version
+kept in the database (``listings.search_index``); both are shared, so web
+processes see the coordinates once the worker's write commits. Nothing
+is cached in the worker's own memory on their behalf.
+
+Answers are kept in ``GeocodeCache`` under a normalized form of the
+address (``address_key``), so the many listings on one street cost a
+single request. Misses are cached too, for LISTING_GEOCODE_NEGATIVE_TTL.
+"""
+
+from __future__ import annotations
+
+import csv
+import re
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from datetime import timedelta
+from typing import Callable, Iterable, NamedTuple, Optional
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import search_index
+from .models import GeocodeCache, GeocodeTask, Listing
+
+try:
+    from geopy.geocoders import Nominatim
+except Exception:  # geopy may not be installed yet
+    Nominatim = None
+
+ADDRESS_FIELDS = Listing.ADDRESS_FIELDS
+
+# Spellings of the same street that should share a cache entry.
+_ABBREVIATIONS = {
+    'mah': 'mahallesi', 'mh': 'mahallesi', 'cad': 'caddesi', 'cd': 'caddesi',
+    'sok': 'sokak', 'sk': 'sokak', 'sokagi': 'sokak', 'blv': 'bulvari', 'bulv': 'bulvari',
+    'no': '', 'apt': 'apartmani',
+}
+_NON_WORD_RE = re.compile(r'[\W_]+')
+
+
+def address_query(address: dict, country_hint: str = '') -> str:
+    """The provider query for a mapping of ADDRESS_FIELDS to values."""
+    parts = [address.get(name) for name in ADDRESS_FIELDS] + [country_hint]
+    return ", ".join(p for p in parts if p)
+
+
+def full_address(listing, country_hint: str = '') -> str:
+    return address_query({name: getattr(listing, name) for name in ADDRESS_FIELDS}, country_hint)
+
+
+def normalize_address_part(value) -> str:
+    """Case-, accent- and punctuation-insensitive form of one address field."""
+    text = str(value or '').replace('İ', 'i').replace('ı', 'i').lower()
+    text = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+    words = (_ABBREVIATIONS.get(word, word) for word in _NON_WORD_RE.sub(' ', text).split())
+    return ' '.join(word for word in words if word)
+
+
+def address_key(address: dict, country_hint: str = '') -> str:
+    """The GeocodeCache key for a mapping of ADDRESS_FIELDS to values."""
+    parts = [address.get(name) for name in ADDRESS_FIELDS] + [country_hint]
+    return '|'.join(normalize_address_part(p) for p in parts)[:500]
+
+
+def needs_geocoding(listing) -> bool:
+    return (listing.latitude is None or listing.longitude is None) and bool(full_address(listing))
+
+
+def enqueue(listing: Listing) -> Optional[GeocodeTask]:
+    """Queue ``listing`` unless it has coordinates or this address is already queued."""
+    if listing.pk is None or not needs_geocoding(listing):
+        return None
+    query = full_address(listing)
+    task = GeocodeTask.objects.filter(listing_id=listing.pk).first()
+    if task is not None and task.query == query and task.status != GeocodeTask.DONE:
+        return task
+    task, _ = GeocodeTask.objects.update_or_create(
+        listing_id=listing.pk,
+        defaults={'query': query, 'status': GeocodeTask.PENDING, 'attempts': 0, 'last_error': ''},
+    )
+    return task
+
+
+def enqueue_created(listings: Iterable[Listing], batch_size: int = 500) -> int:
+    """Queue freshly inserted listings, which cannot have a task yet, in one INSERT per batch."""
+    tasks = [
+        GeocodeTask(listing_id=listing.pk, query=full_address(listing))
+        for listing in listings if listing.pk is not None and needs_geocoding(listing)
+    ]
+    GeocodeTask.objects.bulk_create(tasks, batch_size=batch_size)
+    return len(tasks)
+
+
+def enqueue_many(listing_ids: Iterable[int]) -> int:
+    """``enqueue`` for a batch in a fixed number of queries; returns how many were (re)queued."""
+    ids = list(listing_ids)
+    if not ids:
+        return 0
+    missing = Listing.objects.filter(Q(latitude__isnull=True) | Q(longitude__isnull=True), pk__in=ids)
+    queries = {
+        pk: query
+        for pk, *parts in missing.values_list('pk', *ADDRESS_FIELDS)
+        if (query := ", ".join(p for p in parts if p))
+    }
+    existing = {t.listing_id: t for t in GeocodeTask.objects.filter(listing_id__in=queries)}
+    new, changed = [], []
+    for pk, query in queries.items():
+        task = existing.get(pk)
+        if task is None:
+            new.append(GeocodeTask(listing_id=pk, query=query))
+        elif task.query != query or task.status == GeocodeTask.DONE:
+            task.query, task.status, task.attempts, task.last_error = query, GeocodeTask.PENDING, 0, ''
+            changed.append(task)
+    GeocodeTask.objects.bulk_create(new, batch_size=500)
+    GeocodeTask.objects.bulk_update(changed, ['query', 'status', 'attempts', 'last_error'], batch_size=500)
+    return len(new) + len(changed)
+
+
+class Point(NamedTuple):
+    latitude: float
+    longitude: float
+
+
+class GeocodeProvider:
+    """Resolves one address to a ``latitude``/``longitude`` object, or None.
+
+    ``min_delay`` is the pause the provider needs between requests.
+    Answers from ``cacheable`` providers are stored in GeocodeCache.
+    """
+
+    name = ''
+    min_delay = 0.0
+    cacheable = False
+
+    def geocode(self, query: str, address: dict):
+        raise NotImplementedError
+
+
+class FunctionProvider(GeocodeProvider):
+    """Wraps a plain ``geocode(query)`` callable, e.g. geopy's."""
+
+    cacheable = True
+
+    def __init__(self, geocode: Callable, name: str = 'nominatim', min_delay: Optional[float] = None):
+        self._geocode = geocode
+        self.name = name
+        self.min_delay = getattr(settings, 'LISTING_GEOCODE_MIN_DELAY', 1.0) if min_delay is None else min_delay
+
+    def geocode(self, query: str, address: dict):
+        return self._geocode(query)
+
+
+class NominatimProvider(FunctionProvider):
+    """OpenStreetMap's Nominatim via geopy; raises RuntimeError without geopy."""
+
+    def __init__(self, user_agent: Optional[str] = None, timeout: float = 10):
+        if Nominatim is None:
+            raise RuntimeError('geopy is not installed. Install it with "pip install geopy".')
+        user_agent = user_agent or getattr(settings, 'LISTING_GEOCODER_USER_AGENT', 'coralcity_geocoder')
+        super().__init__(Nominatim(user_agent=user_agent, timeout=timeout).geocode, name='nominatim')
+
+
+class GazetteerProvider(GeocodeProvider):
+    """Offline lookup in a CSV of neighborhoods and districts.
+
+    Columns: ``city, district, neighborhood, latitude, longitude``. Rows with
+    an empty neighborhood hold the district's centre, used when the
+    listing's neighborhood is not in the file. Listings store the
+    neighborhood in ``address`` and the district in ``state``.
+    """
+
+    name = 'gazetteer'
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or getattr(settings, 'LISTING_GEOCODE_GAZETTEER', None)
+        if not self.path:
+            raise RuntimeError(
+                "The gazetteer provider needs a CSV of city,district,neighborhood,latitude,longitude rows: "
+                "pass --gazetteer PATH or set LISTING_GEOCODE_GAZETTEER."
+            )
+        self.places = {}
+        try:
+            with open(self.path, newline='', encoding='utf-8-sig') as f:
+                for row in csv.DictReader(f):
+                    place = (normalize_address_part(row.get('city')), normalize_address_part(row.get('district')),
+                             self.neighborhood(row.get('neighborhood')))
+                    self.places[place] = Point(float(row['latitude']), float(row['longitude']))
+        except (OSError, KeyError, ValueError) as e:
+            raise RuntimeError(f"Cannot read gazetteer {self.path!r}: {e}") from e
+
+    @staticmethod
+    def neighborhood(value) -> str:
+        # "Cumhuriyet Mah. 1234. Sk." -> "cumhuriyet"
+        return normalize_address_part(value).split('mahallesi')[0].strip()
+
+    def geocode(self, query: str, address: dict):
+        city = normalize_address_part(address.get('city'))
+        district = normalize_address_part(address.get('state'))
+        return (self.places.get((city, district, self.neighborhood(address.get('address'))))
+                or self.places.get((city, district, '')))
+
+
+PROVIDERS = {'nominatim': NominatimProvider, 'gazetteer': GazetteerProvider}
+
+
+def get_provider(name: str = 'nominatim', **kwargs) -> GeocodeProvider:
+    """Provider by name; raises ValueError for an unknown one and RuntimeError if it cannot start."""
+    try:
+        cls = PROVIDERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown geocode provider {name!r}; choose from {', '.join(PROVIDERS)}") from None
+    return cls(**kwargs)
+
+
+class AddressCache:
+    """Reads and writes GeocodeCache entries and counts hits and misses.
+
+    A disabled cache misses every time and stores nothing.
+    """
+
+    def __init__(self, provider: str = 'nominatim', negative_ttl: Optional[float] = None, enabled: bool = True):
+        self.provider = provider
+        self.negative_ttl = getattr(settings, 'LISTING_GEOCODE_NEGATIVE_TTL', 7 * 24 * 3600) if negative_ttl is None else negative_ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[GeocodeCache]:
+        """The cached answer for ``key``; None when the provider has to be asked."""
+        if not self.enabled:
+            return None
+        entry = GeocodeCache.objects.filter(key=key).first()
+        if entry is not None and not entry.found and self.negative_ttl:
+            if entry.updated_at < timezone.now() - timedelta(seconds=self.negative_ttl):
+                entry = None
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, key: str, query: str, location) -> None:
+        if not self.enabled:
+            return
+        GeocodeCache.objects.update_or_create(key=key, defaults={
+            'query': query[:500],
+            'latitude': getattr(location, 'latitude', None),
+            'longitude': getattr(location, 'longitude', None),
+            'provider': self.provider,
+        })
+
+    def summary(self) -> str:
+        if not self.enabled:
+            return "Geocode cache: not used"
+        total = self.hits + self.misses
+        rate = 100.0 * self.hits / total if total else 0.0
+        return f"Geocode cache: {self.hits}/{total} hits ({rate:.0f}%)"
+
+
+class GeocodeWorker:
+    """Drains the GeocodeTask queue through a provider, ``min_delay`` seconds apart.
+
+    ``provider`` is a GeocodeProvider or a plain ``geocode(query)`` callable;
+    it defaults to Nominatim.
+    """
+
+    def __init__(self, provider=None, min_delay: Optional[float] = None,
+                 max_attempts: Optional[int] = None, log: Optional[Callable[[str], None]] = None,
+                 cache: Optional[AddressCache] = None):
+        if provider is None:
+            provider = NominatimProvider()
+        elif not isinstance(provider, GeocodeProvider):
+            provider = FunctionProvider(provider)
+        self.provider = provider
+        self.cache = cache or AddressCache(provider.name, enabled=provider.cacheable)
+        self.min_delay = provider.min_delay if min_delay is None else min_delay
+        self.max_attempts = max_attempts or getattr(settings, 'LISTING_GEOCODE_MAX_ATTEMPTS', 3)
+        self.log = log
+        self._last_call = 0.0
+
+    def _log(self, msg: str) -> None:
+        if self.log is not None:
+            self.log(msg)
+
+    def queued(self, listing_ids: Optional[Iterable[int]] = None):
+        qs = GeocodeTask.objects.filter(
+            Q(status=GeocodeTask.PENDING) | Q(status=GeocodeTask.FAILED, attempts__lt=self.max_attempts)
+        )
+        if listing_ids is not None:
+            qs = qs.filter(listing_id__in=list(listing_ids))
+        return qs.order_by('updated_at', 'id')
+
+    @staticmethod
+    def _mark(task: GeocodeTask, **fields) -> None:
+        # update() skips auto_now; failed tasks go to the back of the queue.
+        GeocodeTask.objects.filter(pk=task.pk).update(updated_at=timezone.now(), **fields)
+
+    def _wait_turn(self) -> None:
+        wait = self._last_call + self.min_delay - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_call = time.monotonic()
+
+    def resolve(self, address: dict):
+        """Cache, then provider, for one address; returns the location or None.
+
+        Provider errors propagate and are not cached.
+        """
+        query = address_query(address)
+        key = address_key(address)
+        location = self.cache.get(key)
+        if location is not None:
+            return location if location.found else None
+        self._wait_turn()
+        location = self.provider.geocode(query, address)
+        self.cache.put(key, query, location)
+        return location
+
+    def run(self, limit: int = 0, listing_ids: Optional[Iterable[int]] = None) -> Counter:
+        """Process up to ``limit`` queued tasks (0 = all) one by one; returns counts by outcome."""
+        counts: Counter = Counter()
+        qs = self.queued(listing_ids)
+        tasks = list(qs[:limit] if limit else qs)
+        for task in tasks:
+            counts[self.process(task)] += 1
+        return counts
+
+    def process(self, task: GeocodeTask) -> str:
+        row = Listing.objects.filter(pk=task.listing_id).values('latitude', 'longitude', *ADDRESS_FIELDS).first()
+        if row is None:
+            return 'gone'
+        if row['latitude'] is not None and row['longitude'] is not None:
+            self._mark(task, status=GeocodeTask.DONE)
+            return GeocodeTask.DONE
+        address = {name: row[name] for name in ADDRESS_FIELDS}
+        query = address_query(address)
+        try:
+            location = self.resolve(address)
+        except Exception as e:
+            self._mark(task, status=GeocodeTask.FAILED, attempts=task.attempts + 1,
+                       last_error=str(e)[:300], query=query)
+            self._log(f"  Geocoding error for id={task.listing_id}: {e}")
+            return GeocodeTask.FAILED
+        if location is None:
+            self._mark(task, status=GeocodeTask.NOT_FOUND, attempts=task.attempts + 1, query=query)
+            self._log(f"  No result for id={task.listing_id} | query='{query}'")
+            return GeocodeTask.NOT_FOUND
+        # Only while the listing still has the address that was geocoded.
+        written = Listing.objects.filter(pk=task.listing_id, **address).update(
+            latitude=location.latitude, longitude=location.longitude, updated_at=timezone.now(),
+        )
+        if not written:
+            return 'moved'
+        self._mark(task, status=GeocodeTask.DONE, attempts=task.attempts + 1, query=query)
+        # update() sends no signals; this bumps the shared index version.
+        search_index.refresh_listing(task.listing_id)
+        self._log(f"  Geocoded id={task.listing_id} -> ({location.latitude}, {location.longitude})")
+        return GeocodeTask.DONE
+
+    def run_batch(self, limit: int = 0, listing_ids: Optional[Iterable[int]] = None) -> Counter:
+        """Process queued tasks by unique address and write all coordinates in one bulk_update.
+
+        Each distinct address is resolved once however many listings share
+        it. Returns counts by outcome, like ``run``.
+        """
+        counts: Counter = Counter()
+        qs = self.queued(listing_ids)
+        tasks = list(qs[:limit] if limit else qs)
+        rows = {
+            row['pk']: row
+            for row in Listing.objects.filter(pk__in=[t.listing_id for t in tasks])
+            .values('pk', 'latitude', 'longitude', *ADDRESS_FIELDS)
+        }
+        groups = defaultdict(list)
+        outcome_ids = defaultdict(list)
+        for task in tasks:
+            row = rows.get(task.listing_id)
+            if row is None:
+                counts['gone'] += 1
+            elif row['latitude'] is not None and row['longitude'] is not None:
+                outcome_ids[GeocodeTask.DONE].append(task.pk)
+            else:
+                groups[address_key(row)].append(task)
+        self._log(f"  {sum(map(len, groups.values()))} listing(s) at {len(groups)} distinct address(es)")
+
+        located = {}
+        for key, group in groups.items():
+            address = {name: rows[group[0].listing_id][name] for name in ADDRESS_FIELDS}
+            try:
+                location = self.resolve(address)
+            except Exception as e:
+                failed = [t.pk for t in group]
+                GeocodeTask.objects.filter(pk__in=failed).update(
+                    status=GeocodeTask.FAILED, attempts=F('attempts') + 1,
+                    last_error=str(e)[:300], updated_at=timezone.now(),
+                )
+                counts[GeocodeTask.FAILED] += len(failed)
+                self._log(f"  Geocoding error for '{address_query(address)}': {e}")
+                continue
+            if location is None:
+                outcome_ids[GeocodeTask.NOT_FOUND].extend(t.pk for t in group)
+                continue
+            for task in group:
+                located[task.listing_id] = (task, location)
+
+        # Addresses edited while the batch was resolving keep their queue entry.
+        current = Listing.objects.filter(pk__in=located).values('pk', *ADDRESS_FIELDS)
+        still = {row['pk'] for row in current
+                 if address_key(row) == address_key(rows[row['pk']])}
+        counts['moved'] += len(located) - len(still)
+        now = timezone.now()
+        listings = [
+            Listing(pk=pk, latitude=location.latitude, longitude=location.longitude, updated_at=now)
+            for pk, (task, location) in located.items() if pk in still
+        ]
+        # updated_at is the detail fragment stamp; bulk_update skips auto_now.
+        Listing.objects.bulk_update(listings, ['latitude', 'longitude', 'updated_at'], batch_size=500)
+        outcome_ids[GeocodeTask.DONE].extend(located[pk][0].pk for pk in still)
+
+        for status, ids in outcome_ids.items():
+            GeocodeTask.objects.filter(pk__in=ids).update(
+                status=status, attempts=F('attempts') + 1, updated_at=timezone.now(),
+            )
+            counts[status] += len(ids)
+        if listings:
+            # bulk_update skips the post_save receivers.
+            search_index.mark_stale()
+        return counts
+
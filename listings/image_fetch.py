@@ -0,0 +1,138 @@
+"""Parallel image downloads for the listing importers.
+
+``ImageFetcher`` downloads through a bounded thread pool. Each thread
+keeps its own ``requests.Session`` so connections are reused, and a
+semaphore per host caps how many requests hit one server at a time.
+Bodies stream to temporary files and are SHA-256 hashed on the way. A URL
+is downloaded at most once per fetcher, and identical content is stored
+only once: after the first save, later listings point at the stored file.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import requests
+from django.core.files import File
+
+CHUNK_SIZE = 64 * 1024
+
+
+class FetchedImage(NamedTuple):
+    url: str
+    path: str
+    sha256: str
+    size: int
+
+
+class ImageFetcher:
+    def __init__(self, headers: Optional[Dict[str, str]] = None, max_workers: int = 8,
+                 per_host: int = 4, timeout: float = 20, log: Optional[Callable[[str], None]] = None):
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+        self.per_host = max(1, per_host)
+        self.log = log
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='image-fetch')
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._by_url: Dict[str, Future] = {}
+        self._by_hash: Dict[str, FetchedImage] = {}
+        self._stored: Dict[str, str] = {}
+        self._tmp_dir = tempfile.mkdtemp(prefix='listing-images-')
+
+    def __enter__(self) -> 'ImageFetcher':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+    def _session(self) -> requests.Session:
+        sess = getattr(self._local, 'session', None)
+        if sess is None:
+            sess = self._local.session = requests.Session()
+        return sess
+
+    def _slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).hostname or ''
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return slot
+
+    def _download(self, url: str, referer: str) -> Optional[FetchedImage]:
+        headers = dict(self.headers)
+        if referer:
+            headers['Referer'] = referer
+        fd, path = tempfile.mkstemp(dir=self._tmp_dir)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with self._slot(url), os.fdopen(fd, 'wb') as out:
+                with self._session().get(url, headers=headers, timeout=self.timeout, stream=True) as r:
+                    if r.status_code != 200:
+                        if self.log:
+                            self.log(f"Skipped image: status={r.status_code} {url}")
+                        os.unlink(path)
+                        return None
+                    for chunk in r.iter_content(CHUNK_SIZE):
+                        out.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+        except Exception as e:
+            if self.log:
+                self.log(f"Download failed for {url}: {e}")
+            if os.path.exists(path):
+                os.unlink(path)
+            return None
+        if not size:
+            os.unlink(path)
+            return None
+
+        image = FetchedImage(url, path, digest.hexdigest(), size)
+        with self._lock:
+            first = self._by_hash.setdefault(image.sha256, image)
+        if first is not image:
+            # Same bytes under another URL: keep a single temp file.
+            os.unlink(path)
+            image = first._replace(url=url)
+        if self.log:
+            self.log(f"Downloaded image ({size} bytes) {url}")
+        return image
+
+    def submit(self, url: str, referer: str = '') -> Future:
+        with self._lock:
+            future = self._by_url.get(url)
+            if future is None:
+                future = self._by_url[url] = self._pool.submit(self._download, url, referer)
+        return future
+
+    def fetch_many(self, urls: List[str], referer: str = '') -> List[FetchedImage]:
+        """Download ``urls`` in parallel; successful images in input order."""
+        futures = [self.submit(url, referer) for url in urls]
+        return [image for image in (f.result() for f in futures) if image is not None]
+
+    def save_to(self, field_file, name: str, image: FetchedImage) -> None:
+        """Store ``image`` in ``field_file`` (and its instance), uploading each hash once."""
+        with self._lock:
+            stored = self._stored.get(image.sha256)
+        if stored and field_file.storage.exists(stored):
+            field_file.name = stored
+            field_file.instance.save()
+            return
+        with open(image.path, 'rb') as fh:
+            field_file.save(name, File(fh), save=True)
+        with self._lock:
+            self._stored[image.sha256] = field_file.name
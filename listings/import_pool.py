@@ -0,0 +1,213 @@
+"""Asyncio worker pool for the concurrent listing importers.
+
+``run_pool`` fans URLs out to N workers that each own their own
+per-context state (a Playwright browser context, say). All workers
+share a per-domain token-bucket limiter, so raising the concurrency
+never raises the request rate against one site. Results stream through a
+queue to a single writer coroutine, which keeps database writes serial.
+Every URL ends up as one ``UrlResult`` in the returned ``ImportSummary``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+# Outcomes a worker or the writer can report for one URL.
+CREATED = 'created'
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+DRY = 'dry'
+SKIPPED = 'skipped'
+BLOCKED = 'blocked'
+FAILED = 'failed'
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, up to ``burst`` stored.
+
+    With ``jitter`` > 0 each wait is stretched by a random 0..jitter
+    fraction, so callers do not fire in lockstep; the time slept is refilled
+    as usual, so the long-run rate stays ``rate``.
+    """
+
+    def __init__(self, rate: float, burst: int = 1, jitter: float = 0.0):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.jitter = max(0.0, float(jitter))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                wait = (1 - self._tokens) / self.rate
+                if self.jitter:
+                    wait *= 1 + random.uniform(0, self.jitter)
+                await asyncio.sleep(wait)
+                self._refill()
+            self._tokens -= 1
+
+
+class DomainRateLimiter:
+    """One ``TokenBucket`` per host, created on first use."""
+
+    def __init__(self, rate: float, burst: int = 1, jitter: float = 0.0):
+        self.rate = rate
+        self.burst = burst
+        self.jitter = jitter
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    async def acquire(self, url: str) -> None:
+        host = urlsplit(url).hostname or ''
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.rate, self.burst, self.jitter)
+        await bucket.acquire()
+
+
+@dataclass
+class Backoff:
+    """Exponential backoff with jitter; one instance per worker."""
+
+    base: float = 5.0
+    cap: float = 120.0
+    failures: int = 0
+
+    def next_delay(self) -> float:
+        self.failures += 1
+        delay = min(self.cap, self.base * 2 ** (self.failures - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    def reset(self) -> None:
+        self.failures = 0
+
+
+@dataclass
+class UrlResult:
+    index: int
+    url: str
+    status: str
+    attempts: int = 1
+    message: str = ''
+    listing_id: Optional[int] = None
+    payload: Any = field(default=None, repr=False)
+
+
+@dataclass
+class ImportSummary:
+    results: List[UrlResult] = field(default_factory=list)
+    started: float = field(default_factory=time.monotonic)
+    finished: Optional[float] = None
+
+    def add(self, result: UrlResult) -> None:
+        self.results.append(result)
+
+    @property
+    def counts(self) -> Counter:
+        return Counter(r.status for r in self.results)
+
+    @property
+    def problems(self) -> List[UrlResult]:
+        return sorted(
+            (r for r in self.results if r.status in (BLOCKED, FAILED, SKIPPED)),
+            key=lambda r: r.index,
+        )
+
+    def lines(self) -> List[str]:
+        """Human-readable report: totals, then one line per problem URL."""
+        elapsed = (self.finished or time.monotonic()) - self.started
+        counts = self.counts
+        out = [
+            "Done in %.1fs. Created=%d, Updated=%d, Unchanged=%d, Dry=%d, Skipped=%d, Blocked=%d, Failed=%d, Total=%d" % (
+                elapsed, counts[CREATED], counts[UPDATED], counts[UNCHANGED], counts[DRY], counts[SKIPPED],
+                counts[BLOCKED], counts[FAILED], len(self.results),
+            )
+        ]
+        for r in self.problems:
+            out.append(f"  [{r.index}] {r.status.upper()} after {r.attempts} attempt(s): {r.url} {r.message}".rstrip())
+        return out
+
+
+# process(worker_state, index, url) -> UrlResult; the worker's retry loop
+# lives inside ``process`` so it can keep page-level state between attempts.
+ProcessFn = Callable[[Any, int, str], Awaitable[UrlResult]]
+WriteFn = Callable[[UrlResult], Awaitable[UrlResult]]
+
+
+async def run_pool(
+    urls: List[str],
+    concurrency: int,
+    open_worker: Callable[[int], Awaitable[Any]],
+    close_worker: Callable[[Any], Awaitable[None]],
+    process: ProcessFn,
+    write: WriteFn,
+    on_result: Optional[Callable[[UrlResult], None]] = None,
+) -> ImportSummary:
+    """Process ``urls`` with ``concurrency`` workers and one writer.
+
+    ``open_worker(n)`` builds the per-worker state (e.g. a browser
+    context). Results whose status is CREATED/UPDATED/DRY are passed to
+    ``write`` before being recorded; ``write`` runs in the single writer
+    task and returns the final result. ``on_result`` sees each result
+    with its payload; the summary keeps them without it.
+    """
+    summary = ImportSummary()
+    jobs: asyncio.Queue = asyncio.Queue()
+    for index, url in enumerate(urls, start=1):
+        jobs.put_nowait((index, url))
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def worker(n: int) -> None:
+        state = await open_worker(n)
+        try:
+            while True:
+                try:
+                    index, url = jobs.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    result = await process(state, index, url)
+                except Exception as e:
+                    result = UrlResult(index, url, FAILED, message=str(e))
+                await results.put(result)
+        finally:
+            await close_worker(state)
+
+    async def writer() -> None:
+        while True:
+            result = await results.get()
+            if result is None:
+                return
+            if result.status in (CREATED, UPDATED, DRY):
+                try:
+                    result = await write(result)
+                except Exception as e:
+                    result = UrlResult(result.index, result.url, FAILED, result.attempts, f"write failed: {e}")
+            if on_result is not None:
+                on_result(result)
+            result.payload = None
+            summary.add(result)
+
+    writer_task = asyncio.create_task(writer())
+    try:
+        await asyncio.gather(*(worker(n) for n in range(max(1, min(concurrency, len(urls))))))
+    finally:
+        await results.put(None)
+        await writer_task
+        summary.finished = time.monotonic()
+    return summary
@@ -4,16 +4,33 @@ import threading
 from datetime import datetime
 from django.conf import settings
 from django.core.management import call_command
-from django.db import close_old_connections
+from django.db import close_old_connections, connection
 from django.utils import timezone
 
-from .models import ListingImportJob
+from .models import ListingImportJob, ListingImportJobLogLine
 
 
 class DBLogStream(io.TextIOBase):
-    def __init__(self, job_id: int):
+    """Write-only log sink for a ListingImportJob.
+
+    ``write`` only buffers. A background thread appends the complete lines
+    to ListingImportJobLogLine in one bulk INSERT every ``interval``
+    seconds, or as soon as ``max_lines`` are waiting, so a chatty import
+    neither blocks on the database nor rewrites a growing blob. ``close``
+    flushes the rest, including a trailing partial line.
+    """
+
+    def __init__(self, job_id: int, interval: float = 1.0, max_lines: int = 200):
         self.job_id = job_id
-        self._buffer = []
+        self.interval = interval
+        self.max_lines = max(1, max_lines)
+        self._lines = []
+        self._partial = ''
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=f"listing-import-job-{job_id}-log", daemon=True)
+        self._thread.start()
 
     def writable(self):
         return True
@@ -21,16 +38,55 @@ class DBLogStream(io.TextIOBase):
     def write(self, s: str):
         if not s:
             return 0
+        with self._lock:
+            *lines, self._partial = (self._partial + str(s)).split('\n')
+            self._lines.extend(lines)
+            full = len(self._lines) >= self.max_lines
+        if full:
+            self._wake.set()
+        return len(s)
+
+    def flush(self):
+        # Asks for an early flush; the writer thread does the INSERT.
+        if not self.closed:
+            self._wake.set()
+
+    def _take(self, final: bool = False) -> list:
+        with self._lock:
+            lines, self._lines = self._lines, []
+            if final and self._partial:
+                lines.append(self._partial)
+                self._partial = ''
+        return lines
+
+    def _save(self, lines: list) -> None:
+        if not lines:
+            return
         try:
-            # Append to DB incrementally to surface progress
-            job = ListingImportJob.objects.filter(id=self.job_id).only('id', 'log').first()
-            if job:
-                job.log = (job.log or '') + str(s)
-                job.save(update_fields=['log'])
+            ListingImportJobLogLine.objects.bulk_create(
+                [ListingImportJobLogLine(job_id=self.job_id, text=line) for line in lines]
+            )
         except Exception:
-            # Avoid breaking command on logging errors
+            # Avoid breaking the import on logging errors
             pass
-        return len(s)
+
+    def _run(self):
+        try:
+            while not self._stopping:
+                self._wake.wait(self.interval)
+                self._wake.clear()
+                self._save(self._take())
+            self._save(self._take(final=True))
+        finally:
+            connection.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self._stopping = True
+        self._wake.set()
+        self._thread.join()
+        super().close()
 
 
 def _ensure_dir(path: str):
@@ -72,8 +128,8 @@ def _run_job(job_id: int):
     except Exception as e:
         job.status = 'failed'
         job.finished_at = timezone.now()
-        job.log = (job.log or '') + f"\n[admin] Error preparing CSV: {e}\n"
-        job.save(update_fields=['status', 'finished_at', 'log'])
+        ListingImportJobLogLine.objects.create(job=job, text=f"[admin] Error preparing CSV: {e}")
+        job.save(update_fields=['status', 'finished_at'])
         return
 
     # Cache for audit
@@ -115,6 +171,8 @@ def _run_job(job_id: int):
             pass
         job.status = 'failed'
     finally:
+        # Every line is stored before the job shows as finished.
+        stream.close()
         job.finished_at = timezone.now()
         job.save(update_fields=['status', 'finished_at'])
         close_old_connections()
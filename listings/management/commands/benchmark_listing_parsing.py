@@ -0,0 +1,81 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from listings.page_parsers import available_backends, get_page_parser
+from listings.parsing import MONTHS_TR, listing_fields, parse_listings
+
+
+def load_fixture_pages(directory: Path) -> list[tuple[str, str]]:
+    return [
+        (path.stem, path.read_text(encoding="utf-8", errors="ignore"))
+        for path in sorted(directory.glob("*.html"))
+    ]
+
+
+def synthetic_rows(raws: list[dict], count: int) -> list[dict]:
+    """``count`` rows cycling through ``raws`` with per-row ids, prices and dates."""
+    months = [m for m in MONTHS_TR if m.isascii()]
+    rows = []
+    for i in range(count):
+        raw = raws[i % len(raws)]
+        details = dict(raw["details"])
+        details["İlan No"] = str(1_000_000_000 + i)
+        details["İlan Tarihi"] = f"{1 + i % 28} {months[i % len(months)].title()} 2025"
+        rows.append(dict(raw, details=details, price_text=f"{10_000 + (i % 500) * 250:,} TL".replace(",", ".")))
+    return rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure HTML parsing (pages/s per installed backend) and field parsing (rows/s) "
+        "on the saved detail pages."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fixtures", type=str, default="listings/fetches", help="Directory of saved detail pages")
+        parser.add_argument("--pages", type=int, default=50, help="Pages to parse per run, per HTML backend")
+        parser.add_argument("--rows", type=int, default=20000, help="Rows to parse per run")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per mode; the best one is reported")
+
+    def _best(self, fn, repeat: int) -> float:
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - started)
+        return best
+
+    def handle(self, *args, **options):
+        directory = Path(options["fixtures"])
+        pages = load_fixture_pages(directory)
+        if not pages:
+            raise CommandError(f"No *.html fixtures in {directory}")
+        page_count = max(1, int(options["pages"]))
+        count = max(1, int(options["rows"]))
+        repeat = max(1, int(options["repeat"]))
+        self.stdout.write(f"{len(pages)} fixture page(s), best of {repeat}")
+
+        self.stdout.write(f"HTML -> raw fields ({page_count} pages per run):")
+        raws = None
+        for name in available_backends():
+            page_parser = get_page_parser(name)
+            batch = [pages[i % len(pages)] for i in range(page_count)]
+            elapsed = self._best(lambda: [page_parser.parse(html, url) for url, html in batch], repeat)
+            parsed = [page_parser.parse(html, url) for url, html in pages]
+            if raws is None:
+                raws = parsed
+            elif parsed != raws:
+                self.stdout.write(self.style.WARNING(f"  {name}: output differs from {available_backends()[0]}"))
+            self.stdout.write(f"  {name:<28} {page_count / elapsed:>12,.1f} pages/s ({elapsed * 1000:.1f} ms)")
+
+        rows = synthetic_rows(raws, count)
+        self.stdout.write(f"Raw fields -> Listing fields ({count} rows per run):")
+        modes = [
+            ("listing_fields (per row)", lambda: [listing_fields(r) for r in rows]),
+            ("parse_listings (batch)", lambda: parse_listings(rows)),
+        ]
+        for label, fn in modes:
+            elapsed = self._best(fn, repeat)
+            self.stdout.write(f"  {label:<28} {count / elapsed:>12,.0f} rows/s  ({elapsed * 1000:.1f} ms)")
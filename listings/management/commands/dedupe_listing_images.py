@@ -0,0 +1,95 @@
+import os
+import shutil
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from listings.models import ListingImage
+from listings.storage import blob_name, file_sha256, get_listing_image_storage, normalize_ext
+
+
+class Command(BaseCommand):
+    help = (
+        "Move listing photos into the content-addressed store: hash every file "
+        "referenced by ListingImage, keep one blob per SHA-256, rewrite image "
+        "paths in bulk and remove the old per-listing copies."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report what would change without touching files or rows")
+        parser.add_argument("--keep-originals", action="store_true", help="Do not delete the old files after rewriting paths")
+        parser.add_argument("--batch-size", type=int, default=500, help="Rows per bulk UPDATE")
+
+    def handle(self, *args, **options):
+        dry_run = bool(options.get("dry_run"))
+        keep = bool(options.get("keep_originals"))
+        batch_size = max(1, int(options.get("batch_size") or 500))
+        storage = get_listing_image_storage()
+
+        pks_by_name = defaultdict(list)
+        for pk, name in ListingImage.objects.exclude(image='').values_list('pk', 'image').iterator():
+            if not storage.is_blob(name):
+                pks_by_name[name].append(pk)
+
+        target_for = {}
+        blob_sizes = {}
+        bytes_before = 0
+        missing = 0
+        for name in sorted(pks_by_name):
+            path = storage.path(name)
+            if not os.path.isfile(path):
+                missing += 1
+                self.stdout.write(self.style.WARNING(f"  Missing file: {name}"))
+                continue
+            size = os.path.getsize(path)
+            bytes_before += size
+            target = blob_name(file_sha256(path), normalize_ext(name))
+            target_for[name] = target
+            blob_sizes[target] = size
+            if dry_run or storage.exists(target):
+                continue
+            dest = storage.path(target)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            try:
+                os.link(path, dest)
+            except OSError:
+                shutil.copy2(path, dest)
+
+        rows = [
+            ListingImage(pk=pk, image=target)
+            for name, target in target_for.items()
+            for pk in pks_by_name[name]
+        ]
+        if not dry_run and rows:
+            with transaction.atomic():
+                ListingImage.objects.bulk_update(rows, ['image'], batch_size=batch_size)
+
+        removed = 0
+        if not dry_run and not keep:
+            for name in target_for:
+                try:
+                    os.remove(storage.path(name))
+                    removed += 1
+                except OSError:
+                    continue
+                self._prune_empty_dirs(os.path.dirname(storage.path(name)), storage.location)
+
+        bytes_after = sum(blob_sizes.values())
+        prefix = "DRY-RUN " if dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Done. files={len(target_for)}, blobs={len(blob_sizes)}, rows={len(rows)}, "
+            f"removed={removed}, missing={missing}, bytes_before={bytes_before}, "
+            f"bytes_after={bytes_after}, saved={bytes_before - bytes_after}"
+        ))
+
+    @staticmethod
+    def _prune_empty_dirs(directory, root):
+        root = os.path.abspath(root)
+        directory = os.path.abspath(directory)
+        while directory.startswith(root + os.sep):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                return
+            directory = os.path.dirname(directory)
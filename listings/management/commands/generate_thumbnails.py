@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+
+from listings import thumbnails
+from listings.models import ListingImage
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate every THUMBNAIL_ALIASES rendition of the listing photos in parallel, "
+        "so pages never resize images inside a request. Existing renditions are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPUs - 1, at most 4; 0 = this process)")
+        parser.add_argument("--alias", action="append", default=[], help="Only this alias (repeatable)")
+        parser.add_argument("--force", action="store_true", help="Regenerate renditions that already exist")
+        parser.add_argument("--limit", type=int, default=0, help="Process at most this many photos (0 = all)")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the renditions that are missing")
+
+    def handle(self, *args, **options):
+        known = thumbnails.alias_options()
+        only = options.get("alias") or list(known)
+        unknown = [a for a in only if a not in known]
+        if unknown:
+            raise CommandError(f"Unknown thumbnail alias(es): {', '.join(unknown)}. Known: {', '.join(known)}")
+        workers = options.get("workers")
+        workers = thumbnails.default_workers() if workers is None else workers
+        limit = max(0, int(options.get("limit") or 0))
+
+        names = ListingImage.objects.exclude(image="").order_by("image").values_list("image", flat=True).distinct()
+        if limit:
+            names = names[:limit]
+
+        todo = {}
+        for name in names.iterator():
+            try:
+                aliases = only if options.get("force") else [a for a in thumbnails.missing_aliases(name) if a in only]
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f"  {name}: {e}"))
+                continue
+            if aliases:
+                todo[name] = aliases
+        missing = sum(len(a) for a in todo.values())
+        self.stdout.write(f"{missing} rendition(s) to generate for {len(todo)} photo(s) with {workers} worker(s)")
+        if options.get("dry_run") or not todo:
+            return
+
+        written = failed = 0
+        started = time.monotonic()
+        with thumbnails.ThumbnailPool(workers) as pool:
+            futures = [pool.submit(name, aliases) for name, aliases in todo.items()]
+            for n, future in enumerate(as_completed(futures), start=1):
+                name, renditions, error = future.result()
+                # Recorded here: the workers never touch the database.
+                thumbnails.record(name, renditions)
+                written += len(renditions)
+                if error:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f"  {name}: {error}"))
+                if n % 100 == 0:
+                    self.stdout.write(f"  {n}/{len(todo)} photos")
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. renditions={written}, failed photos={failed}, {written / elapsed:.1f} renditions/s"
+        ))
@@ -1,6 +1,7 @@
 import time
 from django.core.management.base import BaseCommand
 from django.db.models import Q
+from listings.geocoding import ADDRESS_FIELDS, AddressCache, address_key
 from listings.models import Listing
 
 try:
@@ -35,6 +36,7 @@ class Command(BaseCommand):
 
         geolocator = Nominatim(user_agent='coralcity_geocoder')
         geocode = RateLimiter(geolocator.geocode, min_delay_seconds=options['sleep'])
+        cache = AddressCache()
 
         processed = 0
         for listing in qs.iterator():
@@ -45,12 +47,18 @@ class Command(BaseCommand):
                 listing.zipcode,
                 options['country'],
             ]))
+            key = address_key({name: getattr(listing, name) for name in ADDRESS_FIELDS}, options['country'])
 
-            try:
-                location = geocode(query)
-            except Exception as e:
-                self.stderr.write(self.style.WARNING(f"Geocoding error for id={listing.id}: {e}"))
-                continue
+            location = cache.get(key)
+            if location is None:
+                try:
+                    location = geocode(query)
+                except Exception as e:
+                    self.stderr.write(self.style.WARNING(f"Geocoding error for id={listing.id}: {e}"))
+                    continue
+                cache.put(key, query, location)
+            elif not location.found:
+                location = None
 
             if location is None:
                 self.stderr.write(self.style.WARNING(f"No result for id={listing.id} | query='{query}'"))
@@ -63,4 +71,5 @@ class Command(BaseCommand):
             self.stdout.write(self.style.SUCCESS(f"Geocoded id={listing.id} -> ({listing.latitude}, {listing.longitude})"))
 
         self.stdout.write(self.style.SUCCESS(f"Done. Geocoded {processed}/{count} listings."))
+        self.stdout.write(cache.summary())
 
@@ -1,55 +1,51 @@
-from django.core.management.base import BaseCommand
-from django.db import close_old_connections
-import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
 
-from listings.models import Listing
+from listings import geocoding
+from listings.models import GeocodeTask, Listing
 
 
 class Command(BaseCommand):
-    help = "Geocode all listings missing coordinates (latitude/longitude)."
+    help = (
+        "Geocode all listings missing coordinates (latitude/longitude) in one batch: each distinct "
+        "address is resolved once and the coordinates are written with a single bulk update."
+    )
 
     def add_arguments(self, parser):
         parser.add_argument("--limit", type=int, default=0, help="Limit number of listings to process (0 = all)")
-        parser.add_argument("--sleep", type=float, default=0.0, help="Seconds to sleep between requests")
+        parser.add_argument("--sleep", type=float, default=None, help="Seconds between provider requests (default: the provider's own delay)")
         parser.add_argument("--dry-run", action="store_true", help="Show what would be geocoded without saving")
+        parser.add_argument("--provider", choices=sorted(geocoding.PROVIDERS), default="nominatim",
+                            help="Where addresses are resolved: Nominatim, or the offline gazetteer CSV")
+        parser.add_argument("--gazetteer", default="", help="Path to the gazetteer CSV (city,district,neighborhood,latitude,longitude); required by --provider gazetteer unless LISTING_GEOCODE_GAZETTEER is set")
 
     def handle(self, *args, **options):
         limit = int(options.get("limit") or 0)
-        sleep_sec = float(options.get("sleep") or 0.0)
         dry_run = bool(options.get("dry_run"))
 
-        qs = Listing.objects.filter(latitude__isnull=True) | Listing.objects.filter(longitude__isnull=True)
-        qs = qs.distinct().order_by("id")
+        qs = Listing.objects.filter(Q(latitude__isnull=True) | Q(longitude__isnull=True)).order_by("id")
         total = qs.count()
         if limit > 0:
             qs = qs[:limit]
 
-        processed = 0
-        updated = 0
-        for listing in qs:
-            processed += 1
-            self.stdout.write(f"[{processed}/{total}] Geocoding id={listing.id} title='{listing.title}'")
-            if dry_run:
-                # Show the full address that would be used
-                addr_parts = [listing.address, listing.city, listing.state, listing.zipcode]
-                full_addr = ", ".join([p for p in addr_parts if p])
-                self.stdout.write(f"  DRY-RUN address='{full_addr}'")
-            else:
-                try:
-                    close_old_connections()
-                    # Call the same helper the model uses, but save with skip_geocode to avoid recursion
-                    listing.geocode_address()
-                    if listing.latitude is not None and listing.longitude is not None:
-                        listing.save(skip_geocode=True)
-                        updated += 1
-                        self.stdout.write(self.style.SUCCESS(f"  OK lat={listing.latitude} lon={listing.longitude}"))
-                    else:
-                        self.stdout.write(self.style.WARNING("  Not found"))
-                finally:
-                    close_old_connections()
-
-            if sleep_sec > 0:
-                time.sleep(sleep_sec)
-
-        self.stdout.write(self.style.SUCCESS(f"Done. processed={processed}, updated={updated}, total_missing={total}"))
-
+        if dry_run:
+            for n, listing in enumerate(qs, start=1):
+                self.stdout.write(f"[{n}/{total}] id={listing.id} title='{listing.title}'")
+                self.stdout.write(f"  DRY-RUN address='{geocoding.full_address(listing)}'")
+            return
+
+        kwargs = {"path": options["gazetteer"]} if options["provider"] == "gazetteer" and options.get("gazetteer") else {}
+        try:
+            provider = geocoding.get_provider(options["provider"], **kwargs)
+        except RuntimeError as e:
+            raise CommandError(str(e)) from e
+        worker = geocoding.GeocodeWorker(provider, min_delay=options.get("sleep"), log=self.stdout.write)
+
+        ids = list(qs.values_list("pk", flat=True))
+        geocoding.enqueue_many(ids)
+        counts = worker.run_batch(listing_ids=ids)
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. processed={sum(counts.values())}, updated={counts[GeocodeTask.DONE]}, "
+            f"not_found={counts[GeocodeTask.NOT_FOUND]}, total_missing={total}"
+        ))
+        self.stdout.write(worker.cache.summary())
@@ -1,12 +1,35 @@
 import csv
+import sys
+import time
 from decimal import Decimal, InvalidOperation
 
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 
-from listings.models import Listing
+from listings.geocoding import GeocodeWorker
+from listings.models import GeocodeTask
+from listings.sync import ListingSyncer
 from realtors.models import Realtor
 
+REQUIRED_HEADERS = [
+    "realtor",
+    "title",
+    "address",
+    "city",
+    "state",
+    "zipcode",
+    "description",
+    "price",
+    "bedrooms",
+    "property_type",
+    "bathrooms",
+    "garage",
+    "sqft",
+    "lot_size",
+    "is_published",
+]
+OPTIONAL_KEY_HEADERS = ["external_id", "original_url"]
+
 
 def to_int(value, field_name):
     if value is None or str(value).strip() == "":
@@ -33,94 +56,165 @@ def to_bool(value):
     return s in {"1", "true", "yes", "y"}
 
 
+def fields_from_row(row, realtor):
+    fields = dict(
+        realtor=realtor,
+        title=(row.get("title") or "").strip(),
+        address=(row.get("address") or "").strip(),
+        city=(row.get("city") or "").strip(),
+        state=(row.get("state") or "").strip(),
+        zipcode=(row.get("zipcode") or "").strip(),
+        description=(row.get("description") or "").strip(),
+        price=to_int(row.get("price"), "price") or 0,
+        bedrooms=to_int(row.get("bedrooms"), "bedrooms") or 0,
+        property_type=(row.get("property_type") or "").strip(),
+        bathrooms=to_int(row.get("bathrooms"), "bathrooms") or 0,
+        garage=to_int(row.get("garage"), "garage") or 0,
+        sqft=to_int(row.get("sqft"), "sqft") or 0,
+        lot_size=to_decimal(row.get("lot_size"), "lot_size") or Decimal("0.0"),
+        is_published=to_bool(row.get("is_published")),
+    )
+    # Optional keys: rows carrying them are upserted instead of always created.
+    for key in OPTIONAL_KEY_HEADERS:
+        if (row.get(key) or "").strip():
+            fields[key] = row[key].strip()
+    return fields
+
+
+class RealtorCache:
+    """Realtor lookups by id, one query per distinct id (misses included)."""
+
+    def __init__(self):
+        self._by_id = {}
+
+    def get(self, realtor_id):
+        if realtor_id not in self._by_id:
+            self._by_id[realtor_id] = Realtor.objects.filter(id=realtor_id).first()
+        return self._by_id[realtor_id]
+
+
 class Command(BaseCommand):
-    help = "Import listings from a CSV file. Headers must match the sample file."
+    help = (
+        "Import listings from a CSV file (or '-' for stdin). Headers must match the sample file. "
+        "Rows with an external_id/original_url column update the matching listing. "
+        "With --bulk, rows are inserted with bulk_create in batches and geocoding is deferred."
+    )
+    stealth_options = ("stdin",)
 
     def add_arguments(self, parser):
-        parser.add_argument("csv_path", type=str, help="Path to the CSV file")
+        parser.add_argument("csv_path", type=str, help="Path to the CSV file, or '-' to read from stdin")
         parser.add_argument(
             "--dry-run",
             action="store_true",
             help="Validate and show summary without writing to the database",
         )
+        parser.add_argument(
+            "--bulk",
+            action="store_true",
+            help="Insert with bulk_create in batches; skips per-row save(), signals and inline geocoding",
+        )
+        parser.add_argument("--batch-size", type=int, default=500, help="Rows per bulk_create batch (with --bulk)")
+        parser.add_argument(
+            "--overwrite",
+            action="store_true",
+            help="Replace stored values of matched listings (default: only fill empty fields)",
+        )
+        parser.add_argument(
+            "--geocode-after",
+            action="store_true",
+            help="With --bulk, geocode the created listings once the import has finished",
+        )
+
+    def _open(self, csv_path, options):
+        if csv_path == "-":
+            return options.get("stdin") or sys.stdin
+        try:
+            return open(csv_path, newline="", encoding="utf-8")
+        except FileNotFoundError:
+            raise CommandError(f"CSV file not found: {csv_path}")
+
+    def _progress(self, rows, started):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(f"  {rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)")
 
     @transaction.atomic
     def handle(self, *args, **options):
         csv_path = options["csv_path"]
         dry_run = options["dry_run"]
-
-        required_headers = [
-            "realtor",
-            "title",
-            "address",
-            "city",
-            "state",
-            "zipcode",
-            "description",
-            "price",
-            "bedrooms",
-            "property_type",
-            "bathrooms",
-            "garage",
-            "sqft",
-            "lot_size",
-            "is_published",
-        ]
+        bulk = options["bulk"]
+        batch_size = max(1, int(options.get("batch_size") or 500))
 
         created = 0
         skipped = 0
         missing_realtor_rows = []
-
+        updated = 0
+        unchanged = 0
+        realtors = RealtorCache()
+        syncer = ListingSyncer(
+            overwrite=bool(options.get("overwrite")), dry_run=dry_run, bulk_create=bulk, batch_size=batch_size,
+        )
+        pending = []
+        deferred_geocode = []
+        started = time.monotonic()
+        rows = 0
+
+        def record(outcomes):
+            nonlocal created, updated, unchanged
+            for outcome in outcomes:
+                if outcome.created:
+                    created += 1
+                    listing = outcome.listing
+                    # A dry run is rolled back: nothing was saved or queued.
+                    if bulk and not dry_run and (listing.latitude is None or listing.longitude is None):
+                        deferred_geocode.append(listing.pk)
+                elif outcome.changed:
+                    updated += 1
+                else:
+                    unchanged += 1
+
+        def flush():
+            if not pending:
+                return
+            record(syncer.sync(pending))
+            pending.clear()
+            self._progress(rows, started)
+
+        f = self._open(csv_path, options)
         try:
-            with open(csv_path, newline="", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                headers = reader.fieldnames or []
-                missing_headers = [h for h in required_headers if h not in headers]
-                if missing_headers:
-                    raise CommandError(
-                        f"CSV is missing required headers: {', '.join(missing_headers)}"
-                    )
-
-                for idx, row in enumerate(reader, start=2):  # start=2 to account for header line
-                    realtor_id = to_int(row.get("realtor"), "realtor")
-                    if realtor_id is None:
-                        self.stdout.write(self.style.WARNING(f"Row {idx}: missing realtor id, skipping"))
-                        skipped += 1
-                        continue
-
-                    realtor = Realtor.objects.filter(id=realtor_id).first()
-                    if not realtor:
-                        missing_realtor_rows.append(idx)
-                        skipped += 1
-                        continue
-
-                    listing = Listing(
-                        realtor=realtor,
-                        title=(row.get("title") or "").strip(),
-                        address=(row.get("address") or "").strip(),
-                        city=(row.get("city") or "").strip(),
-                        state=(row.get("state") or "").strip(),
-                        zipcode=(row.get("zipcode") or "").strip(),
-                        description=(row.get("description") or "").strip(),
-                        price=to_int(row.get("price"), "price") or 0,
-                        bedrooms=to_int(row.get("bedrooms"), "bedrooms") or 0,
-                        property_type=(row.get("property_type") or "").strip(),
-                        bathrooms=to_int(row.get("bathrooms"), "bathrooms") or 0,
-                        garage=to_int(row.get("garage"), "garage") or 0,
-                        sqft=to_int(row.get("sqft"), "sqft") or 0,
-                        lot_size=to_decimal(row.get("lot_size"), "lot_size") or Decimal("0.0"),
-                        is_published=to_bool(row.get("is_published")),
-                    )
-
-                    if dry_run:
-                        # Validate by attempting to clean fields where applicable
-                        pass
-                    else:
-                        listing.save()
-                        created += 1
+            reader = csv.DictReader(f)
+            headers = reader.fieldnames or []
+            missing_headers = [h for h in REQUIRED_HEADERS if h not in headers]
+            if missing_headers:
+                raise CommandError(
+                    f"CSV is missing required headers: {', '.join(missing_headers)}"
+                )
 
-        except FileNotFoundError:
-            raise CommandError(f"CSV file not found: {csv_path}")
+            for idx, row in enumerate(reader, start=2):  # start=2 to account for header line
+                rows += 1
+                realtor_id = to_int(row.get("realtor"), "realtor")
+                if realtor_id is None:
+                    self.stdout.write(self.style.WARNING(f"Row {idx}: missing realtor id, skipping"))
+                    skipped += 1
+                    continue
+
+                realtor = realtors.get(realtor_id)
+                if not realtor:
+                    missing_realtor_rows.append(idx)
+                    skipped += 1
+                    continue
+
+                fields = fields_from_row(row, realtor)
+
+                if bulk:
+                    pending.append(fields)
+                    if len(pending) >= batch_size:
+                        flush()
+                else:
+                    record([syncer.sync_one(fields)])
+            flush()
+        finally:
+            if csv_path != "-":
+                f.close()
 
         if dry_run:
             transaction.set_rollback(True)
@@ -132,5 +226,22 @@ class Command(BaseCommand):
                 )
             )
 
-        self.stdout.write(self.style.SUCCESS(f"Created {created} listings. Skipped {skipped} rows."))
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created} listings. Updated {updated}, unchanged {unchanged}. Skipped {skipped} rows."
+        ))
+        if deferred_geocode and options.get("geocode_after"):
+            transaction.on_commit(lambda: self._geocode(deferred_geocode))
+        elif deferred_geocode:
+            self.stdout.write(
+                f"{len(deferred_geocode)} listings queued for geocoding; run process_geocode_queue to resolve them."
+            )
 
+    def _geocode(self, pks):
+        try:
+            worker = GeocodeWorker(log=self.stdout.write)
+        except RuntimeError as e:
+            self.stdout.write(self.style.WARNING(f"{e} Listings stay queued for process_geocode_queue."))
+            return
+        counts = worker.run(listing_ids=pks)
+        self.stdout.write(self.style.SUCCESS(f"Geocoded {counts[GeocodeTask.DONE]}/{len(pks)} listings."))
+        self.stdout.write(worker.cache.summary())
@@ -1,150 +1,21 @@
 import csv
+import os
 import re
 import time
 from datetime import datetime
-from decimal import Decimal
 from pathlib import Path
 
-import requests
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 
-from listings.models import Listing
+from listings.checkpoints import FetchCache, open_journal
+from listings.page_fetch import ACCEPT_ENCODING, FETCHED, PageClient, ParsePool, fetch_pages
+from listings.page_parsers import BACKENDS
+from listings.parsing import listing_fields
+from listings.sync import ListingSyncer
 from realtors.models import Realtor
 
 
-def clean_int_from_text(text: str) -> int:
-    if not text:
-        return 0
-    digits = re.findall(r"\d+", str(text))
-    if not digits:
-        return 0
-    try:
-        return int("".join(digits))
-    except ValueError:
-        return 0
-
-
-def parse_bedrooms_from_oda_sayisi(value: str) -> int:
-    if not value:
-        return 0
-    m = re.match(r"\s*(\d+)\s*\+", value)
-    if m:
-        return int(m.group(1))
-    return clean_int_from_text(value)
-
-
-MONTHS_TR = {
-    "ocak": 1,
-    "şubat": 2,
-    "subat": 2,
-    "mart": 3,
-    "nisan": 4,
-    "mayıs": 5,
-    "mayis": 5,
-    "haziran": 6,
-    "temmuz": 7,
-    "ağustos": 8,
-    "agustos": 8,
-    "eylül": 9,
-    "eylul": 9,
-    "ekim": 10,
-    "kasım": 11,
-    "kasim": 11,
-    "aralık": 12,
-    "aralik": 12,
-}
-
-
-def parse_tr_date(value: str) -> datetime | None:
-    if not value:
-        return None
-    parts = str(value).strip().split()
-    if len(parts) >= 3:
-        try:
-            day = int(re.sub(r"\D", "", parts[0]))
-        except ValueError:
-            return None
-        month_name = parts[1].lower()
-        month = MONTHS_TR.get(month_name)
-        if not month:
-            return None
-        try:
-            year = int(re.sub(r"\D", "", parts[2]))
-        except ValueError:
-            return None
-        try:
-            return datetime(year, month, day)
-        except ValueError:
-            return None
-    return None
-
-
-def parse_deal_and_type(value: str) -> tuple[str | None, str]:
-    if not value:
-        return None, ""
-    v_low = value.strip().lower()
-    deal = None
-    if "kiralık" in v_low or "kiralik" in v_low:
-        deal = "kiralik"
-    elif "satılık" in v_low or "satilik" in v_low:
-        deal = "satis"
-    parts = value.strip().split()
-    real_type = value.strip()
-    if len(parts) >= 2:
-        real_type = " ".join(parts[1:])
-    return deal, real_type
-
-
-def extract_lat_lon_from_url(url: str) -> tuple[float | None, float | None]:
-    if not url:
-        return None, None
-    m = re.search(r"/(-?\d+\.\d+),(-?\d+\.\d+)", url)
-    if m:
-        try:
-            return float(m.group(1)), float(m.group(2))
-        except ValueError:
-            return None, None
-    m = re.search(r"[?&](?:q|ll)=(-?\d+\.\d+),(-?\d+\.\d+)", url)
-    if m:
-        try:
-            return float(m.group(1)), float(m.group(2))
-        except ValueError:
-            return None, None
-    return None, None
-
-
-def parse_location_from_breadcrumb(soup):
-    """Extract city, district, neighborhood from breadcrumb anchors.
-    Returns (city, district, neighborhood) or (None, None, None).
-    """
-    anchors = soup.select('a[data-click-label^="Adres Breadcrumb"]')
-    texts = [a.get_text(strip=True) for a in anchors if a]
-    texts = [t for t in texts if t]
-    if len(texts) >= 3:
-        return texts[0], texts[1], texts[-1]
-    meta = soup.find('meta', attrs={'name': 'description'})
-    if meta and meta.get('content'):
-        m = re.search(r"([\wÇĞİÖŞÜçğıöşü\s\.-]+?)\s+Mh\.?\s+([\wÇĞİÖŞÜçğıöşü\s\.-]+?)\s+([\wÇĞİÖŞÜçğıöşü\s\.-]+)", meta['content'])
-        if m:
-            neighborhood = (m.group(1) + ' Mh.').strip()
-            district = m.group(2).strip()
-            city = m.group(3).strip()
-            return city, district, neighborhood
-    return None, None, None
-
-
-def parse_bool_text(value: str) -> bool | None:
-    if value is None:
-        return None
-    s = value.strip().lower()
-    if s in {"evet", "var", "yes", "available"}:
-        return True
-    if s in {"hayır", "hayir", "yok", "no", "not available"}:
-        return False
-    return None
-
-
 class Command(BaseCommand):
     help = "Import listings from a CSV file of Sahibinden URLs. One URL per line, or a CSV with a 'url' column."
 
@@ -160,9 +31,38 @@ class Command(BaseCommand):
         parser.add_argument("--default-state", type=str, default="", help="Default state/district if not found")
         parser.add_argument("--default-zipcode", type=str, default="", help="Default zipcode if not found")
         parser.add_argument("--default-address", type=str, default="", help="Default address if not found")
-        parser.add_argument("--delay", type=float, default=1.5, help="Seconds to wait between requests")
+        parser.add_argument("--delay", type=float, default=1.5, help="Seconds between requests to one host (sets the default --rate)")
+        parser.add_argument("--rate", type=float, default=0.0, help="Max requests per second per host (default 1/--delay)")
+        parser.add_argument("--burst", type=int, default=1, help="Requests allowed back-to-back per host before --rate applies")
+        parser.add_argument("--jitter", type=float, default=0.5, help="Stretch each rate-limit wait by a random 0..JITTER fraction")
+        parser.add_argument("--concurrency", type=int, default=4, help="Pages fetched in parallel")
+        parser.add_argument("--per-host", type=int, default=2, help="Max simultaneous requests per host")
+        parser.add_argument("--retries", type=int, default=2, help="Retries per URL after a network error, 429 or 5xx")
+        parser.add_argument("--cooldown", type=float, default=5.0, help="First backoff delay in seconds before a retry")
+        parser.add_argument("--timeout", type=float, default=20.0, help="Per-request timeout in seconds")
+        parser.add_argument(
+            "--parse-workers",
+            type=int,
+            default=max(0, min(4, (os.cpu_count() or 1) - 1)),
+            help="Processes parsing HTML off the fetch loop (0 = parse in a thread)",
+        )
+        parser.add_argument("--no-http2", action="store_true", help="Stick to HTTP/1.1 even when httpx and h2 are installed")
+        parser.add_argument("--resume", type=str, default="", metavar="RUN_ID", help="Continue an earlier run, skipping URLs it already imported")
+        parser.add_argument("--cache", action="store_true", help="Serve pages from the on-disk fetch cache and store fetched ones in it")
+        parser.add_argument("--cache-ttl", type=float, default=None, help="Seconds a cached page stays fresh; 0 = forever (default LISTING_FETCH_CACHE_TTL)")
         parser.add_argument("--dry-run", action="store_true", help="Parse and show without saving to DB")
+        parser.add_argument(
+            "--overwrite",
+            action="store_true",
+            help="Replace stored values of existing listings with scraped ones (default: only fill empty fields)",
+        )
         parser.add_argument("--debug", action="store_true", help="Verbose debug logs of every step")
+        parser.add_argument(
+            "--parser",
+            choices=["auto", *BACKENDS],
+            default="auto",
+            help="HTML parser backend (auto = fastest installed: selectolax, lxml, then bs4)",
+        )
         parser.add_argument(
             "--save-html-dir",
             type=str,
@@ -197,15 +97,17 @@ class Command(BaseCommand):
                 urls.append(first)
         return urls
 
-    @transaction.atomic
     def handle(self, *args, **options):
         csv_path = Path(options["csv_path"])
         realtor_id = options["realtor_id"]
-        default_city = options["default_city"]
-        default_state = options["default_state"]
-        default_zipcode = options["default_zipcode"]
-        default_address = options["default_address"]
+        defaults = {
+            "city": options["default_city"],
+            "state": options["default_state"],
+            "zipcode": options["default_zipcode"],
+            "address": options["default_address"],
+        }
         delay = float(options["delay"]) or 0.0
+        rate = float(options.get("rate") or 0) or (1.0 / delay if delay > 0 else 0.0)
         dry_run = options["dry_run"]
         debug = bool(options.get("debug"))
         save_dir = Path(options.get("save_html_dir") or "") if options.get("save_html_dir") else None
@@ -223,23 +125,43 @@ class Command(BaseCommand):
         if not realtor:
             raise CommandError(f"Realtor not found with id={realtor_id}")
 
-        try:
-            from bs4 import BeautifulSoup
-        except Exception as e:
-            raise CommandError(
-                "beautifulsoup4 is required for this command. Please add it to requirements and install."
-            ) from e
-
         urls = self.read_urls(csv_path)
         if not urls:
             self.stdout.write(self.style.WARNING("No URLs found in CSV"))
             return
 
+        try:
+            journal = open_journal(
+                options.get("resume") or "", {"command": "import_listings_from_links", "csv_path": str(csv_path)}, dry_run,
+            )
+        except ValueError as e:
+            raise CommandError(str(e)) from e
+        total = len(urls)
+        if journal is not None:
+            urls = journal.pending(urls)
+            self.stdout.write(f"Run {journal.run_id}: {total - len(urls)} of {total} URL(s) already done (resume with --resume {journal.run_id})")
+            if not urls:
+                journal.close()
+                return
+            if dry_run:
+                # A dry run may preview a resume but never writes to the journal.
+                journal.close()
+                journal = None
+        cache = FetchCache(ttl=options.get("cache_ttl")) if options.get("cache") else None
+        if cache is not None:
+            dbg(f"Fetch cache: {cache.directory} (ttl={cache.ttl})")
+
+        try:
+            # Each parse worker builds its parser once and reuses its compiled selectors.
+            parse_pool = ParsePool(options.get("parser"), max(0, int(options.get("parse_workers") or 0)))
+        except ValueError as e:
+            raise CommandError(str(e)) from e
+
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
             "Accept-Language": "tr-TR,tr;q=0.9,en;q=0.8",
-            "Accept-Encoding": "gzip, deflate, br",
+            "Accept-Encoding": ACCEPT_ENCODING,
             "Referer": "https://www.sahibinden.com/",
             "Connection": "keep-alive",
         }
@@ -247,208 +169,100 @@ class Command(BaseCommand):
             headers["Cookie"] = cookie
             dbg("Custom Cookie header provided for requests")
 
-        created = 0
-        skipped = 0
+        concurrency = max(1, int(options.get("concurrency") or 1))
+        client = PageClient(
+            headers,
+            max_connections=concurrency,
+            per_host=max(1, int(options.get("per_host") or 1)),
+            timeout=float(options.get("timeout") or 20),
+            http2=not options.get("no_http2"),
+        )
+        dbg(
+            f"HTTP client: {client.backend} (HTTP/2 {'on' if client.http2 else 'off'}); "
+            f"parser: {parse_pool.parser.name} in {parse_pool.workers or 'no'} worker process(es); "
+            f"concurrency={concurrency}, per-host={client.per_host}, rate={rate:.2f}/s"
+        )
 
-        for idx, url in enumerate(urls, start=1):
-            dbg(f"[{idx}/{len(urls)}] Fetching URL: {url}")
+        def save_page(url: str, page) -> None:
             try:
-                resp = requests.get(url, headers=headers, timeout=20)
-                dbg(f"HTTP status: {resp.status_code}; content length: {len(resp.text)}")
-                if resp.status_code != 200:
-                    self.stdout.write(self.style.WARNING(f"[{idx}] HTTP {resp.status_code} -> skip: {url}"))
-                    skipped += 1
-                    continue
-                html = resp.text
-            except requests.RequestException as e:
-                self.stdout.write(self.style.WARNING(f"[{idx}] Request failed: {e} -> {url}"))
-                skipped += 1
-                continue
-
-            if save_dir:
-                try:
-                    save_dir.mkdir(parents=True, exist_ok=True)
-                    safe_name = re.sub(r"[^a-zA-Z0-9_-]", "_", url)[:180] + ".html"
-                    (save_dir / safe_name).write_text(html, encoding="utf-8")
-                    dbg(f"Saved HTML to: {(save_dir / safe_name)}")
-                except Exception as e:
-                    dbg(f"Failed to save HTML: {e}")
+                save_dir.mkdir(parents=True, exist_ok=True)
+                safe_name = re.sub(r"[^a-zA-Z0-9_-]", "_", url)[:180] + ".html"
+                (save_dir / safe_name).write_text(page.text, encoding="utf-8")
+                dbg(f"Saved HTML to: {(save_dir / safe_name)}")
+            except Exception as e:
+                dbg(f"Failed to save HTML: {e}")
 
-            dbg("Parsing HTML with BeautifulSoup")
-            soup = BeautifulSoup(html, "html.parser")
-
-            # Title
-            title = ""
-            dbg("Selecting title with CSS 'div.classifiedDetailTitle > h1'")
-            node = soup.select_one("div.classifiedDetailTitle > h1")
-            if node:
-                title = node.get_text(strip=True)
-            dbg(f"Title: {title!r}")
-            if not title:
-                dbg("Title not found via CSS; falling back to first <h1>")
-                h1 = soup.find("h1")
-                title = h1.get_text(strip=True) if h1 else ""
-                dbg(f"Fallback title: {title!r}")
-
-            # Price
-            price_text = ""
-            dbg("Selecting price with CSS 'div.classifiedInfo .classified-price-wrapper'")
-            node = soup.select_one("div.classifiedInfo .classified-price-wrapper")
-            if node:
-                price_text = node.get_text(strip=True)
-            dbg(f"Raw price text: {price_text!r}")
-            price = clean_int_from_text(price_text)
-            dbg(f"Parsed price (int): {price}")
-
-            # Details list
-            details: dict[str, str] = {}
-            dbg("Collecting detail items from 'ul.classifiedInfoList > li'")
-            for li in soup.select("ul.classifiedInfoList > li"):
-                key_el = li.find("strong")
-                val_el = li.find("span")
-                if not key_el or not val_el:
+        created = 0
+        updated = 0
+        unchanged = 0
+        skipped = 0
+        syncer = ListingSyncer(realtor, overwrite=bool(options.get("overwrite")), dry_run=dry_run)
+        # One query resolves every URL (and the ad number in it) up front.
+        syncer.prefetch_urls(urls)
+
+        def record(idx: int, url: str, status: str, listing_id=None, message: str = "") -> None:
+            if journal is not None:
+                journal.record(url, status, idx, listing_id, message)
+
+        started = time.monotonic()
+        with parse_pool:
+            results = fetch_pages(
+                urls,
+                client,
+                parse_pool,
+                concurrency=concurrency,
+                rate=rate,
+                burst=max(1, int(options.get("burst") or 1)),
+                jitter=max(0.0, float(options.get("jitter") or 0)),
+                retries=max(0, int(options.get("retries") or 0)),
+                cooldown=float(options.get("cooldown") or 0),
+                on_page=save_page if save_dir else None,
+                cache=cache,
+            )
+            # Pages arrive in completion order; all database work stays on this thread.
+            for result in results:
+                idx, url = result.index, result.url
+                if result.status != FETCHED:
+                    self.stdout.write(self.style.WARNING(
+                        f"[{idx}] {result.status.upper()} after {result.attempts} attempt(s): {result.message} -> {url}"
+                    ))
+                    skipped += 1
+                    record(idx, url, result.status, message=result.message)
                     continue
-                key = key_el.get_text(strip=True)
-                val = val_el.get_text(strip=True)
-                if key:
-                    details[key] = val
+                raw = result.payload
+                dbg(f"[{idx}/{len(urls)}] Fetched {url} ({result.message}, {result.attempts} attempt(s))")
+                for key, val in raw["details"].items():
                     dbg(f"Detail: {key!r} -> {val!r}")
+                fields = listing_fields(raw, defaults)
+                dbg(f"Title: {fields['title']!r}; price: {raw['price_text']!r} -> {fields['price']}")
+                dbg(f"Location -> city={fields['city']!r}, state={fields['state']!r}, address={fields['address']!r}")
 
-            property_type_raw = details.get("Emlak Tipi", "")
-            deal_type, property_type = parse_deal_and_type(property_type_raw)
-            dbg(f"Property type raw: {property_type_raw!r} -> mapped: {property_type!r}")
-            bedrooms = parse_bedrooms_from_oda_sayisi(details.get("Oda Sayısı", "") or details.get("Oda Sayisi", ""))
-            dbg(f"Bedrooms parsed: {bedrooms}")
-            bathrooms = clean_int_from_text(details.get("Banyo Sayısı", "") or details.get("Banyo Sayisi", ""))
-            dbg(f"Bathrooms parsed: {bathrooms}")
-            m2_brut_text = details.get("m² (Brüt)", "") or details.get("m2 (Brut)", "")
-            try:
-                m2_brut = int(re.sub(r"\D", "", m2_brut_text)) if m2_brut_text else 0
-            except ValueError:
-                m2_brut = 0
-            sqft = int(round(m2_brut * 10.7639)) if m2_brut else 0
-            dbg(f"m² (Brüt): {m2_brut_text!r} -> m2={m2_brut} -> sqft={sqft}")
-            list_date = parse_tr_date(details.get("İlan Tarihi", "") or details.get("Ilan Tarihi", ""))
-            ad_date = list_date
-            external_id = (details.get("İlan No") or details.get("Ilan No") or "").strip()
-            dbg(f"List date parsed: {list_date}")
-
-            # Map link and coordinates
-            lat = lon = None
-            dbg("Looking for map link 'div.getDirectionsButton > a'")
-            a = soup.select_one("div.getDirectionsButton > a")
-            if a and a.has_attr("href"):
-                dbg(f"Found map href: {a['href']}")
-                lat, lon = extract_lat_lon_from_url(a["href"])
-                dbg(f"Parsed coordinates: lat={lat}, lon={lon}")
-
-            # Address/location: try breadcrumbs first
-            dbg("Parsing breadcrumbs for location")
-            city_b, district_b, neighborhood_b = parse_location_from_breadcrumb(soup)
-            dbg(f"Breadcrumbs -> city={city_b!r}, district={district_b!r}, neighborhood={neighborhood_b!r}")
-            address = neighborhood_b or default_address
-            city = city_b or default_city
-            state = district_b or default_state
-            zipcode = default_zipcode
-
-            # Additional attributes
-            building_age = clean_int_from_text(details.get("Bina Yaşı", "") or details.get("Bina Yasi", "")) or None
-            floor_number = clean_int_from_text(details.get("Bulunduğu Kat", "") or details.get("Bulundugu Kat", "")) or None
-            floors_total = clean_int_from_text(details.get("Kat Sayısı", "") or details.get("Kat Sayisi", "")) or None
-            heating = (details.get("Isıtma") or details.get("Isitma") or "").strip()
-            kitchen_type = (details.get("Mutfak") or details.get("Mutfak Tipi") or "").strip()
-            balcony_text = (details.get("Balkon") or "").strip()
-            balcony = balcony_text
-            elevator = parse_bool_text(details.get("Asansör"))
-            parking_area = (details.get("Otopark") or "").strip()
-            furnished = parse_bool_text(details.get("Eşyalı") or details.get("Esyȧli"))
-            usage_status = (details.get("Kullanım Durumu") or details.get("Kullanim Durumu") or "").strip()
-            in_complex = parse_bool_text(details.get("Site İçerisinde") or details.get("Site Icerisinde"))
-            complex_name = (details.get("Site Adı") or details.get("Site Adi") or "").strip()
-            maintenance_fee = clean_int_from_text(details.get("Aidat", "")) or None
-            deposit = clean_int_from_text(details.get("Depozito", "") or details.get("Depozito (TL)", "")) or None
-            deed_status = (details.get("Tapu Durumu") or "").strip()
-            from_whom = (details.get("Kimden") or "").strip()
-
-            # Extra details in description
-            summary_items = [
-                ("Bina Yaşı", building_age),
-                ("Bulunduğu Kat", floor_number),
-                ("Kat Sayısı", floors_total),
-                ("Isıtma", heating),
-                ("Balkon", balcony),
-                ("Eşyalı", "Evet" if furnished else ("Hayır" if furnished is False else "")),
-                ("Aidat", maintenance_fee),
-            ]
-            description_parts = [f"{k}: {v}" for k, v in summary_items if v not in (None, "")]
-            description = " | ".join(description_parts)
-
-            dbg("Constructing Listing instance with parsed fields")
-            listing = Listing(
-                realtor=realtor,
-                title=title,
-                address=address,
-                city=city,
-                state=state,
-                zipcode=zipcode,
-                description=description,
-                price=price,
-                bedrooms=bedrooms,
-                deal_type=deal_type or "satis",
-                property_type=property_type,
-                bathrooms=bathrooms,
-                sqft=sqft,
-                lot_size=Decimal("0.0"),
-                external_id=external_id,
-                ad_date=list_date.date() if isinstance(list_date, datetime) else list_date,
-                m2_gross=m2_brut or None,
-                m2_net=clean_int_from_text(details.get("m² (Net)", "") or details.get("m2 (Net)", "")) or None,
-                rooms_text=(details.get("Oda Sayısı", "") or details.get("Oda Sayisi", "")).strip(),
-                building_age=building_age,
-                floor_number=floor_number,
-                floors_total=floors_total,
-                heating=heating,
-                kitchen_type=kitchen_type,
-                balcony=balcony,
-                elevator=elevator,
-                parking_area=parking_area,
-                furnished=furnished,
-                usage_status=usage_status,
-                in_complex=in_complex,
-                complex_name=complex_name,
-                maintenance_fee=maintenance_fee,
-                deposit=deposit,
-                deed_status=deed_status,
-                from_whom=from_whom,
-            )
-
-            if lat is not None and lon is not None:
-                listing.latitude = lat
-                listing.longitude = lon
-            if list_date:
-                listing.list_date = list_date
-
-            if dry_run:
-                self.stdout.write(f"[{idx}] DRY: title='{listing.title}' price={listing.price} url={url}")
-                dbg(f"Final fields -> city={listing.city}, state={listing.state}, address={listing.address}, lat={listing.latitude}, lon={listing.longitude}")
-                transaction.set_rollback(True)
-            else:
-                dbg("Saving listing to database")
-                listing.save()
-                created += 1
-                self.stdout.write(self.style.SUCCESS(f"[{idx}] Created listing id={listing.id} title='{listing.title}'"))
-
-            if delay > 0:
-                if debug and delay >= 1.0:
-                    secs = int(delay)
-                    frac = delay - secs
-                    self.stdout.write(f"Sleeping {delay:.1f}s between requests...")
-                    for i in range(secs):
-                        time.sleep(1)
-                        dbg(f"sleep tick {i+1}/{secs}")
-                    if frac > 0:
-                        time.sleep(frac)
+                if dry_run:
+                    self.stdout.write(f"[{idx}] DRY: title='{fields['title']}' price={fields['price']} url={url}")
+                    dbg(f"Final fields -> city={fields['city']}, state={fields['state']}, address={fields['address']}, lat={fields.get('latitude')}, lon={fields.get('longitude')}")
+                    continue
+                dbg("Syncing listing with the database")
+                # Committed per URL, so the journal never runs ahead of the database.
+                with transaction.atomic():
+                    outcome = syncer.sync_one(fields)
+                listing = outcome.listing
+                record(idx, url, outcome.status, listing.id, ", ".join(outcome.changed))
+                if outcome.created:
+                    created += 1
+                    self.stdout.write(self.style.SUCCESS(f"[{idx}] Created listing id={listing.id} title='{listing.title}'"))
+                elif outcome.changed:
+                    updated += 1
+                    self.stdout.write(self.style.SUCCESS(f"[{idx}] Updated listing id={listing.id} ({', '.join(outcome.changed)})"))
                 else:
-                    time.sleep(delay)
-
-        self.stdout.write(self.style.SUCCESS(f"Done. Created={created}, skipped={skipped}, total={len(urls)}"))
+                    unchanged += 1
+                    self.stdout.write(f"[{idx}] Unchanged listing id={listing.id}")
+
+        elapsed = time.monotonic() - started
+        if journal is not None:
+            journal.close()
+        if cache is not None:
+            dbg(f"Fetch cache: {cache.hits} hit(s), {cache.misses} miss(es)")
+        self.stdout.write(self.style.SUCCESS(
+            f"Done in {elapsed:.1f}s. Created={created}, updated={updated}, unchanged={unchanged}, "
+            f"skipped={skipped}, total={len(urls)}"
+        ))
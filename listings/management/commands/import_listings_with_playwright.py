@@ -1,8 +1,8 @@
+import asyncio
 import csv
 import re
 import time
 from datetime import datetime
-from decimal import Decimal
 from pathlib import Path
 
 from django.core.management.base import BaseCommand, CommandError
@@ -10,130 +10,158 @@ from django.db import transaction, connection
 
 from listings.models import Listing
 from listings.models import ListingImage
-from django.core.files.base import ContentFile
-import requests
+from listings import import_pool
+from listings.checkpoints import FetchCache, open_journal
+from listings.parsing import clean_int_from_text, extract_lat_lon_from_url, listing_fields
+from listings.sync import ListingSyncer, SyncOutcome
+from listings.image_fetch import FetchedImage, ImageFetcher
 from realtors.models import Realtor
 import threading
 from django.db import close_old_connections
 
 
-def clean_int_from_text(text: str) -> int:
-    if not text:
-        return 0
-    digits = re.findall(r"\d+", str(text))
-    if not digits:
-        return 0
+BROWSER_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+
+
+def _image_is_missing(im) -> bool:
+    f = getattr(im, 'image', None)
+    name = getattr(f, 'name', None) if f else None
+    if not f or not name:
+        return True
     try:
-        return int("".join(digits))
-    except ValueError:
-        return 0
-
-
-def parse_bedrooms_from_oda_sayisi(value: str) -> int:
-    if not value:
-        return 0
-    m = re.match(r"\s*(\d+)\s*\+", value)
-    if m:
-        return int(m.group(1))
-    return clean_int_from_text(value)
-
-
-MONTHS_TR = {
-    "ocak": 1,
-    "şubat": 2,
-    "subat": 2,
-    "mart": 3,
-    "nisan": 4,
-    "mayıs": 5,
-    "mayis": 5,
-    "haziran": 6,
-    "temmuz": 7,
-    "ağustos": 8,
-    "agustos": 8,
-    "eylül": 9,
-    "eylul": 9,
-    "ekim": 10,
-    "kasım": 11,
-    "kasim": 11,
-    "aralık": 12,
-    "aralik": 12,
-}
+        return not f.storage.exists(name)
+    except Exception:
+        return True
 
 
-def parse_tr_date(value: str) -> datetime | None:
-    if not value:
-        return None
-    parts = str(value).strip().split()
-    if len(parts) >= 3:
-        try:
-            day = int(re.sub(r"\D", "", parts[0]))
-        except ValueError:
-            return None
-        month_name = parts[1].lower()
-        month = MONTHS_TR.get(month_name)
-        if not month:
-            return None
-        try:
-            year = int(re.sub(r"\D", "", parts[2]))
-        except ValueError:
-            return None
-        try:
-            return datetime(year, month, day)
-        except ValueError:
-            return None
-    return None
-
-
-def parse_deal_and_type(value: str) -> tuple[str | None, str]:
-    if not value:
-        return None, ""
-    v_low = value.strip().lower()
-    deal = None
-    if "kiralık" in v_low or "kiralik" in v_low:
-        deal = "kiralik"
-    elif "satılık" in v_low or "satilik" in v_low:
-        deal = "satis"
-    parts = value.strip().split()
-    real_type = value.strip()
-    if len(parts) >= 2:
-        real_type = " ".join(parts[1:])
-    return deal, real_type
-
-
-def extract_lat_lon_from_url(url: str) -> tuple[float | None, float | None]:
-    if not url:
-        return None, None
-    m = re.search(r"/(-?\d+\.\d+),(-?\d+\.\d+)", url)
-    if m:
-        try:
-            return float(m.group(1)), float(m.group(2))
-        except ValueError:
-            return None, None
-    m = re.search(r"[?&](?:q|ll)=(-?\d+\.\d+),(-?\d+\.\d+)", url)
-    if m:
+def listing_images_ok(listing: Listing) -> bool:
+    """True when the listing has images and every file exists in storage."""
+    try:
+        imgs = list(listing.images.all())
+    except Exception:
+        return False
+    return bool(imgs) and not any(_image_is_missing(im) for im in imgs)
+
+
+def normalize_image_url(u: str) -> str:
+    u = (u or "").strip()
+    if not u:
+        return ""
+    # If srcset provides descriptors (e.g., "... 1x"), take just the URL
+    first_part = u.split()[0]
+    # Convert .avif to .jpg (server provides jpg fallback)
+    return re.sub(r"\.avif(?:\?.*)?$", ".jpg", first_part)
+
+
+def collect_image_urls(img_candidates: list[str], srcsets: list[str], images_max: int) -> list[str]:
+    """Unique, downloadable photo URLs from <img> src/data-src and <source> srcset values."""
+    seen: set[str] = set()
+    image_urls: list[str] = []
+    candidates = list(img_candidates)
+    for srcset in srcsets:
+        # srcset may contain multiple entries separated by commas
+        candidates.extend(srcset.split(','))
+    for raw in candidates:
+        cand = normalize_image_url(raw)
+        # Skip placeholders and non-http
+        if not cand or cand.startswith("data:") or "blank" in cand or not cand.startswith("http"):
+            continue
+        if cand not in seen:
+            seen.add(cand)
+            image_urls.append(cand)
+    if images_max > 0:
+        image_urls = image_urls[:images_max]
+    return image_urls
+
+
+def image_fetcher(cookie_string: str, workers: int, per_host: int, log=None) -> ImageFetcher:
+    headers = {
+        "User-Agent": BROWSER_USER_AGENT,
+        "Accept": "image/avif,image/webp,image/*,*/*;q=0.8",
+    }
+    if cookie_string:
+        headers["Cookie"] = cookie_string
+    return ImageFetcher(headers, max_workers=workers, per_host=per_host, timeout=20, log=log)
+
+
+def attach_listing_images(listing: Listing, is_existing: bool, downloaded_images: list[FetchedImage],
+                          no_images: bool, fetcher: ImageFetcher | None) -> None:
+    """Attach downloaded images to a saved listing where they are needed."""
+    if no_images or not downloaded_images:
+        return
+    if is_existing:
+        if listing_images_ok(listing):
+            return
+        # Remove broken images only (or all if none valid)
+        for im in list(listing.images.all()):
+            try:
+                if _image_is_missing(im):
+                    im.delete()
+            except Exception:
+                pass
+        # If still no images, attach downloads (the syncer's prefetched list is stale now)
+        if ListingImage.objects.filter(listing=listing).exists():
+            return
+    for i_img, image in enumerate(downloaded_images):
         try:
-            return float(m.group(1)), float(m.group(2))
-        except ValueError:
-            return None, None
-    return None, None
+            img = ListingImage(listing=listing, order=i_img, is_primary=(i_img == 0))
+            fetcher.save_to(img.image, f"listing_{listing.external_id or 'noid'}_{i_img + 1}.jpg", image)
+        except Exception:
+            pass
+    getattr(listing, '_prefetched_objects_cache', {}).pop('images', None)
+
+
+def sync_listing_with_images(syncer: ListingSyncer, fields: dict, downloaded_images: list[FetchedImage],
+                             no_images: bool, fetcher: ImageFetcher | None) -> SyncOutcome:
+    """Upsert the listing through ``syncer``, then attach images where they are needed."""
+    outcome = syncer.sync_one(fields)
+    if not syncer.dry_run:
+        attach_listing_images(outcome.listing, not outcome.created, downloaded_images, no_images, fetcher)
+    return outcome
+
+
+# Collects everything the importer reads from a detail page in one round trip.
+EXTRACT_PAGE_JS = r"""
+() => {
+  const text = (sel) => { const el = document.querySelector(sel); return el ? (el.textContent || '').trim() : ''; };
+  const details = {};
+  document.querySelectorAll('ul.classifiedInfoList > li').forEach((li) => {
+    const k = li.querySelector('strong'), v = li.querySelector('span');
+    if (!k || !v) return;
+    const key = k.innerText.trim();
+    if (key) details[key] = v.innerText.trim();
+  });
+  const price = document.querySelector('div.classifiedInfo .classified-price-wrapper');
+  const directions = document.querySelector('div.getDirectionsButton > a');
+  const container = document.querySelector('div.classifiedDetailPhotos');
+  const scope = (sel) => container ? container.querySelectorAll(sel) : document.querySelectorAll('.classifiedDetailPhotos ' + sel);
+  return {
+    title: text('div.classifiedDetailTitle > h1') || text('h1') || (document.title || '').trim(),
+    price_text: price ? price.innerText.trim() : '',
+    details: details,
+    map_href: directions ? directions.getAttribute('href') : null,
+    breadcrumbs: Array.from(document.querySelectorAll("a[data-click-label^='Adres Breadcrumb']")).map((a) => a.innerText.trim()).filter(Boolean),
+    img_candidates: Array.from(scope('img')).map((n) => n.getAttribute('data-src') || n.getAttribute('src')).filter(Boolean),
+    srcsets: Array.from(scope('source')).map((n) => n.getAttribute('srcset')).filter(Boolean),
+  };
+}
+"""
 
 
-def parse_location_from_breadcrumb_texts(texts: list[str]):
-    texts = [t for t in texts if t]
-    if len(texts) >= 3:
-        return texts[0], texts[1], texts[-1]
-    return None, None, None
+def load_cached_page(page, html: str) -> None:
+    """Render a cached copy of a detail page with all network requests blocked."""
+    page.route("**/*", lambda route: route.abort())
+    page.set_content(html, wait_until="domcontentloaded")
 
 
-def parse_bool_text(value: str) -> bool | None:
-    if value is None:
-        return None
-    s = value.strip().lower()
-    if s in {"evet", "var", "yes", "available"}:
-        return True
-    if s in {"hayır", "hayir", "yok", "no", "not available"}:
-        return False
-    return None
+async def load_cached_page_async(page, html: str) -> None:
+    await page.route("**/*", lambda route: route.abort())
+    await page.set_content(html, wait_until="domcontentloaded")
+
+
+def is_blocked_page(title: str, external_id: str) -> bool:
+    """Placeholder/anti-bot pages lack the ad number or carry the bare site title."""
+    return (not external_id) or (not title) or title.strip().lower() == "www.sahibinden.com"
 
 
 class Command(BaseCommand):
@@ -157,8 +185,9 @@ class Command(BaseCommand):
         parser.add_argument("--dry-run", action="store_true", help="Parse only; do not save to DB")
         parser.add_argument("--retries", type=int, default=2, help="Retries per URL when blocked or placeholder page is detected")
         parser.add_argument("--cooldown", type=float, default=5.0, help="Seconds to sleep before retrying a blocked page")
-        parser.add_argument("--skip-geocode", action="store_true", help="Do not geocode during save; leave coordinates missing")
-        parser.add_argument("--defer-geocode", action="store_true", help="Alias of --skip-geocode; geocode later via geocode_missing_listings command")
+        parser.add_argument("--overwrite", action="store_true", help="Replace stored values of existing listings with scraped ones (default: only fill empty fields)")
+        parser.add_argument("--skip-geocode", action="store_true", help="Do not queue listings for geocoding; leave coordinates missing")
+        parser.add_argument("--defer-geocode", action="store_true", help="Alias of --skip-geocode; queue them later via geocode_missing_listings")
         parser.add_argument("--default-city", type=str, default="", help="Fallback city if breadcrumb missing")
         parser.add_argument("--default-state", type=str, default="", help="Fallback district if breadcrumb missing")
         parser.add_argument("--default-zipcode", type=str, default="", help="Fallback zipcode")
@@ -174,6 +203,19 @@ class Command(BaseCommand):
         )
         parser.add_argument("--no-images", action="store_true", help="Do not download/attach listing images")
         parser.add_argument("--images-max", type=int, default=15, help="Maximum number of images to import per listing")
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Number of browser contexts working in parallel (async mode when > 1)",
+        )
+        parser.add_argument("--rate", type=float, default=0.0, help="Max page loads per second per domain in concurrent mode (default 1/--delay)")
+        parser.add_argument("--burst", type=int, default=1, help="Page loads allowed back-to-back per domain before --rate applies")
+        parser.add_argument("--image-workers", type=int, default=8, help="Threads downloading listing images")
+        parser.add_argument("--image-host-concurrency", type=int, default=4, help="Max simultaneous image downloads per host")
+        parser.add_argument("--resume", type=str, default="", metavar="RUN_ID", help="Continue an earlier run, skipping URLs it already imported")
+        parser.add_argument("--cache", action="store_true", help="Load pages from the on-disk fetch cache and store fetched ones in it")
+        parser.add_argument("--cache-ttl", type=float, default=None, help="Seconds a cached page stays fresh; 0 = forever (default LISTING_FETCH_CACHE_TTL)")
 
     def read_urls(self, path: Path) -> list[str]:
         text = path.read_text(encoding="utf-8", errors="ignore")
@@ -194,6 +236,146 @@ class Command(BaseCommand):
                 urls.append(first)
         return urls
 
+    async def run_concurrent(self, urls, realtor, *, concurrency, headless, ctx_kwargs, cookies, timeout,
+                             rate, burst, retries, cooldown, save_dir, dry_run, defaults,
+                             no_images, images_max, fetcher, syncer, dbg,
+                             journal=None, cache=None) -> import_pool.ImportSummary:
+        """Import ``urls`` with ``concurrency`` browser contexts sharing one browser.
+
+        Page loads go through a per-domain token bucket; each context retries
+        blocked pages with its own exponential backoff; all DB writes happen
+        in the pool's single writer task. Cached pages skip the rate limit.
+        """
+        from asgiref.sync import sync_to_async
+        from playwright.async_api import async_playwright
+
+        limiter = import_pool.DomainRateLimiter(rate, burst)
+        await sync_to_async(syncer.prefetch_urls, thread_sensitive=True)(urls)
+
+        def db(fn):
+            return sync_to_async(fn, thread_sensitive=True)
+
+        def write_sync(result: import_pool.UrlResult) -> import_pool.UrlResult:
+            fields, images = result.payload
+            outcome = sync_listing_with_images(syncer, fields, images, no_images, fetcher)
+            listing = outcome.listing
+            if dry_run:
+                result.message = f"title='{listing.title}' price={listing.price} city={listing.city} state={listing.state}"
+                return result
+            result.status = {
+                "created": import_pool.CREATED,
+                "updated": import_pool.UPDATED,
+            }.get(outcome.status, import_pool.UNCHANGED)
+            result.listing_id = listing.pk
+            if outcome.changed:
+                result.message = "changed: " + ", ".join(outcome.changed)
+            return result
+
+        def report(result: import_pool.UrlResult) -> None:
+            if journal is not None and result.status != import_pool.DRY:
+                journal.record(result.url, result.status, result.index, result.listing_id, result.message)
+            prefix = f"[{result.index}]"
+            if result.status == import_pool.CREATED:
+                self.stdout.write(self.style.SUCCESS(f"{prefix} Created listing id={result.listing_id} <- {result.url}"))
+            elif result.status == import_pool.UPDATED:
+                self.stdout.write(self.style.SUCCESS(f"{prefix} Updated listing id={result.listing_id} ({result.message}) <- {result.url}"))
+            elif result.status == import_pool.UNCHANGED:
+                self.stdout.write(f"{prefix} Unchanged listing id={result.listing_id} <- {result.url}")
+            elif result.status == import_pool.DRY:
+                self.stdout.write(f"{prefix} DRY: {result.message}")
+            else:
+                self.stdout.write(self.style.WARNING(f"{prefix} {result.status.upper()}: {result.message} -> {result.url}"))
+
+        async with async_playwright() as p:
+            dbg(f"Launching Chromium with {concurrency} contexts")
+            browser = await p.chromium.launch(headless=headless)
+
+            async def open_worker(n: int):
+                context = await browser.new_context(**ctx_kwargs)
+                if cookies:
+                    try:
+                        await context.add_cookies(cookies)
+                    except Exception as e:
+                        dbg(f"[worker {n}] Failed to add cookies: {e}")
+                return {"n": n, "context": context, "backoff": import_pool.Backoff(base=cooldown or 1.0)}
+
+            async def close_worker(state) -> None:
+                try:
+                    await state["context"].close()
+                except Exception:
+                    pass
+
+            async def process(state, index: int, url: str) -> import_pool.UrlResult:
+                backoff = state["backoff"]
+                status, message = import_pool.FAILED, ""
+                attempts = 0
+                cached = await asyncio.to_thread(cache.get, url) if cache is not None else None
+                while attempts <= retries:
+                    attempts += 1
+                    if cached is None:
+                        await limiter.acquire(url)
+                    page = await state["context"].new_page()
+                    page.set_default_timeout(timeout)
+                    try:
+                        try:
+                            if cached is not None:
+                                await load_cached_page_async(page, cached)
+                            else:
+                                await page.goto(url, wait_until="domcontentloaded")
+                        except Exception as e:
+                            status, message = import_pool.FAILED, f"navigation failed: {e}"
+                            cached = None
+                        else:
+                            if save_dir:
+                                try:
+                                    save_dir.mkdir(parents=True, exist_ok=True)
+                                    safe_name = re.sub(r"[^a-zA-Z0-9_-]", "_", url)[:180] + ".html"
+                                    (save_dir / safe_name).write_text(await page.content(), encoding="utf-8")
+                                except Exception as e:
+                                    dbg(f"[{index}] Failed to save HTML: {e}")
+                            try:
+                                await page.wait_for_selector("div.classifiedDetailTitle >> h1", timeout=timeout)
+                            except Exception:
+                                dbg(f"[{index}] Title selector not found within timeout; proceeding with current DOM")
+                            raw = await page.evaluate(EXTRACT_PAGE_JS)
+                            details = raw.get("details") or {}
+                            external_id = (details.get("İlan No") or details.get("Ilan No") or "").strip()
+                            if not is_blocked_page(raw.get("title") or "", external_id):
+                                backoff.reset()
+                                if cache is not None and cached is None:
+                                    await asyncio.to_thread(cache.put, url, await page.content())
+                                fields = listing_fields(dict(raw, url=url), defaults)
+                                images: list[FetchedImage] = []
+                                if not no_images and not dry_run:
+                                    existing = await db(syncer.find)(external_id, url)
+                                    if existing is None or not await db(listing_images_ok)(existing):
+                                        image_urls = collect_image_urls(
+                                            raw.get("img_candidates") or [], raw.get("srcsets") or [], images_max,
+                                        )
+                                        images = await asyncio.to_thread(fetcher.fetch_many, image_urls, url)
+                                status = import_pool.DRY if dry_run else import_pool.CREATED
+                                return import_pool.UrlResult(index, url, status, attempts, payload=(fields, images))
+                            status, message = import_pool.BLOCKED, "missing/invalid listing markers"
+                            # A cached copy that no longer parses is refetched.
+                            cached = None
+                    finally:
+                        try:
+                            await page.close()
+                        except Exception:
+                            pass
+                    if attempts <= retries:
+                        wait = backoff.next_delay()
+                        dbg(f"[{index}] {message}; retry {attempts}/{retries} in {wait:.1f}s (worker {state['n']})")
+                        await asyncio.sleep(wait)
+                return import_pool.UrlResult(index, url, status, attempts, message)
+
+            try:
+                return await import_pool.run_pool(
+                    urls, concurrency, open_worker, close_worker, process, db(write_sync), on_result=report,
+                )
+            finally:
+                await browser.close()
+
     def handle(self, *args, **options):
         try:
             from playwright.sync_api import sync_playwright
@@ -214,16 +396,24 @@ class Command(BaseCommand):
         retries = int(options.get("retries") or 0)
         cooldown = float(options.get("cooldown") or 0.0)
         skip_geocode = bool(options.get("skip_geocode")) or bool(options.get("defer_geocode"))
-        default_city = options.get("default_city") or ""
-        default_state = options.get("default_state") or ""
-        default_zipcode = options.get("default_zipcode") or ""
-        default_address = options.get("default_address") or ""
+        defaults = {
+            "city": options.get("default_city") or "",
+            "state": options.get("default_state") or "",
+            "zipcode": options.get("default_zipcode") or "",
+            "address": options.get("default_address") or "",
+        }
         cookie_string = options.get("cookie_string") or ""
         cookie_file = options.get("cookie_file") or ""
         cookie_domain = options.get("cookie_domain") or ".sahibinden.com"
         header_kvs: list[str] = options.get("header") or []
         no_images = bool(options.get("no_images"))
         images_max = int(options.get("images_max") or 0) or 15
+        concurrency = max(1, int(options.get("concurrency") or 1))
+        # Default to the sequential pace: one request per --delay seconds per domain.
+        rate = float(options.get("rate") or 0) or (1.0 / delay if delay > 0 else 0.0)
+        burst = max(1, int(options.get("burst") or 1))
+        image_workers = max(1, int(options.get("image_workers") or 8))
+        image_host_concurrency = max(1, int(options.get("image_host_concurrency") or 4))
 
         def dbg(msg: str):
             if debug:
@@ -241,9 +431,30 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING("No URLs found in CSV"))
             return
 
+        try:
+            journal = open_journal(
+                options.get("resume") or "", {"command": "import_listings_with_playwright", "csv_path": str(csv_path)},
+                dry_run,
+            )
+        except ValueError as e:
+            raise CommandError(str(e)) from e
+        if journal is not None:
+            total = len(urls)
+            urls = journal.pending(urls)
+            self.stdout.write(f"Run {journal.run_id}: {total - len(urls)} of {total} URL(s) already done (resume with --resume {journal.run_id})")
+            if not urls:
+                journal.close()
+                return
+            if dry_run:
+                # A dry run may preview a resume but never writes to the journal.
+                journal.close()
+                journal = None
+        cache = FetchCache(ttl=options.get("cache_ttl")) if options.get("cache") else None
+
         created = 0
         skipped = 0
         updated = 0
+        unchanged = 0
 
         # Default headers (applied to every request). User-specified headers override these.
         default_headers = {
@@ -327,555 +538,306 @@ class Command(BaseCommand):
             except Exception as e:
                 dbg(f"Failed to read cookies.txt: {e}")
 
-        with sync_playwright() as p:
-            dbg("Launching Chromium")
-            browser = p.chromium.launch(headless=headless)
-            ctx_kwargs = {
-                "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
-                "viewport": {"width": 1366, "height": 900},
-                "locale": "tr-TR",
-            }
-            if storage_state:
-                ctx_kwargs["storage_state"] = storage_state
-                dbg(f"Using storage state: {storage_state}")
-            # Always apply merged default+user headers
-            ctx_kwargs["extra_http_headers"] = merged_headers
-            dbg("Applied default+extra HTTP headers to context")
-            context = browser.new_context(**ctx_kwargs)
-            if cookies:
-                try:
-                    context.add_cookies(cookies)
-                    dbg("Session cookies added to context")
-                except Exception as e:
-                    dbg(f"Failed to add cookies: {e}")
-
-            # Helper to run ORM lookups safely outside async context
-            def find_existing(external_id_value: str | None, original_url_value: str | None):
-                result = {"obj": None}
-
-                def _lookup():
+        ctx_kwargs = {
+            "user_agent": BROWSER_USER_AGENT,
+            "viewport": {"width": 1366, "height": 900},
+            "locale": "tr-TR",
+        }
+        if storage_state:
+            ctx_kwargs["storage_state"] = storage_state
+            dbg(f"Using storage state: {storage_state}")
+        # Always apply merged default+user headers
+        ctx_kwargs["extra_http_headers"] = merged_headers
+
+        syncer = ListingSyncer(realtor, overwrite=bool(options.get("overwrite")), dry_run=dry_run,
+                               skip_geocode=skip_geocode)
+
+        with image_fetcher(cookie_string, image_workers, image_host_concurrency,
+                           log=self.stdout.write if debug else None) as fetcher:
+            if concurrency > 1:
+                summary = asyncio.run(self.run_concurrent(
+                    urls, realtor, concurrency=concurrency, headless=headless, ctx_kwargs=ctx_kwargs,
+                    cookies=cookies, timeout=timeout, rate=rate, burst=burst, retries=retries,
+                    cooldown=cooldown, save_dir=save_dir, dry_run=dry_run,
+                    defaults=defaults, no_images=no_images, images_max=images_max,
+                    fetcher=fetcher, syncer=syncer, dbg=dbg, journal=journal, cache=cache,
+                ))
+                if journal is not None:
+                    journal.close()
+                for line in summary.lines():
+                    self.stdout.write(line)
+                return
+
+            with sync_playwright() as p:
+                dbg("Launching Chromium")
+                browser = p.chromium.launch(headless=headless)
+                dbg("Applied default+extra HTTP headers to context")
+                context = browser.new_context(**ctx_kwargs)
+                if cookies:
                     try:
-                        close_old_connections()
-                        obj = None
-                        if external_id_value:
-                            obj = Listing.objects.filter(external_id=external_id_value).first()
-                        if obj is None and original_url_value:
-                            obj = Listing.objects.filter(original_url=original_url_value).first()
-                        result["obj"] = obj
-                    finally:
-                        close_old_connections()
+                        context.add_cookies(cookies)
+                        dbg("Session cookies added to context")
+                    except Exception as e:
+                        dbg(f"Failed to add cookies: {e}")
 
-                t = threading.Thread(target=_lookup, name="listing-lookup-thread", daemon=True)
-                t.start()
-                t.join()
-                return result["obj"]
+                # Helper to run ORM calls safely outside Playwright's event loop
+                def run_in_thread(fn, *args):
+                    result = {}
 
-            for idx, url in enumerate(urls, start=1):
-                dbg(f"[{idx}/{len(urls)}] Goto: {url}")
-                page = context.new_page()
-                page.set_default_timeout(timeout)
-                try:
-                    page.goto(url, wait_until="domcontentloaded")
-                except Exception as e:
-                    self.stdout.write(self.style.WARNING(f"[{idx}] Navigation failed: {e} -> {url}"))
-                    skipped += 1
-                    continue
-
-                # Optional page HTML save
-                if save_dir:
-                    try:
-                        save_dir.mkdir(parents=True, exist_ok=True)
-                        safe_name = re.sub(r"[^a-zA-Z0-9_-]", "_", url)[:180] + ".html"
-                        content = page.content()
-                        (save_dir / safe_name).write_text(content, encoding="utf-8")
-                        dbg(f"Saved HTML to: {(save_dir / safe_name)}")
-                    except Exception as e:
-                        dbg(f"Failed to save HTML: {e}")
+                    def _target():
+                        try:
+                            close_old_connections()
+                            result["value"] = fn(*args)
+                        except BaseException as e:
+                            result["exc"] = e
+                        finally:
+                            close_old_connections()
 
-                # Allow dynamic content to render
-                try:
-                    page.wait_for_selector("div.classifiedDetailTitle >> h1", timeout=timeout)
-                except Exception:
-                    dbg("Title selector not found within timeout; proceeding with current DOM")
+                    t = threading.Thread(target=_target, name="listing-db-thread", daemon=True)
+                    t.start()
+                    t.join()
+                    if "exc" in result:
+                        raise result["exc"]
+                    return result.get("value")
 
-                # Extract title with short, non-blocking calls
-                def quick_text(sel: str, ms: int = 1500) -> str:
+                def quick_text(page, sel: str, ms: int = 1500) -> str:
                     try:
                         t = page.locator(sel).first.text_content(timeout=ms)
                         return (t or "").strip()
                     except Exception:
                         return ""
 
-                title = quick_text("div.classifiedDetailTitle > h1") or quick_text("h1")
-                if not title:
-                    try:
-                        title = (page.title() or "").strip()
-                    except Exception:
-                        title = ""
-                dbg(f"Title: {title!r}")
-
-                # Price
-                price_text = ""
-                try:
-                    price_text = page.locator("div.classifiedInfo .classified-price-wrapper").first.inner_text().strip()
-                except Exception:
-                    price_text = ""
-                price = clean_int_from_text(price_text)
-                dbg(f"Price raw: {price_text!r} -> {price}")
-
-                # Details list
-                details: dict[str, str] = {}
-                try:
-                    lis = page.locator("ul.classifiedInfoList > li")
-                    for i in range(lis.count()):
-                        li = lis.nth(i)
-                        try:
-                            key = li.locator("strong").first.inner_text().strip()
-                            val = li.locator("span").first.inner_text().strip()
-                        except Exception:
-                            continue
-                        if key:
-                            details[key] = val
-                            dbg(f"Detail: {key!r} -> {val!r}")
-                except Exception:
-                    pass
-
-                property_type_raw = details.get("Emlak Tipi", "")
-                deal_type, property_type = parse_deal_and_type(property_type_raw)
-                bedrooms = parse_bedrooms_from_oda_sayisi(details.get("Oda Sayısı", "") or details.get("Oda Sayisi", ""))
-                bathrooms = clean_int_from_text(details.get("Banyo Sayısı", "") or details.get("Banyo Sayisi", ""))
-                m2_brut_text = details.get("m² (Brüt)", "") or details.get("m2 (Brut)", "")
-                try:
-                    m2_brut = int(re.sub(r"\D", "", m2_brut_text)) if m2_brut_text else 0
-                except ValueError:
-                    m2_brut = 0
-                sqft = int(round(m2_brut * 10.7639)) if m2_brut else 0
-                list_date = parse_tr_date(details.get("İlan Tarihi", "") or details.get("Ilan Tarihi", ""))
-                ad_date = list_date
-                external_id = (details.get("İlan No") or details.get("Ilan No") or "").strip()
-                dbg(f"Type: {property_type_raw!r}->{property_type!r}; Beds: {bedrooms}; Baths: {bathrooms}; m2={m2_brut} sqft={sqft}; date={list_date}")
-
-                # Bail early if page likely blocked/placeholder, with lightweight retries
-                if not external_id or not title or title.lower() == "www.sahibinden.com":
-                    blocked = True
-                    attempts = 0
-                    while blocked and attempts < retries:
-                        attempts += 1
-                        self.stdout.write(self.style.WARNING(f"[{idx}] Blocked/invalid page; retry {attempts}/{retries} after {cooldown:.1f}s"))
-                        if cooldown > 0:
-                            time.sleep(cooldown)
+                def read_title_and_details(page) -> tuple[str, dict[str, str]]:
+                    title = quick_text(page, "div.classifiedDetailTitle > h1") or quick_text(page, "h1")
+                    if not title:
                         try:
-                            page.reload(wait_until="domcontentloaded")
+                            title = (page.title() or "").strip()
                         except Exception:
-                            break
-                        # Re-extract title and external_id quickly
-                        def quick_text(sel: str, ms: int = 1500) -> str:
-                            try:
-                                t = page.locator(sel).first.text_content(timeout=ms)
-                                return (t or "").strip()
-                            except Exception:
-                                return ""
-                        title = quick_text("div.classifiedDetailTitle > h1") or quick_text("h1")
-                        if not title:
+                            title = ""
+                    details: dict[str, str] = {}
+                    try:
+                        lis = page.locator("ul.classifiedInfoList > li")
+                        for i in range(lis.count()):
+                            li = lis.nth(i)
                             try:
-                                title = (page.title() or "").strip()
+                                key = li.locator("strong").first.inner_text().strip()
+                                val = li.locator("span").first.inner_text().strip()
                             except Exception:
-                                title = ""
-                        details = {}
-                        try:
-                            lis = page.locator("ul.classifiedInfoList > li")
-                            for i in range(lis.count()):
-                                li = lis.nth(i)
-                                try:
-                                    key = li.locator("strong").first.inner_text().strip()
-                                    val = li.locator("span").first.inner_text().strip()
-                                except Exception:
-                                    continue
-                                if key:
-                                    details[key] = val
-                        except Exception:
-                            pass
-                        external_id = (details.get("İlan No") or details.get("Ilan No") or "").strip()
-                        blocked = (not external_id) or (not title) or (title.strip().lower() == "www.sahibinden.com")
-                    if blocked:
-                        self.stdout.write(self.style.WARNING(f"[{idx}] SKIP: missing/invalid listing markers after retries."))
-                        try:
-                            page.close()
-                        except Exception:
-                            pass
-                        skipped += 1
-                        if delay > 0:
-                            time.sleep(delay)
-                        continue
+                                continue
+                            if key:
+                                details[key] = val
+                                dbg(f"Detail: {key!r} -> {val!r}")
+                    except Exception:
+                        pass
+                    return title, details
 
-                # Check if this listing already exists (by external_id or original_url)
-                existing_listing = None
-                lookup_source = None
-                try:
-                    existing_listing = find_existing(external_id, url)
-                    if existing_listing:
-                        if existing_listing.external_id:
-                            lookup_source = f"external_id={existing_listing.external_id}"
-                        elif existing_listing.original_url:
-                            lookup_source = "original_url"
-                except Exception as e:
-                    dbg(f"Existing lookup failed: {e}")
-
-                # Map link
-                lat = lon = None
-                try:
-                    href = page.locator("div.getDirectionsButton > a").first.get_attribute("href")
-                    if href:
-                        lat, lon = extract_lat_lon_from_url(href)
-                        dbg(f"Map href: {href} -> lat={lat}, lon={lon}")
-                except Exception:
-                    pass
+                # One query resolves every URL (and the ad number in it) up front.
+                run_in_thread(syncer.prefetch_urls, urls)
 
-                # Breadcrumbs for location
-                city_b = district_b = neighborhood_b = None
-                try:
-                    a_nodes = page.locator("a[data-click-label^='Adres Breadcrumb']")
-                    texts = []
-                    for i in range(a_nodes.count()):
-                        t = a_nodes.nth(i).inner_text().strip()
-                        if t:
-                            texts.append(t)
-                    city_b, district_b, neighborhood_b = parse_location_from_breadcrumb_texts(texts)
-                except Exception:
-                    pass
-                dbg(f"Breadcrumbs -> city={city_b!r}, district={district_b!r}, neighborhood={neighborhood_b!r}")
-
-                address = neighborhood_b or default_address
-                city = city_b or default_city
-                state = district_b or default_state
-                zipcode = default_zipcode
-
-                # Extra details and attributes
-                extra_keys = [
-                    "Bina Yaşı",
-                    "Bulunduğu Kat",
-                    "Kat Sayısı",
-                    "Isıtma",
-                    "Balkon",
-                    "Eşyalı",
-                    "Aidat",
-                ]
-                building_age = clean_int_from_text(details.get("Bina Yaşı", "") or details.get("Bina Yasi", "")) or None
-                floor_number = clean_int_from_text(details.get("Bulunduğu Kat", "") or details.get("Bulundugu Kat", "")) or None
-                floors_total = clean_int_from_text(details.get("Kat Sayısı", "") or details.get("Kat Sayisi", "")) or None
-                heating = (details.get("Isıtma") or details.get("Isitma") or "").strip()
-                kitchen_type = (details.get("Mutfak") or details.get("Mutfak Tipi") or "").strip()
-                balcony_text = (details.get("Balkon") or "").strip()
-                balcony = balcony_text
-                elevator = parse_bool_text(details.get("Asansör"))
-                parking_area = (details.get("Otopark") or "").strip()
-                furnished = parse_bool_text(details.get("Eşyalı") or details.get("Esyȧli"))
-                usage_status = (details.get("Kullanım Durumu") or details.get("Kullanim Durumu") or "").strip()
-                in_complex = parse_bool_text(details.get("Site İçerisinde") or details.get("Site Icerisinde"))
-                complex_name = (details.get("Site Adı") or details.get("Site Adi") or "").strip()
-                maintenance_fee = clean_int_from_text(details.get("Aidat", "")) or None
-                deposit = clean_int_from_text(details.get("Depozito", "") or details.get("Depozito (TL)", "")) or None
-                deed_status = (details.get("Tapu Durumu") or "").strip()
-                from_whom = (details.get("Kimden") or "").strip()
-
-                description_parts = []
-                for k in extra_keys:
-                    v = details.get(k)
-                    if v:
-                        description_parts.append(f"{k}: {v}")
-                description = " | ".join(description_parts)
-
-                dbg("Constructing Listing model instance or updating existing")
-                if existing_listing:
-                    listing = existing_listing
-                    # Minimal non-destructive updates
-                    if not listing.original_url:
-                        listing.original_url = url
-                    if (listing.latitude is None or listing.longitude is None) and (lat is not None and lon is not None):
-                        listing.latitude = lat
-                        listing.longitude = lon
-                    # Optionally update price or other fields only if missing; avoid overwriting user's edits
-                    if not listing.description and description:
-                        listing.description = description
-                    if not listing.property_type and property_type:
-                        listing.property_type = property_type
-                    if not listing.deal_type and deal_type:
-                        listing.deal_type = deal_type
-                else:
-                    listing = Listing(
-                        realtor=realtor,
-                        title=title,
-                        address=address,
-                        city=city,
-                        state=state,
-                        zipcode=zipcode,
-                        description=description,
-                        price=price,
-                        bedrooms=bedrooms,
-                        deal_type=deal_type or "satis",
-                        property_type=property_type,
-                        bathrooms=bathrooms,
-                        sqft=sqft,
-                        lot_size=Decimal("0.0"),
-                        external_id=external_id,
-                        ad_date=list_date.date() if isinstance(list_date, datetime) else list_date,
-                        m2_gross=m2_brut or None,
-                        m2_net=clean_int_from_text(details.get("m² (Net)", "") or details.get("m2 (Net)", "")) or None,
-                        rooms_text=(details.get("Oda Sayısı", "") or details.get("Oda Sayisi", "")).strip(),
-                        building_age=building_age,
-                        floor_number=floor_number,
-                        floors_total=floors_total,
-                        heating=heating,
-                        kitchen_type=kitchen_type,
-                        balcony=balcony,
-                        elevator=elevator,
-                        parking_area=parking_area,
-                        furnished=furnished,
-                        usage_status=usage_status,
-                        in_complex=in_complex,
-                        complex_name=complex_name,
-                        maintenance_fee=maintenance_fee,
-                        deposit=deposit,
-                        deed_status=deed_status,
-                        from_whom=from_whom,
-                        original_url=url,
-                    )
-                    if lat is not None and lon is not None:
-                        listing.latitude = lat
-                        listing.longitude = lon
-                    if list_date:
-                        listing.list_date = list_date
-
-                # Collect image URLs from within .classifiedDetailPhotos (all pictures)
-                # - Consider both <img> (src or data-src) and <source> (srcset)
-                # - Prefer non-AVIF URLs; if AVIF, attempt .jpg fallback as site supports both
-                image_urls: list[str] = []
-                skip_image_download = False
-                if not no_images:
-                    # Fast pre-check: if existing listing already has valid images, skip collection and downloads
-                    if existing_listing:
-                        try:
-                            imgs = list(listing.images.all())
-                            if imgs:
-                                all_ok = True
-                                for im in imgs:
-                                    f = getattr(im, 'image', None)
-                                    name = getattr(f, 'name', None) if f else None
-                                    if not f or not name:
-                                        all_ok = False
-                                        break
-                                    try:
-                                        if not f.storage.exists(name):
-                                            all_ok = False
-                                            break
-                                    except Exception:
-                                        all_ok = False
-                                        break
-                                if all_ok:
-                                    skip_image_download = True
-                                    dbg("Existing listing images are valid; skipping image collection and download")
-                        except Exception:
-                            pass
+                def record(idx: int, url: str, status: str, listing_id=None, message: str = "") -> None:
+                    if journal is not None:
+                        journal.record(url, status, idx, listing_id, message)
 
+                for idx, url in enumerate(urls, start=1):
+                    cached = cache.get(url) if cache is not None else None
+                    dbg(f"[{idx}/{len(urls)}] {'Cached' if cached is not None else 'Goto'}: {url}")
+                    page = context.new_page()
+                    page.set_default_timeout(timeout)
                     try:
-                        if skip_image_download:
-                            raise Exception("skip-image-collection")
-                        seen: set[str] = set()
-                        container = page.locator("div.classifiedDetailPhotos")
-
-                        # Helper to normalize a single URL (prefer JPG if AVIF)
-                        def normalize_url(u: str) -> str:
-                            u = (u or "").strip()
-                            if not u:
-                                return ""
-                            # If srcset provides descriptors (e.g., "... 1x"), take just the URL
-                            first_part = u.split()[0]
-                            # Convert .avif to .jpg (server provides jpg fallback)
-                            return re.sub(r"\.avif(?:\?.*)?$", ".jpg", first_part)
-
-                        # 1) <img> elements (prefer data-src when present)
-                        try:
-                            imgs = container.locator("img") if container.count() else page.locator(".classifiedDetailPhotos img")
-                            for i in range(imgs.count()):
-                                node = imgs.nth(i)
-                                cand = node.get_attribute("data-src") or node.get_attribute("src")
-                                if not cand:
-                                    continue
-                                cand = normalize_url(cand)
-                                if not cand:
-                                    continue
-                                # Skip placeholders and non-http
-                                if cand.startswith("data:") or "blank" in cand or not cand.startswith("http"):
-                                    continue
-                                if cand not in seen:
-                                    seen.add(cand)
-                                    image_urls.append(cand)
-                        except Exception:
-                            pass
+                        if cached is not None:
+                            load_cached_page(page, cached)
+                        else:
+                            page.goto(url, wait_until="domcontentloaded")
+                    except Exception as e:
+                        self.stdout.write(self.style.WARNING(f"[{idx}] Navigation failed: {e} -> {url}"))
+                        skipped += 1
+                        record(idx, url, import_pool.FAILED, message=f"navigation failed: {e}")
+                        continue
 
-                        # 2) <source> elements (any type, parse srcset)
+                    # Optional page HTML save
+                    if save_dir:
                         try:
-                            sources = container.locator("source") if container.count() else page.locator(".classifiedDetailPhotos source")
-                            for i in range(sources.count()):
-                                srcset = sources.nth(i).get_attribute("srcset")
-                                if not srcset:
-                                    continue
-                                # srcset may contain multiple entries separated by commas
-                                for part in srcset.split(','):
-                                    cand = normalize_url(part)
-                                    if not cand:
-                                        continue
-                                    if cand.startswith("data:") or "blank" in cand or not cand.startswith("http"):
-                                        continue
-                                    if cand not in seen:
-                                        seen.add(cand)
-                                        image_urls.append(cand)
-                        except Exception:
-                            pass
+                            save_dir.mkdir(parents=True, exist_ok=True)
+                            safe_name = re.sub(r"[^a-zA-Z0-9_-]", "_", url)[:180] + ".html"
+                            content = page.content()
+                            (save_dir / safe_name).write_text(content, encoding="utf-8")
+                            dbg(f"Saved HTML to: {(save_dir / safe_name)}")
+                        except Exception as e:
+                            dbg(f"Failed to save HTML: {e}")
+
+                    # Allow dynamic content to render
+                    try:
+                        page.wait_for_selector("div.classifiedDetailTitle >> h1", timeout=timeout)
+                    except Exception:
+                        dbg("Title selector not found within timeout; proceeding with current DOM")
 
-                        # Respect max images
-                        if images_max > 0:
-                            image_urls = image_urls[:images_max]
-                        dbg(f"Found {len(image_urls)} image candidates inside .classifiedDetailPhotos")
-                    except Exception as e:
-                        if str(e) == "skip-image-collection":
-                            pass
-                        else:
-                            dbg(f"Image extraction failed: {e}")
+                    title, details = read_title_and_details(page)
+                    dbg(f"Title: {title!r}")
 
-                # Pre-download image bytes so DB writes can happen in a safe thread
-                downloaded_images: list[tuple[str, bytes]] = []
-                if image_urls and not dry_run and not skip_image_download:
+                    # Price
+                    price_text = ""
                     try:
-                        sess = requests.Session()
-                        req_headers = {
-                            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
-                            "Accept": "image/avif,image/webp,image/*,*/*;q=0.8",
-                            "Referer": url,
-                        }
-                        if cookie_string:
-                            req_headers["Cookie"] = cookie_string
-                        for j, img_url in enumerate(image_urls, start=1):
+                        price_text = page.locator("div.classifiedInfo .classified-price-wrapper").first.inner_text().strip()
+                    except Exception:
+                        price_text = ""
+                    dbg(f"Price raw: {price_text!r} -> {clean_int_from_text(price_text)}")
+                    external_id = (details.get("İlan No") or details.get("Ilan No") or "").strip()
+
+                    # Bail early if page likely blocked/placeholder, with lightweight retries
+                    if is_blocked_page(title, external_id):
+                        blocked = True
+                        attempts = 0
+                        while blocked and attempts < retries:
+                            attempts += 1
+                            self.stdout.write(self.style.WARNING(f"[{idx}] Blocked/invalid page; retry {attempts}/{retries} after {cooldown:.1f}s"))
+                            if cooldown > 0:
+                                time.sleep(cooldown)
                             try:
-                                r = sess.get(img_url, headers=req_headers, timeout=20)
-                                if r.status_code == 200 and r.content:
-                                    fname = f"listing_{external_id or 'noid'}_{j}.jpg"
-                                    downloaded_images.append((fname, r.content))
-                                    if debug:
-                                        self.stdout.write(f"Downloaded image {j}/{len(image_urls)} ({len(r.content)} bytes)")
+                                if cached is not None:
+                                    # A cached copy that no longer parses is refetched.
+                                    cached = None
+                                    page.unroute("**/*")
+                                    page.goto(url, wait_until="domcontentloaded")
                                 else:
-                                    if debug:
-                                        self.stdout.write(f"Skipped image {j}: status={r.status_code}")
-                            except Exception as e:
-                                if debug:
-                                    self.stdout.write(f"Download failed for {img_url}: {e}")
+                                    page.reload(wait_until="domcontentloaded")
+                            except Exception:
+                                break
+                            title, details = read_title_and_details(page)
+                            external_id = (details.get("İlan No") or details.get("Ilan No") or "").strip()
+                            blocked = is_blocked_page(title, external_id)
+                        if blocked:
+                            self.stdout.write(self.style.WARNING(f"[{idx}] SKIP: missing/invalid listing markers after retries."))
+                            try:
+                                page.close()
+                            except Exception:
+                                pass
+                            skipped += 1
+                            record(idx, url, import_pool.BLOCKED, message="missing/invalid listing markers")
+                            if delay > 0:
+                                time.sleep(delay)
+                            continue
+                    if cache is not None and cached is None:
+                        cache.put(url, page.content())
+
+                    # Check if this listing already exists (by external_id or original_url)
+                    existing_listing = None
+                    try:
+                        existing_listing = run_in_thread(syncer.find, external_id, url)
                     except Exception as e:
-                        dbg(f"Image download session failed: {e}")
+                        dbg(f"Existing lookup failed: {e}")
 
-                if dry_run:
-                    self.stdout.write(
-                        f"[{idx}] DRY: title='{listing.title}' price={listing.price} city={listing.city} state={listing.state} address={listing.address}"
-                    )
-                    if connection.in_atomic_block:
-                        transaction.set_rollback(True)
-                else:
-                    dbg("Saving to DB and ensuring images" if existing_listing else "Saving new listing to DB")
-                    exc_holder = {}
+                    # Map link
+                    href = None
+                    try:
+                        href = page.locator("div.getDirectionsButton > a").first.get_attribute("href")
+                        if href:
+                            dbg(f"Map href: {href} -> lat/lon={extract_lat_lon_from_url(href)}")
+                    except Exception:
+                        pass
 
-                    def _thread_target():
-                        try:
-                            close_old_connections()
-                            listing.save(skip_geocode=skip_geocode)
-                            # If existing, verify images; if missing or broken, (re)attach
-                            def images_need_fix(l):
-                                try:
-                                    imgs = list(l.images.all())
-                                    if not imgs:
-                                        return True
-                                    for im in imgs:
-                                        f = getattr(im, 'image', None)
-                                        name = getattr(f, 'name', None) if f else None
-                                        if not f or not name:
-                                            return True
-                                        try:
-                                            if not f.storage.exists(name):
-                                                return True
-                                        except Exception:
-                                            return True
-                                    return False
-                                except Exception:
-                                    return True
-
-                            if not no_images:
-                                if existing_listing:
-                                    if images_need_fix(listing) and downloaded_images:
-                                        # Remove broken images only (or all if none valid)
-                                        for im in list(listing.images.all()):
-                                            try:
-                                                f = getattr(im, 'image', None)
-                                                name = getattr(f, 'name', None) if f else None
-                                                missing = (not f or not name)
-                                                try:
-                                                    if not missing:
-                                                        missing = not f.storage.exists(name)
-                                                except Exception:
-                                                    missing = True
-                                                if missing:
-                                                    im.delete()
-                                            except Exception:
-                                                pass
-                                        # If still no images, attach downloads
-                                        if listing.images.count() == 0:
-                                            for i_img, (fname, data) in enumerate(downloaded_images):
-                                                try:
-                                                    img = ListingImage(listing=listing, order=i_img, is_primary=(i_img == 0))
-                                                    img.image.save(fname, ContentFile(data), save=True)
-                                                except Exception:
-                                                    pass
-                                else:
-                                    if downloaded_images:
-                                        for i_img, (fname, data) in enumerate(downloaded_images):
-                                            try:
-                                                img = ListingImage(listing=listing, order=i_img, is_primary=(i_img == 0))
-                                                img.image.save(fname, ContentFile(data), save=True)
-                                            except Exception:
-                                                pass
-                        except BaseException as e:
-                            exc_holder["exc"] = e
-                        finally:
-                            close_old_connections()
+                    # Breadcrumbs for location
+                    texts: list[str] = []
+                    try:
+                        a_nodes = page.locator("a[data-click-label^='Adres Breadcrumb']")
+                        for i in range(a_nodes.count()):
+                            t = a_nodes.nth(i).inner_text().strip()
+                            if t:
+                                texts.append(t)
+                    except Exception:
+                        pass
+                    dbg(f"Breadcrumbs -> {texts!r}")
+
+                    fields = listing_fields({
+                        "url": url, "title": title, "price_text": price_text, "details": details,
+                        "map_href": href, "breadcrumbs": texts,
+                    }, defaults)
+                    dbg(
+                        f"Type: {fields['property_type']!r}; Beds: {fields['bedrooms']}; Baths: {fields['bathrooms']}; "
+                        f"m2={fields['m2_gross']} sqft={fields['sqft']}; date={fields.get('list_date')}"
+                    )
 
-                    t = threading.Thread(target=_thread_target, name="listing-save-thread", daemon=True)
-                    t.start()
-                    t.join()
-                    if "exc" in exc_holder:
-                        raise exc_holder["exc"]
-                    if existing_listing:
-                        updated += 1
-                        self.stdout.write(self.style.SUCCESS(f"[{idx}] Updated listing id={listing.id} ({lookup_source}) images verified"))
+                    # Collect image URLs from within .classifiedDetailPhotos (all pictures)
+                    # - Consider both <img> (src or data-src) and <source> (srcset)
+                    # - Prefer non-AVIF URLs; if AVIF, attempt .jpg fallback as site supports both
+                    image_urls: list[str] = []
+                    skip_image_download = False
+                    if not no_images:
+                        # Fast pre-check: if existing listing already has valid images, skip collection and downloads
+                        if existing_listing and run_in_thread(listing_images_ok, existing_listing):
+                            skip_image_download = True
+                            dbg("Existing listing images are valid; skipping image collection and download")
+                        else:
+                            img_candidates: list[str] = []
+                            srcsets: list[str] = []
+                            try:
+                                container = page.locator("div.classifiedDetailPhotos")
+                                imgs = container.locator("img") if container.count() else page.locator(".classifiedDetailPhotos img")
+                                for i in range(imgs.count()):
+                                    node = imgs.nth(i)
+                                    cand = node.get_attribute("data-src") or node.get_attribute("src")
+                                    if cand:
+                                        img_candidates.append(cand)
+                                sources = container.locator("source") if container.count() else page.locator(".classifiedDetailPhotos source")
+                                for i in range(sources.count()):
+                                    srcset = sources.nth(i).get_attribute("srcset")
+                                    if srcset:
+                                        srcsets.append(srcset)
+                            except Exception as e:
+                                dbg(f"Image extraction failed: {e}")
+                            image_urls = collect_image_urls(img_candidates, srcsets, images_max)
+                            dbg(f"Found {len(image_urls)} image candidates inside .classifiedDetailPhotos")
+
+                    # Pre-download image bytes so DB writes can happen in a safe thread
+                    downloaded_images: list[FetchedImage] = []
+                    if image_urls and not dry_run and not skip_image_download:
+                        downloaded_images = fetcher.fetch_many(image_urls, referer=url)
+
+                    if dry_run:
+                        self.stdout.write(
+                            f"[{idx}] DRY: title='{fields['title']}' price={fields['price']} city={fields['city']} state={fields['state']} address={fields['address']}"
+                        )
+                        if connection.in_atomic_block:
+                            transaction.set_rollback(True)
                     else:
-                        created += 1
-                        self.stdout.write(self.style.SUCCESS(f"[{idx}] Created listing id={listing.id} title='{listing.title}'"))
+                        dbg("Syncing existing listing and ensuring images" if existing_listing else "Saving new listing to DB")
+                        outcome = run_in_thread(
+                            sync_listing_with_images, syncer, fields, downloaded_images, no_images, fetcher,
+                        )
+                        listing = outcome.listing
+                        record(idx, url, outcome.status, listing.id, ", ".join(outcome.changed))
+                        if outcome.created:
+                            created += 1
+                            self.stdout.write(self.style.SUCCESS(f"[{idx}] Created listing id={listing.id} title='{listing.title}'"))
+                        elif outcome.changed:
+                            updated += 1
+                            self.stdout.write(self.style.SUCCESS(
+                                f"[{idx}] Updated listing id={listing.id} ({', '.join(outcome.changed)}) images verified"
+                            ))
+                        else:
+                            unchanged += 1
+                            self.stdout.write(f"[{idx}] Unchanged listing id={listing.id} images verified")
 
-                # Close page and delay between requests with tick logs in debug mode
-                try:
-                    page.close()
-                except Exception:
-                    pass
-                if delay > 0:
-                    if debug and delay >= 1.0:
-                        secs = int(delay)
-                        frac = delay - secs
-                        self.stdout.write(f"Sleeping {delay:.1f}s...")
-                        for i in range(secs):
-                            time.sleep(1)
-                            dbg(f"sleep tick {i+1}/{secs}")
-                        if frac > 0:
-                            time.sleep(frac)
-                    else:
-                        time.sleep(delay)
+                    # Close page and delay between requests with tick logs in debug mode
+                    try:
+                        page.close()
+                    except Exception:
+                        pass
+                    if delay > 0 and cached is None:
+                        if debug and delay >= 1.0:
+                            secs = int(delay)
+                            frac = delay - secs
+                            self.stdout.write(f"Sleeping {delay:.1f}s...")
+                            for i in range(secs):
+                                time.sleep(1)
+                                dbg(f"sleep tick {i+1}/{secs}")
+                            if frac > 0:
+                                time.sleep(frac)
+                        else:
+                            time.sleep(delay)
 
-            context.close()
-            browser.close()
+                context.close()
+                browser.close()
 
-        self.stdout.write(self.style.SUCCESS(f"Done. Created={created}, Updated={updated}, Skipped={skipped}, Total={len(urls)}"))
+        if journal is not None:
+            journal.close()
+        self.stdout.write(self.style.SUCCESS(f"Done. Created={created}, Updated={updated}, Unchanged={unchanged}, Skipped={skipped}, Total={len(urls)}"))
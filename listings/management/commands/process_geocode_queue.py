@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.db.models import Q
+
+from listings import geocoding
+from listings.models import GeocodeTask, Listing
+
+
+class Command(BaseCommand):
+    help = (
+        "Geocode queued listings (GeocodeTask) at the provider's rate limit. "
+        "Run a single instance; --forever keeps it polling for new tasks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=0, help="Tasks to process per pass (0 = all queued)")
+        parser.add_argument("--forever", action="store_true", help="Keep polling the queue instead of exiting when it is empty")
+        parser.add_argument("--poll-interval", type=float, default=10.0, help="Seconds to wait between polls of an empty queue")
+        parser.add_argument("--min-delay", type=float, default=None, help="Seconds between geocoder requests (default LISTING_GEOCODE_MIN_DELAY)")
+        parser.add_argument("--enqueue-missing", action="store_true", help="First queue every listing that has no coordinates")
+        parser.add_argument("--retry-failed", action="store_true", help="Re-queue tasks that failed or found nothing")
+
+    def handle(self, *args, **options):
+        try:
+            worker = geocoding.GeocodeWorker(min_delay=options.get("min_delay"), log=self.stdout.write)
+        except RuntimeError as e:
+            raise CommandError(str(e)) from e
+
+        if options.get("enqueue_missing"):
+            ids = Listing.objects.filter(Q(latitude__isnull=True) | Q(longitude__isnull=True)).values_list("pk", flat=True)
+            self.stdout.write(f"Queued {geocoding.enqueue_many(ids)} listing(s) missing coordinates.")
+        if options.get("retry_failed"):
+            requeued = GeocodeTask.objects.filter(status__in=[GeocodeTask.FAILED, GeocodeTask.NOT_FOUND]).update(
+                status=GeocodeTask.PENDING, attempts=0, last_error="",
+            )
+            self.stdout.write(f"Re-queued {requeued} failed task(s).")
+
+        limit = max(0, int(options.get("limit") or 0))
+        poll = max(0.5, float(options.get("poll_interval") or 10.0))
+        while True:
+            close_old_connections()
+            queued = worker.queued().count()
+            if queued:
+                self.stdout.write(f"{queued} task(s) queued")
+                counts = worker.run(limit=limit)
+                self.stdout.write(self.style.SUCCESS(
+                    "Geocoded {done}, not found {not_found}, failed {failed}.".format(
+                        done=counts[GeocodeTask.DONE], not_found=counts[GeocodeTask.NOT_FOUND],
+                        failed=counts[GeocodeTask.FAILED],
+                    )
+                ))
+                self.stdout.write(worker.cache.summary())
+            if not options.get("forever"):
+                return
+            if not queued:
+                time.sleep(poll)
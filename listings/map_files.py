@@ -0,0 +1,149 @@
+"""Access to the pre-generated per-listing map files.
+
+``newfrontend/maps/listing_<id>.html`` (or ``..._map_only.html``) are
+plain HTML exports with no template tags, so they are read straight from
+disk instead of being rendered. Anything derived from a file is cached
+in a bounded LRU keyed by (path, mtime): re-exporting a map replaces the
+entry on the next request.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.template import engines
+
+DEFAULT_CACHE_SIZE = 64
+
+_DATA_RE = re.compile(r"const\s+DATA\s*=\s*")
+
+
+class MapData(NamedTuple):
+    data: Dict[str, Any]
+    body: bytes  # ``data`` encoded as JSON
+    etag: str
+
+
+def map_template_names(listing_id, prefer_map_only: bool = False) -> Tuple[str, str]:
+    names = (
+        f'newfrontend/maps/listing_{listing_id}.html',
+        f'newfrontend/maps/listing_{listing_id}_map_only.html',
+    )
+    return names[::-1] if prefer_map_only else names
+
+
+def find_map_file(listing_id, prefer_map_only: bool = False) -> Optional[str]:
+    """Path of the map file the template loaders would pick, without loading it."""
+    for name in map_template_names(listing_id, prefer_map_only):
+        for loader in engines['django'].engine.template_loaders:
+            for sub in getattr(loader, 'loaders', [loader]):
+                for origin in sub.get_template_sources(name):
+                    if os.path.isfile(origin.name):
+                        return origin.name
+    return None
+
+
+def etag_for(body: bytes) -> str:
+    return '"%s"' % hashlib.md5(body).hexdigest()
+
+
+def extract_data(html: str) -> Optional[Dict[str, Any]]:
+    """The object literal assigned to ``const DATA`` in a map file."""
+    m = _DATA_RE.search(html)
+    if not m:
+        return None
+    try:
+        data, _ = json.JSONDecoder().raw_decode(html, m.end())
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+class FileCache:
+    """Bounded LRU of values derived from files, keyed by (path, mtime, kind)."""
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple[str, float, str], Any]' = OrderedDict()
+
+    def get(self, path: str, kind: str, build: Callable[[str], Any]) -> Any:
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        key = (path, mtime, kind)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = build(path)
+        with self._lock:
+            # Drop entries for older versions of the same file.
+            for stale in [k for k in self._entries if k[0] == path and k[2] == kind and k[1] != mtime]:
+                del self._entries[stale]
+            self._entries[key] = value
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+file_cache = FileCache(getattr(settings, 'LISTING_MAP_FILE_CACHE_SIZE', DEFAULT_CACHE_SIZE))
+
+
+def read_text(path: str) -> str:
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def _build_map_data(path: str) -> Optional[MapData]:
+    data = extract_data(read_text(path))
+    if data is None:
+        return None
+    body = json.dumps(data, cls=DjangoJSONEncoder).encode('utf-8')
+    return MapData(data, body, etag_for(body))
+
+
+def get_map_data(listing_id) -> Optional[MapData]:
+    """Parsed DATA of the listing's map file, or None if there is none."""
+    path = find_map_file(listing_id)
+    if path is None:
+        return None
+    return file_cache.get(path, 'data', _build_map_data)
+
+
+def _build_body_snippet(path: str) -> str:
+    raw = read_text(path)
+    # Keep only the <body> contents so the map can be inlined in a page.
+    low = raw.lower()
+    b0 = low.find('<body')
+    if b0 == -1:
+        return raw
+    b_tag_end = low.find('>', b0)
+    b1 = b_tag_end + 1 if b_tag_end != -1 else b0
+    b2 = low.rfind('</body>')
+    return raw[b1:b2] if b2 != -1 and b2 > b1 else raw
+
+
+def get_body_snippet(listing_id) -> Tuple[Optional[str], float]:
+    """(inline map HTML, file mtime) for the detail page; (None, 0) if absent."""
+    path = find_map_file(listing_id, prefer_map_only=True)
+    if path is None:
+        return None, 0
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None, 0
+    return file_cache.get(path, 'snippet', _build_body_snippet), mtime
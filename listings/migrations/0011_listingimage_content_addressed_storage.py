@@ -0,0 +1,20 @@
+# Generated by Django 4.2.26 on 2026-10-17 02:39
+
+from django.db import migrations, models
+import listings.models
+import listings.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0010_alter_listingimportjob_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='listingimage',
+            name='image',
+            field=models.ImageField(blank=True, storage=listings.storage.get_listing_image_storage, upload_to=listings.models.listing_image_upload_to),
+        ),
+    ]
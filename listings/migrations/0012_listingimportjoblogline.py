@@ -0,0 +1,29 @@
+# Generated by Django 4.2.26 on 2026-10-17 02:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0011_listingimage_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingImportJobLogLine',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField(blank=True, verbose_name='Text')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='log_lines', to='listings.listingimportjob', verbose_name='Import job')),
+            ],
+            options={
+                'verbose_name': 'Import job log line',
+                'verbose_name_plural': 'Import job log lines',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['job', 'id'], name='listings_joblog_job_id_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.26 on 2026-10-17 03:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0012_listingimportjoblogline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeTask',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=500, verbose_name='Query')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('not_found', 'Not found'), ('failed', 'Failed')], db_index=True, default='pending', max_length=16, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Attempts')),
+                ('last_error', models.CharField(blank=True, max_length=300, verbose_name='Last error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+                ('listing', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='geocode_task', to='listings.listing', verbose_name='Listing')),
+            ],
+            options={
+                'verbose_name': 'Geocode task',
+                'verbose_name_plural': 'Geocode tasks',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.26 on 2026-10-17 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0013_geocodetask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCache',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=500, unique=True, verbose_name='Normalized address')),
+                ('query', models.CharField(blank=True, max_length=500, verbose_name='Query')),
+                ('latitude', models.FloatField(blank=True, null=True, verbose_name='Latitude')),
+                ('longitude', models.FloatField(blank=True, null=True, verbose_name='Longitude')),
+                ('provider', models.CharField(blank=True, max_length=50, verbose_name='Provider')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+            ],
+            options={
+                'verbose_name': 'Geocode cache entry',
+                'verbose_name_plural': 'Geocode cache entries',
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.26 on 2026-10-17 03:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0014_geocodecache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndexVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=1)),
+            ],
+            options={
+                'verbose_name': 'Search index version',
+                'verbose_name_plural': 'Search index versions',
+            },
+        ),
+    ]
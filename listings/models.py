@@ -1,13 +1,18 @@
 from django.db import models
 from datetime import datetime
 from django.utils.timezone import timezone
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
 import time
 
 from realtors.models import Realtor
 from django.utils.translation import gettext_lazy as _
+from django.core.files import File
+from django.core.files.base import ContentFile
+import io
 import os
+import shutil
+import tempfile
+
+from .storage import get_listing_image_storage
 
 # Create your models here.
 
@@ -69,48 +74,85 @@ class Listing(models.Model):
     from_whom = models.CharField(max_length=100, blank=True)
     is_published = models.BooleanField(default=True)
     list_date = models.DateTimeField(default=datetime.now, blank=True)
+    # Change stamp: part of the detail page fragment cache keys. update() and
+    # bulk_update() callers set it themselves (see listings.fragments).
+    updated_at = models.DateTimeField(auto_now=True)
 
-    def geocode_address(self):
-        """Geocode the address using Nominatim. Skips if coordinates already set."""
-        # If we already have coordinates, don't overwrite them
-        if self.latitude is not None and self.longitude is not None:
-            return
-        if not any([self.address, self.city, self.state]):
-            return
-            
-        # Construct the full address
-        address_parts = [
-            self.address,
-            self.city,
-            self.state,
-            self.zipcode
-        ]
-        full_address = ", ".join(filter(None, address_parts))
-        
-        try:
-            geolocator = Nominatim(user_agent="coralcity_property")
-            location = geolocator.geocode(full_address)
-            if location:
-                self.latitude = location.latitude
-                self.longitude = location.longitude
-                # Don't save here - it will be saved in save() method
-        except (GeocoderTimedOut, GeocoderServiceError):
-            # If geocoding fails, we'll just leave coordinates as they are
-            pass
+    ADDRESS_FIELDS = ('address', 'city', 'state', 'zipcode')
+    # Compared against the loaded row to decide whether a save needs geocoding.
+    TRACKED_FIELDS = ADDRESS_FIELDS + ('latitude', 'longitude')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = instance._tracked_values()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        # Also how deferred fields load: the snapshot follows the reloaded values.
+        refreshed = self._tracked_values()
+        if fields is not None:
+            loaded = getattr(self, '_loaded_values', None)
+            if loaded is None:
+                return
+            refreshed = dict(loaded, **{name: value for name, value in refreshed.items() if name in fields})
+        self._loaded_values = refreshed
+
+    def _tracked_values(self):
+        # Deferred fields are absent from __dict__ and left out.
+        return {name: self.__dict__[name] for name in self.TRACKED_FIELDS if name in self.__dict__}
+
+    def changed_fields(self):
+        """Tracked fields that differ from the stored row, or None when that is unknown.
+
+        Unknown means the instance was not loaded from the database, or a
+        tracked field was deferred at load time and has been set since.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        current = self._tracked_values()
+        if any(name not in loaded for name in current):
+            return None
+        return {name for name, value in current.items() if loaded[name] != value}
+
+    def address_changed(self):
+        """Whether the address differs from the stored row; None when that is unknown."""
+        changed = self.changed_fields()
+        return None if changed is None else bool(changed.intersection(self.ADDRESS_FIELDS))
+
+    def _clear_coords_if_moved(self):
+        """Drop coordinates that belong to the old address; True if they were dropped.
+
+        Done here rather than in a pre_save receiver: by then Django has
+        already chosen the columns to write for deferred or update_fields saves.
+        """
+        if not self.pk:
+            return False
+        moved = self.address_changed()
+        if moved is None:
+            # Not loaded from the database: compare with the stored row.
+            old = Listing.objects.filter(pk=self.pk).values(*self.ADDRESS_FIELDS).first()
+            moved = old is not None and any(old[name] != getattr(self, name) for name in self.ADDRESS_FIELDS)
+        if moved:
+            self.latitude = None
+            self.longitude = None
+        return moved
 
     def save(self, *args, **kwargs):
-        # Allow callers to skip geocoding (used by importers or deferred workflows)
+        # Callers may skip queueing a geocode (importers deferring it to a later batch)
         skip_geocode = kwargs.pop("skip_geocode", False)
-        # Only geocode when we don't already have coordinates and the address changed/adding
-        should_geocode = False
-        if self.latitude is None or self.longitude is None:
-            if self._state.adding:
-                should_geocode = True
-            elif getattr(self, '_address_changed', False):
-                should_geocode = True
-        if should_geocode and not skip_geocode:
-            self.geocode_address()
+        adding = self._state.adding
+        if not adding and self._clear_coords_if_moved() and kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = set(kwargs["update_fields"]) | {"latitude", "longitude"}
+        changed = self.changed_fields()
         super().save(*args, **kwargs)
+        self._loaded_values = self._tracked_values()
+        if not skip_geocode and (adding or changed is None or changed):
+            # Never geocoded inline: listings missing coordinates get a GeocodeTask.
+            from .geocoding import enqueue
+            enqueue(self)
 
     def __str__(self):
         return self.title
@@ -133,7 +175,9 @@ class ListingImage(models.Model):
     listing = models.ForeignKey(
         Listing, on_delete=models.CASCADE, related_name="images"
     )
-    image = models.ImageField(upload_to=listing_image_upload_to, blank=True)
+    image = models.ImageField(
+        upload_to=listing_image_upload_to, storage=get_listing_image_storage, blank=True
+    )
     title = models.CharField(max_length=255, blank=True)
     order = models.PositiveIntegerField(default=0)
     is_primary = models.BooleanField(default=False)
@@ -158,19 +202,13 @@ class ListingImage(models.Model):
                 pk=self.pk
             ).update(is_primary=False)
 
-        # If a crop is requested, attempt to crop using Pillow before saving
+        # If a crop is requested, crop with Pillow into a new blob; the old
+        # file may be shared with other images and is never modified.
         did_crop = False
         try:
-            if self.image and all([
-                self.crop_x is not None,
-                self.crop_y is not None,
-                self.crop_width is not None,
-                self.crop_height is not None,
-            ]):
+            if self.image and self.is_croppable:
                 from PIL import Image
-                import os
-                img_path = self.image.path
-                with Image.open(img_path) as im:
+                with self.image.open('rb') as fh, Image.open(fh) as im:
                     x = int(self.crop_x or 0)
                     y = int(self.crop_y or 0)
                     w = int(self.crop_width or 0)
@@ -184,8 +222,9 @@ class ListingImage(models.Model):
                         h = max(1, min(h, H - y))
                         box = (x, y, x + w, y + h)
                         im_cropped = im.crop(box)
-                        # Overwrite original file
-                        im_cropped.save(img_path)
+                        buf = io.BytesIO()
+                        im_cropped.save(buf, format=im.format or 'JPEG')
+                        self.image.save(os.path.basename(self.image.name), ContentFile(buf.getvalue()), save=False)
                         did_crop = True
         except Exception:
             pass
@@ -195,6 +234,40 @@ class ListingImage(models.Model):
             self.crop_x = self.crop_y = self.crop_width = self.crop_height = None
 
         super().save(*args, **kwargs)
+        self._release_replaced_image()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_image = instance.__dict__.get('image')
+        return instance
+
+    def _release_replaced_image(self):
+        old = getattr(self, '_stored_image', None)
+        old = getattr(old, 'name', old)
+        self._stored_image = self.image.name
+        if old and old != self.image.name:
+            self.image.storage.release_on_commit(old)
+
+    def rewrite_image(self, edit):
+        """Apply ``edit(path)`` to a private copy and store the result as a new blob.
+
+        In-place editors (watermark, crop, frame) go through here so images
+        sharing the same blob are left untouched.
+        """
+        if not self.image:
+            return
+        ext = os.path.splitext(self.image.name)[1] or '.jpg'
+        fd, tmp_path = tempfile.mkstemp(suffix=ext)
+        try:
+            with os.fdopen(fd, 'wb') as out, self.image.open('rb') as src:
+                shutil.copyfileobj(src, out)
+            edit(tmp_path)
+            with open(tmp_path, 'rb') as fh:
+                self.image.save(os.path.basename(self.image.name), File(fh), save=False)
+        finally:
+            os.unlink(tmp_path)
+        self.save()
 
 
     # Convenience property to filter visible images from templates via listing.visible_images
@@ -254,3 +327,99 @@ class ListingImportJob(models.Model):
 
     def __str__(self):
         return f"Import Job #{self.pk or 'new'} for {getattr(self.realtor, 'name', 'realtor')}"
+
+    def log_text(self, tail=None):
+        """The job output: the legacy ``log`` blob, then the last ``tail`` log lines (all when None)."""
+        lines = self.log_lines.order_by('-id').values_list('text', flat=True)
+        if tail is not None:
+            lines = lines[:tail]
+        text = '\n'.join(reversed(list(lines)))
+        return (self.log or '') + text
+
+
+class ListingImportJobLogLine(models.Model):
+    """One line of a ListingImportJob's output, appended in batches by ``importer.DBLogStream``."""
+
+    job = models.ForeignKey(ListingImportJob, on_delete=models.CASCADE, related_name='log_lines', verbose_name=_('Import job'))
+    text = models.TextField(blank=True, verbose_name=_('Text'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Created at'))
+
+    class Meta:
+        ordering = ['id']
+        indexes = [models.Index(fields=['job', 'id'], name='listings_joblog_job_id_idx')]
+        verbose_name = _('Import job log line')
+        verbose_name_plural = _('Import job log lines')
+
+    def __str__(self):
+        return self.text
+
+
+class GeocodeTask(models.Model):
+    """A listing waiting for coordinates; drained by ``process_geocode_queue``."""
+
+    PENDING = 'pending'
+    DONE = 'done'
+    NOT_FOUND = 'not_found'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, _('Pending')),
+        (DONE, _('Done')),
+        (NOT_FOUND, _('Not found')),
+        (FAILED, _('Failed')),
+    ]
+
+    listing = models.OneToOneField(Listing, on_delete=models.CASCADE, related_name='geocode_task', verbose_name=_('Listing'))
+    # The address that was queued; a different address re-queues the listing.
+    query = models.CharField(max_length=500, verbose_name=_('Query'))
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING, db_index=True, verbose_name=_('Status'))
+    attempts = models.PositiveIntegerField(default=0, verbose_name=_('Attempts'))
+    last_error = models.CharField(max_length=300, blank=True, verbose_name=_('Last error'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Created at'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Updated at'))
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = _('Geocode task')
+        verbose_name_plural = _('Geocode tasks')
+
+    def __str__(self):
+        return f"{self.listing_id}: {self.query} ({self.status})"
+
+
+class GeocodeCache(models.Model):
+    """A geocoder answer for one normalized address, shared by every listing there.
+
+    ``latitude``/``longitude`` are empty for an address the provider did not
+    find; such entries expire after LISTING_GEOCODE_NEGATIVE_TTL seconds.
+    """
+
+    key = models.CharField(max_length=500, unique=True, verbose_name=_('Normalized address'))
+    query = models.CharField(max_length=500, blank=True, verbose_name=_('Query'))
+    latitude = models.FloatField(null=True, blank=True, verbose_name=_('Latitude'))
+    longitude = models.FloatField(null=True, blank=True, verbose_name=_('Longitude'))
+    provider = models.CharField(max_length=50, blank=True, verbose_name=_('Provider'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Updated at'))
+
+    class Meta:
+        verbose_name = _('Geocode cache entry')
+        verbose_name_plural = _('Geocode cache entries')
+
+    def __str__(self):
+        return self.key
+
+    @property
+    def found(self) -> bool:
+        return self.latitude is not None and self.longitude is not None
+
+
+class SearchIndexVersion(models.Model):
+    """One-row counter shared by every process; see ``listings.search_index``."""
+
+    version = models.PositiveBigIntegerField(default=1)
+
+    class Meta:
+        verbose_name = _('Search index version')
+        verbose_name_plural = _('Search index versions')
+
+    def __str__(self):
+        return str(self.version)
@@ -0,0 +1,255 @@
+"""Concurrent, pooled page downloads for import_listings_from_links.
+
+``fetch_pages`` runs an asyncio fetch stage on a background thread and
+yields one ``import_pool.UrlResult`` per URL as pages come in, so the
+caller keeps its database work on its own thread. All requests share one
+pooled client: httpx (HTTP/2 when ``h2`` is installed) if available,
+otherwise a ``requests.Session`` driven from threads. At most ``per_host``
+requests hit one host at a time, and page loads are paced by a jittered
+per-domain token bucket. Parsing is CPU-bound, so ``ParsePool`` hands it
+to worker processes and the fetch loop never waits on it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import importlib.util
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import import_pool
+from .checkpoints import FetchCache
+from .page_parsers import get_page_parser
+
+try:
+    import httpx
+except Exception:
+    httpx = None
+
+# httpx only speaks HTTP/2 when h2 is installed.
+HTTP2_AVAILABLE = httpx is not None and importlib.util.find_spec("h2") is not None
+
+# Neither client decodes br bodies without brotli, so only ask for them then.
+ACCEPT_ENCODING = "gzip, deflate, br" if importlib.util.find_spec("brotli") else "gzip, deflate"
+
+FETCHED = 'fetched'
+
+# Worth another attempt after a backoff; any other non-200 is final.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+FETCH_ERRORS = (requests.RequestException,) + ((httpx.HTTPError,) if httpx is not None else ())
+
+
+class Page(NamedTuple):
+    status: int
+    text: str
+    http_version: str
+
+
+class PageClient:
+    """One connection pool shared by every fetch worker."""
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None, max_connections: int = 8,
+                 per_host: int = 2, timeout: float = 20, http2: bool = True):
+        self.headers = dict(headers or {})
+        self.max_connections = max(1, max_connections)
+        self.per_host = max(1, per_host)
+        self.timeout = timeout
+        self.http2 = bool(http2) and HTTP2_AVAILABLE
+        self.backend = "httpx" if httpx is not None else "requests"
+        self._client = None
+        self._session: Optional[requests.Session] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+
+    async def __aenter__(self) -> 'PageClient':
+        if httpx is not None:
+            limits = httpx.Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=self.max_connections)
+            self._client = httpx.AsyncClient(headers=self.headers, http2=self.http2, limits=limits,
+                                             timeout=self.timeout, follow_redirects=True)
+        else:
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.max_connections, pool_maxsize=self.max_connections)
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+            self._session.headers.update(self.headers)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+        if self._session is not None:
+            self._session.close()
+
+    def _slot(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).hostname or ''
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.per_host)
+        return slot
+
+    async def get(self, url: str) -> Page:
+        async with self._slot(url):
+            if self._client is not None:
+                resp = await self._client.get(url)
+                return Page(resp.status_code, resp.text, resp.http_version)
+            resp = await asyncio.to_thread(self._session.get, url, timeout=self.timeout)
+            return Page(resp.status_code, resp.text, "HTTP/1.1")
+
+
+_worker_parser = None
+
+
+def _init_parse_worker(backend: str) -> None:
+    global _worker_parser
+    _worker_parser = get_page_parser(backend)
+
+
+def _parse_in_worker(html: str, url: str) -> dict:
+    return _worker_parser.parse(html, url)
+
+
+class ParsePool:
+    """``PageParser.parse`` in ``workers`` processes, or in a thread when 0.
+
+    Raises ValueError for an unknown or missing backend, like
+    ``get_page_parser``.
+    """
+
+    def __init__(self, backend: Optional[str] = "auto", workers: int = 0):
+        self.parser = get_page_parser(backend)
+        self.workers = max(0, int(workers))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        if self.workers:
+            # spawn: the pool starts from the fetch thread, and forking a
+            # threaded process is unsafe.
+            self._executor = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_parse_worker, initargs=(self.parser.name,),
+            )
+
+    async def parse(self, html: str, url: str) -> dict:
+        if self._executor is None:
+            return await asyncio.to_thread(self.parser.parse, html, url)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, _parse_in_worker, html, url)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> 'ParsePool':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def fetch_pages(
+    urls: List[str],
+    client: PageClient,
+    parse_pool: ParsePool,
+    *,
+    concurrency: int = 4,
+    rate: float = 0.0,
+    burst: int = 1,
+    jitter: float = 0.0,
+    retries: int = 2,
+    cooldown: float = 5.0,
+    on_page: Optional[Callable[[str, Page], None]] = None,
+    cache: Optional[FetchCache] = None,
+) -> Iterator[import_pool.UrlResult]:
+    """Fetch and parse ``urls``, yielding a result per URL as each one finishes.
+
+    Parsed pages come back as FETCHED with the raw field dict as payload and
+    the HTTP version as message; the rest are SKIPPED (non-200) or FAILED.
+    429 and 5xx answers and network errors are retried ``retries`` times
+    with a jittered exponential backoff starting at ``cooldown`` seconds.
+    ``on_page(url, page)`` runs in a thread for every 200 response. With a
+    ``cache``, cached pages are parsed without a request (message "cache",
+    0 attempts) and every 200 response is stored.
+    """
+    results: queue.Queue = queue.Queue()
+    done = object()
+    stop = threading.Event()
+
+    async def run() -> import_pool.ImportSummary:
+        limiter = import_pool.DomainRateLimiter(rate, burst, jitter)
+
+        async def open_worker(n: int) -> import_pool.Backoff:
+            return import_pool.Backoff(base=cooldown or 1.0)
+
+        async def close_worker(backoff) -> None:
+            return None
+
+        async def process(backoff, index: int, url: str) -> import_pool.UrlResult:
+            if cache is not None:
+                html = await asyncio.to_thread(cache.get, url)
+                if html is not None:
+                    raw = await parse_pool.parse(html, url)
+                    return import_pool.UrlResult(index, url, FETCHED, 0, "cache", payload=raw)
+            status, message = import_pool.SKIPPED, "cancelled"
+            attempts = 0
+            while attempts <= retries and not stop.is_set():
+                attempts += 1
+                await limiter.acquire(url)
+                try:
+                    page = await client.get(url)
+                except FETCH_ERRORS as e:
+                    status, message = import_pool.FAILED, f"request failed: {e}"
+                else:
+                    if page.status == 200:
+                        backoff.reset()
+                        if on_page is not None:
+                            await asyncio.to_thread(on_page, url, page)
+                        if cache is not None:
+                            await asyncio.to_thread(cache.put, url, page.text)
+                        raw = await parse_pool.parse(page.text, url)
+                        return import_pool.UrlResult(index, url, FETCHED, attempts, page.http_version, payload=raw)
+                    status, message = import_pool.SKIPPED, f"HTTP {page.status}"
+                    if page.status not in RETRY_STATUSES:
+                        break
+                if attempts <= retries:
+                    await asyncio.sleep(backoff.next_delay())
+            return import_pool.UrlResult(index, url, status, attempts, message)
+
+        async def write(result: import_pool.UrlResult) -> import_pool.UrlResult:
+            return result
+
+        async with client:
+            return await import_pool.run_pool(
+                urls, concurrency, open_worker, close_worker, process, write,
+                # A copy: the pool drops the payload from its own record next.
+                on_result=lambda result: results.put(dataclasses.replace(result)),
+            )
+
+    def target() -> None:
+        try:
+            asyncio.run(run())
+        except BaseException as e:
+            results.put(e)
+        finally:
+            results.put(done)
+
+    thread = threading.Thread(target=target, name="page-fetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = results.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # If the consumer stopped early (error, Ctrl-C), the remaining URLs
+        # are cancelled; a worker asleep in a backoff is not waited for.
+        stop.set()
+        thread.join(timeout=5)
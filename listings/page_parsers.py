@@ -0,0 +1,222 @@
+"""HTML backends that reduce a Sahibinden detail page to a raw field dict.
+
+All backends return the dict described in ``listings.parsing``. The
+selectors are compiled once when a parser is built; build one parser per
+import run and reuse it for every page. ``get_page_parser('auto')`` picks
+the fastest installed backend: selectolax, then lxml, then BeautifulSoup
+(which also uses lxml as its tree builder when it is available).
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxHTMLParser
+except Exception:
+    try:
+        # selectolax < 0.3.13 only ships the Modest backend.
+        from selectolax.parser import HTMLParser as SelectolaxHTMLParser
+    except Exception:
+        SelectolaxHTMLParser = None
+
+try:
+    from lxml import etree as lxml_etree
+    from lxml import html as lxml_html
+except Exception:
+    lxml_etree = None
+    lxml_html = None
+
+try:
+    import soupsieve
+    from bs4 import BeautifulSoup
+except Exception:
+    soupsieve = None
+    BeautifulSoup = None
+
+TITLE = "div.classifiedDetailTitle > h1"
+TITLE_FALLBACK = "h1"
+PRICE = "div.classifiedInfo .classified-price-wrapper"
+DETAIL_ITEMS = "ul.classifiedInfoList > li"
+MAP_LINK = "div.getDirectionsButton > a"
+BREADCRUMBS = 'a[data-click-label^="Adres Breadcrumb"]'
+META_DESCRIPTION = 'meta[name="description"]'
+
+
+def _raw(url, title, price_text, details, map_href, breadcrumbs, meta_description) -> dict:
+    return {
+        "url": url,
+        "title": title,
+        "price_text": price_text,
+        "details": details,
+        "map_href": map_href,
+        "breadcrumbs": [t for t in breadcrumbs if t],
+        "meta_description": meta_description or "",
+    }
+
+
+class PageParser:
+    name = ""
+
+    def parse(self, html: str, url: str = "") -> dict:
+        raise NotImplementedError
+
+
+class SoupPageParser(PageParser):
+    name = "bs4"
+
+    def __init__(self):
+        if BeautifulSoup is None:
+            raise ValueError("beautifulsoup4 is not installed")
+        self.features = "lxml" if lxml_html is not None else "html.parser"
+        self._sel = {
+            key: soupsieve.compile(sel)
+            for key, sel in {
+                "title": TITLE, "title_fallback": TITLE_FALLBACK, "price": PRICE, "items": DETAIL_ITEMS,
+                "map": MAP_LINK, "breadcrumbs": BREADCRUMBS, "meta": META_DESCRIPTION,
+            }.items()
+        }
+
+    def _text(self, soup, key: str) -> str:
+        node = self._sel[key].select_one(soup)
+        return node.get_text(strip=True) if node else ""
+
+    def from_soup(self, soup, url: str = "") -> dict:
+        details: Dict[str, str] = {}
+        for li in self._sel["items"].select(soup):
+            key_el, val_el = li.find("strong"), li.find("span")
+            if key_el and val_el:
+                key = key_el.get_text(strip=True)
+                if key:
+                    details[key] = val_el.get_text(strip=True)
+        link = self._sel["map"].select_one(soup)
+        meta = self._sel["meta"].select_one(soup)
+        return _raw(
+            url,
+            self._text(soup, "title") or self._text(soup, "title_fallback"),
+            self._text(soup, "price"),
+            details,
+            link.get("href") if link else None,
+            [a.get_text(strip=True) for a in self._sel["breadcrumbs"].select(soup)],
+            meta.get("content") if meta else "",
+        )
+
+    def parse(self, html: str, url: str = "") -> dict:
+        return self.from_soup(BeautifulSoup(html, self.features), url)
+
+
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+class LxmlPageParser(PageParser):
+    name = "lxml"
+
+    def __init__(self):
+        if lxml_html is None:
+            raise ValueError("lxml is not installed")
+        xp = lxml_etree.XPath
+        self._title = xp(f"//div[{_has_class('classifiedDetailTitle')}]/h1")
+        self._title_fallback = xp("//h1")
+        self._price = xp(f"//div[{_has_class('classifiedInfo')}]//*[{_has_class('classified-price-wrapper')}]")
+        self._items = xp(f"//ul[{_has_class('classifiedInfoList')}]/li")
+        self._strong = xp(".//strong")
+        self._span = xp(".//span")
+        self._map = xp(f"//div[{_has_class('getDirectionsButton')}]/a")
+        self._breadcrumbs = xp("//a[starts-with(@data-click-label, 'Adres Breadcrumb')]")
+        self._meta = xp("//meta[@name='description']/@content")
+        # text() skips comments, matching BeautifulSoup's get_text().
+        self._texts = xp(".//text()")
+
+    def _text(self, node) -> str:
+        return "".join(t.strip() for t in self._texts(node))
+
+    def _first_text(self, query, root) -> str:
+        nodes = query(root)
+        return self._text(nodes[0]) if nodes else ""
+
+    def parse(self, html: str, url: str = "") -> dict:
+        root = lxml_html.fromstring(html)
+        details: Dict[str, str] = {}
+        for li in self._items(root):
+            key_el, val_el = self._strong(li), self._span(li)
+            if key_el and val_el:
+                key = self._text(key_el[0])
+                if key:
+                    details[key] = self._text(val_el[0])
+        links = self._map(root)
+        meta = self._meta(root)
+        return _raw(
+            url,
+            self._first_text(self._title, root) or self._first_text(self._title_fallback, root),
+            self._first_text(self._price, root),
+            details,
+            links[0].get("href") if links else None,
+            [self._text(a) for a in self._breadcrumbs(root)],
+            str(meta[0]) if meta else "",
+        )
+
+
+class SelectolaxPageParser(PageParser):
+    name = "selectolax"
+
+    def __init__(self):
+        if SelectolaxHTMLParser is None:
+            raise ValueError("selectolax is not installed")
+
+    @staticmethod
+    def _text(node) -> str:
+        # strip=True strips each text node, like BeautifulSoup's get_text(strip=True).
+        return node.text(deep=True, separator="", strip=True) if node is not None else ""
+
+    def parse(self, html: str, url: str = "") -> dict:
+        tree = SelectolaxHTMLParser(html)
+        details: Dict[str, str] = {}
+        for li in tree.css(DETAIL_ITEMS):
+            key_el, val_el = li.css_first("strong"), li.css_first("span")
+            if key_el is not None and val_el is not None:
+                key = self._text(key_el)
+                if key:
+                    details[key] = self._text(val_el)
+        link = tree.css_first(MAP_LINK)
+        meta = tree.css_first(META_DESCRIPTION)
+        return _raw(
+            url,
+            self._text(tree.css_first(TITLE)) or self._text(tree.css_first(TITLE_FALLBACK)),
+            self._text(tree.css_first(PRICE)),
+            details,
+            link.attributes.get("href") if link is not None else None,
+            [self._text(a) for a in tree.css(BREADCRUMBS)],
+            meta.attributes.get("content") if meta is not None else "",
+        )
+
+
+BACKENDS = {
+    SelectolaxPageParser.name: SelectolaxPageParser,
+    LxmlPageParser.name: LxmlPageParser,
+    SoupPageParser.name: SoupPageParser,
+}
+
+
+def available_backends() -> List[str]:
+    installed = {
+        SelectolaxPageParser.name: SelectolaxHTMLParser is not None,
+        LxmlPageParser.name: lxml_html is not None,
+        SoupPageParser.name: BeautifulSoup is not None,
+    }
+    return [name for name in BACKENDS if installed[name]]
+
+
+def get_page_parser(name: Optional[str] = "auto") -> PageParser:
+    """A parser for backend ``name``; 'auto' picks the fastest one installed.
+
+    Raises ValueError when the backend is unknown or not installed.
+    """
+    if not name or name == "auto":
+        names = available_backends()
+        if not names:
+            raise ValueError("No HTML parser installed; install selectolax, lxml or beautifulsoup4")
+        name = names[0]
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown HTML parser backend: {name}")
+    return BACKENDS[name]()
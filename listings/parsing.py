@@ -0,0 +1,265 @@
+"""Field parsers shared by the Sahibinden importers.
+
+Every scraper reduces a detail page to the same *raw* dict::
+
+    {"url", "title", "price_text", "details", "map_href", "breadcrumbs",
+     "meta_description"}
+
+where ``details`` maps the info-list labels ("Oda Sayısı", "İlan No", ...)
+to their text. ``listing_fields`` turns one raw dict into Listing field
+values; ``parse_listings`` does a whole batch and parses each distinct
+value of the repetitive columns (dates, "Emlak Tipi", room counts,
+yes/no answers) only once. All patterns are compiled at import time.
+"""
+
+from __future__ import annotations
+
+import re
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+_DIGITS_RE = re.compile(r"\d+")
+_NON_DIGITS_RE = re.compile(r"\D")
+_ROOMS_RE = re.compile(r"\s*(\d+)\s*\+")
+_LATLON_PATH_RE = re.compile(r"/(-?\d+\.\d+),(-?\d+\.\d+)")
+_LATLON_QUERY_RE = re.compile(r"[?&](?:q|ll)=(-?\d+\.\d+),(-?\d+\.\d+)")
+_META_LOCATION_RE = re.compile(
+    r"([\wÇĞİÖŞÜçğıöşü\s\.-]+?)\s+Mh\.?\s+([\wÇĞİÖŞÜçğıöşü\s\.-]+?)\s+([\wÇĞİÖŞÜçğıöşü\s\.-]+)"
+)
+
+# Turkish dotted/dotless I do not survive str.lower(); map them first.
+_TR_LOWER = str.maketrans({"I": "ı", "İ": "i"})
+
+MONTHS_TR = {
+    "ocak": 1,
+    "şubat": 2,
+    "subat": 2,
+    "mart": 3,
+    "nisan": 4,
+    "mayıs": 5,
+    "mayis": 5,
+    "haziran": 6,
+    "temmuz": 7,
+    "ağustos": 8,
+    "agustos": 8,
+    "eylül": 9,
+    "eylul": 9,
+    "ekim": 10,
+    "kasım": 11,
+    "kasim": 11,
+    "aralık": 12,
+    "aralik": 12,
+}
+
+TRUE_WORDS = frozenset({"evet", "var", "yes", "available"})
+FALSE_WORDS = frozenset({"hayır", "hayir", "yok", "no", "not available"})
+
+# Extra detail rows folded into the description, in this order.
+DESCRIPTION_KEYS = [
+    "Bina Yaşı",
+    "Bulunduğu Kat",
+    "Kat Sayısı",
+    "Isıtma",
+    "Balkon",
+    "Eşyalı",
+    "Aidat",
+]
+
+SQFT_PER_M2 = 10.7639
+
+
+def tr_lower(value: str) -> str:
+    return value.translate(_TR_LOWER).lower()
+
+
+def clean_int_from_text(text: str) -> int:
+    if not text:
+        return 0
+    digits = _DIGITS_RE.findall(str(text))
+    return int("".join(digits)) if digits else 0
+
+
+def parse_bedrooms_from_oda_sayisi(value: str) -> int:
+    # Turkish format like "1+1": the first number is the bedroom count
+    if not value:
+        return 0
+    m = _ROOMS_RE.match(value)
+    if m:
+        return int(m.group(1))
+    return clean_int_from_text(value)
+
+
+def parse_tr_date(value: str) -> Optional[datetime]:
+    """``"19 Kasım 2025"`` -> ``datetime(2025, 11, 19)``; None if unparseable."""
+    if not value:
+        return None
+    parts = str(value).strip().split()
+    if len(parts) < 3:
+        return None
+    month = MONTHS_TR.get(tr_lower(parts[1]))
+    day = _NON_DIGITS_RE.sub("", parts[0])
+    year = _NON_DIGITS_RE.sub("", parts[2])
+    if not month or not day or not year:
+        return None
+    try:
+        return datetime(int(year), month, int(day))
+    except ValueError:
+        return None
+
+
+def parse_deal_and_type(value: str) -> Tuple[Optional[str], str]:
+    """Parse Emlak Tipi like 'Kiralık Daire' into (deal_type, real_estate_type)."""
+    if not value:
+        return None, ""
+    value = value.strip()
+    v_low = tr_lower(value)
+    deal = None
+    if "kiralık" in v_low or "kiralik" in v_low:
+        deal = "kiralik"
+    elif "satılık" in v_low or "satilik" in v_low:
+        deal = "satis"
+    parts = value.split(None, 1)
+    return deal, parts[1] if len(parts) == 2 else value
+
+
+def extract_lat_lon_from_url(url: str) -> Tuple[Optional[float], Optional[float]]:
+    if not url:
+        return None, None
+    m = _LATLON_PATH_RE.search(url) or _LATLON_QUERY_RE.search(url)
+    if not m:
+        return None, None
+    return float(m.group(1)), float(m.group(2))
+
+
+def parse_location_from_breadcrumb_texts(texts: List[str]):
+    """(city, district, neighborhood) from breadcrumb texts, else (None, None, None)."""
+    texts = [t for t in texts if t]
+    if len(texts) >= 3:
+        return texts[0], texts[1], texts[-1]
+    return None, None, None
+
+
+def parse_location_from_meta(content: str):
+    """Fallback for pages without breadcrumbs: "Piri Reis Mh. Esenyurt İstanbul ..."."""
+    m = _META_LOCATION_RE.search(content or "")
+    if not m:
+        return None, None, None
+    return m.group(3).strip(), m.group(2).strip(), (m.group(1) + " Mh.").strip()
+
+
+def parse_bool_text(value: str) -> Optional[bool]:
+    if value is None:
+        return None
+    s = tr_lower(value.strip())
+    if s in TRUE_WORDS:
+        return True
+    if s in FALSE_WORDS:
+        return False
+    return None
+
+
+def detail(details: Dict[str, str], *labels: str) -> str:
+    """The first non-empty value among ``labels`` (accented spelling first)."""
+    for label in labels:
+        value = details.get(label)
+        if value:
+            return value.strip()
+    return ""
+
+
+class _Parsers(NamedTuple):
+    integer: Callable[[str], int]
+    rooms: Callable[[str], int]
+    date: Callable[[str], Optional[datetime]]
+    deal: Callable[[str], Tuple[Optional[str], str]]
+    boolean: Callable[[str], Optional[bool]]
+    lat_lon: Callable[[str], Tuple[Optional[float], Optional[float]]]
+
+
+_DIRECT = _Parsers(
+    clean_int_from_text, parse_bedrooms_from_oda_sayisi, parse_tr_date,
+    parse_deal_and_type, parse_bool_text, extract_lat_lon_from_url,
+)
+
+
+def _memoized(fn):
+    table = {}
+
+    def call(value):
+        try:
+            return table[value]
+        except KeyError:
+            result = table[value] = fn(value)
+            return result
+        except TypeError:  # unhashable input
+            return fn(value)
+    return call
+
+
+def _listing_fields(raw: dict, defaults: Dict[str, str], p: _Parsers) -> dict:
+    details = raw.get("details") or {}
+    deal_type, property_type = p.deal(detail(details, "Emlak Tipi"))
+    rooms_text = detail(details, "Oda Sayısı", "Oda Sayisi")
+    m2_gross = p.integer(detail(details, "m² (Brüt)", "m2 (Brut)"))
+    list_date = p.date(detail(details, "İlan Tarihi", "Ilan Tarihi"))
+    lat, lon = p.lat_lon(raw.get("map_href") or "")
+    city, district, neighborhood = parse_location_from_breadcrumb_texts(raw.get("breadcrumbs") or [])
+    if city is None and raw.get("meta_description"):
+        city, district, neighborhood = parse_location_from_meta(raw["meta_description"])
+
+    fields = dict(
+        title=raw.get("title") or "",
+        address=neighborhood or defaults.get("address", ""),
+        city=city or defaults.get("city", ""),
+        state=district or defaults.get("state", ""),
+        zipcode=defaults.get("zipcode", ""),
+        description=" | ".join(f"{k}: {details[k]}" for k in DESCRIPTION_KEYS if details.get(k)),
+        price=p.integer(raw.get("price_text") or ""),
+        bedrooms=p.rooms(rooms_text),
+        deal_type=deal_type or "satis",
+        property_type=property_type,
+        bathrooms=p.integer(detail(details, "Banyo Sayısı", "Banyo Sayisi")),
+        sqft=int(round(m2_gross * SQFT_PER_M2)) if m2_gross else 0,
+        lot_size=Decimal("0.0"),
+        external_id=detail(details, "İlan No", "Ilan No"),
+        ad_date=list_date.date() if list_date else None,
+        m2_gross=m2_gross or None,
+        m2_net=p.integer(detail(details, "m² (Net)", "m2 (Net)")) or None,
+        rooms_text=rooms_text,
+        building_age=p.integer(detail(details, "Bina Yaşı", "Bina Yasi")) or None,
+        floor_number=p.integer(detail(details, "Bulunduğu Kat", "Bulundugu Kat")) or None,
+        floors_total=p.integer(detail(details, "Kat Sayısı", "Kat Sayisi")) or None,
+        heating=detail(details, "Isıtma", "Isitma"),
+        kitchen_type=detail(details, "Mutfak", "Mutfak Tipi"),
+        balcony=detail(details, "Balkon"),
+        elevator=p.boolean(details.get("Asansör")),
+        parking_area=detail(details, "Otopark"),
+        furnished=p.boolean(details.get("Eşyalı") or details.get("Esyali")),
+        usage_status=detail(details, "Kullanım Durumu", "Kullanim Durumu"),
+        in_complex=p.boolean(details.get("Site İçerisinde") or details.get("Site Icerisinde")),
+        complex_name=detail(details, "Site Adı", "Site Adi"),
+        maintenance_fee=p.integer(detail(details, "Aidat", "Aidat (TL)")) or None,
+        deposit=p.integer(detail(details, "Depozito", "Depozito (TL)")) or None,
+        deed_status=detail(details, "Tapu Durumu"),
+        from_whom=detail(details, "Kimden"),
+        original_url=raw.get("url") or "",
+    )
+    if lat is not None and lon is not None:
+        fields["latitude"] = lat
+        fields["longitude"] = lon
+    if list_date:
+        fields["list_date"] = list_date
+    return fields
+
+
+def listing_fields(raw: dict, defaults: Optional[Dict[str, str]] = None) -> dict:
+    """Map one raw page dict to Listing field values."""
+    return _listing_fields(raw, defaults or {}, _DIRECT)
+
+
+def parse_listings(raws: Iterable[dict], defaults: Optional[Dict[str, str]] = None) -> List[dict]:
+    """``listing_fields`` for a batch; each distinct column value is parsed once."""
+    parsers = _Parsers(*(_memoized(fn) for fn in _DIRECT))
+    return [_listing_fields(raw, defaults or {}, parsers) for raw in raws]
+
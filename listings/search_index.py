@@ -0,0 +1,436 @@
+"""Process-local columnar snapshot of published listings.
+
+The chatbot search endpoint runs its filters, ordering and pagination as
+NumPy masks and argsorts over this snapshot instead of building an ORM
+chain per request; radius and nearest-neighbour lookups go through a
+``listings.geo.GridIndex`` kept alongside the columns. Receivers in ``listings.signals`` keep the snapshot in
+sync row by row. A version counter in the database (``SearchIndexVersion``)
+lets every process, web workers and management commands alike, notice
+when its copy was built before someone else's write. Writes bump it only
+once they have committed, so no process rebuilds from uncommitted rows
+under the new number.
+"""
+
+from __future__ import annotations
+
+import functools
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, F, Q
+
+from .geo import DEFAULT_CELL_KM, MAX_DISTANCE_KM, GridIndex, haversine_km
+from .models import Listing, SearchIndexVersion
+
+# Nullable integers are stored as float64 so NULL can be NaN; comparisons
+# against NaN are False, which matches how SQL drops NULLs in range filters.
+NUMERIC_FIELDS = (
+    'price', 'bedrooms', 'bathrooms', 'sqft', 'm2_net',
+    'building_age', 'floor_number', 'latitude', 'longitude',
+)
+# Nullable booleans: 1 / 0, with -1 for "unknown".
+FLAG_FIELDS = ('furnished', 'elevator', 'in_complex')
+# Low-cardinality strings interned into integer codes.
+TEXT_FIELDS = ('deal_type', 'property_type', 'city', 'state', 'rooms_text')
+
+ORDER_FIELDS = ('price', 'list_date', 'sqft', 'bedrooms', 'distance')
+
+_VALUE_FIELDS = ('id',) + NUMERIC_FIELDS + FLAG_FIELDS + TEXT_FIELDS + ('parking_area', 'list_date')
+
+
+class _Vocabulary:
+    """Interns strings into dense integer codes."""
+
+    def __init__(self):
+        self._codes: Dict[str, int] = {}
+        self._values: List[str] = []
+        self._lowered: List[str] = []
+
+    def code(self, value: Optional[str]) -> int:
+        value = value or ''
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self._values)
+            self._codes[value] = code
+            self._values.append(value)
+            self._lowered.append(value.lower())
+        return code
+
+    def value(self, code: int) -> str:
+        return self._values[code]
+
+    def containing(self, needle: str) -> np.ndarray:
+        """Codes whose string contains ``needle`` (case-insensitive)."""
+        needle = needle.lower()
+        return np.array(
+            [code for code, text in enumerate(self._lowered) if needle in text],
+            dtype=np.int32,
+        )
+
+
+def _published_rows(pks: Optional[Iterable[int]] = None):
+    qs = Listing.objects.filter(is_published=True)
+    if pks is not None:
+        qs = qs.filter(pk__in=list(pks))
+    qs = qs.annotate(
+        visible_image_count=Count('images', filter=Q(images__is_visible=True)),
+    )
+    return qs.values(*_VALUE_FIELDS, 'visible_image_count')
+
+
+def _nullable_float(value) -> float:
+    return np.nan if value is None else float(value)
+
+
+def _flag(value: Optional[bool]) -> int:
+    return -1 if value is None else int(bool(value))
+
+
+class ListingSnapshot:
+    """Column arrays for every published listing, one row per listing."""
+
+    def __init__(self, rows: Sequence[dict], version: int = 0):
+        self.version = version
+        self._lock = threading.RLock()
+        self._vocab = {name: _Vocabulary() for name in TEXT_FIELDS}
+        self._pos: Dict[int, int] = {}
+        self._dead = 0
+
+        columns: Dict[str, list] = {name: [] for name in self._column_names()}
+        for i, row in enumerate(rows):
+            for name, value in self._encode(row).items():
+                columns[name].append(value)
+            self._pos[row['id']] = i
+        self._cols: Dict[str, np.ndarray] = {
+            name: np.array(values, dtype=self._dtype(name))
+            for name, values in columns.items()
+        }
+        self._alive = np.ones(len(rows), dtype=bool)
+        self._build_grid()
+
+    @classmethod
+    def build(cls, version: int = 0) -> 'ListingSnapshot':
+        return cls(list(_published_rows()), version=version)
+
+    @staticmethod
+    def _column_names() -> Tuple[str, ...]:
+        return ('id',) + NUMERIC_FIELDS + FLAG_FIELDS + TEXT_FIELDS + (
+            'has_parking', 'list_date', 'image_count',
+        )
+
+    @staticmethod
+    def _dtype(name: str):
+        if name in ('id', 'image_count'):
+            return np.int64
+        if name in FLAG_FIELDS:
+            return np.int8
+        if name in TEXT_FIELDS:
+            return np.int32
+        if name == 'has_parking':
+            return bool
+        return np.float64
+
+    def _encode(self, row: dict) -> Dict[str, object]:
+        encoded: Dict[str, object] = {'id': row['id']}
+        for name in NUMERIC_FIELDS:
+            encoded[name] = _nullable_float(row[name])
+        for name in FLAG_FIELDS:
+            encoded[name] = _flag(row[name])
+        for name in TEXT_FIELDS:
+            encoded[name] = self._vocab[name].code(row[name])
+        encoded['has_parking'] = bool(row['parking_area'])
+        list_date = row['list_date']
+        encoded['list_date'] = list_date.timestamp() if list_date else np.nan
+        encoded['image_count'] = row['visible_image_count'] or 0
+        return encoded
+
+    def _build_grid(self) -> None:
+        self.grid = GridIndex(getattr(settings, 'LISTING_GEO_CELL_KM', DEFAULT_CELL_KM))
+        self.grid.add_many(
+            range(len(self._alive)), self._cols['latitude'], self._cols['longitude'],
+        )
+
+    def __len__(self) -> int:
+        return len(self._pos)
+
+    def __contains__(self, pk: int) -> bool:
+        return pk in self._pos
+
+    # -- incremental maintenance ---------------------------------------
+
+    def refresh(self, pk: int) -> None:
+        """Re-read one listing from the database and upsert or drop its row."""
+        row = next(iter(_published_rows([pk])), None)
+        with self._lock:
+            if row is None:
+                self._remove(pk)
+            else:
+                self._upsert(row)
+
+    def _upsert(self, row: dict) -> None:
+        encoded = self._encode(row)
+        pos = self._pos.get(row['id'])
+        if pos is not None:
+            for name, value in encoded.items():
+                self._cols[name][pos] = value
+            self.grid.add(pos, encoded['latitude'], encoded['longitude'])
+            return
+        # Append by rebinding to new arrays so queries already holding the
+        # previous arrays keep a consistent view.
+        self._cols = {
+            name: np.append(arr, np.array([encoded[name]], dtype=arr.dtype))
+            for name, arr in self._cols.items()
+        }
+        self._alive = np.append(self._alive, True)
+        pos = len(self._alive) - 1
+        self._pos[row['id']] = pos
+        self.grid.add(pos, encoded['latitude'], encoded['longitude'])
+
+    def _remove(self, pk: int) -> None:
+        pos = self._pos.pop(pk, None)
+        if pos is None:
+            return
+        alive = self._alive.copy()
+        alive[pos] = False
+        self._alive = alive
+        self.grid.discard(pos)
+        self._dead += 1
+        if self._dead > 32 and self._dead * 4 > len(alive):
+            self._compact()
+
+    def _compact(self) -> None:
+        keep = self._alive
+        self._cols = {name: arr[keep] for name, arr in self._cols.items()}
+        self._alive = np.ones(int(keep.sum()), dtype=bool)
+        self._pos = {int(pk): i for i, pk in enumerate(self._cols['id'])}
+        self._dead = 0
+        self._build_grid()
+
+    # -- querying ------------------------------------------------------
+
+    def query(self) -> 'SnapshotQuery':
+        with self._lock:
+            return SnapshotQuery(self, dict(self._cols), self._alive.copy())
+
+    def geo_candidates(self, lat: float, lng: float, radius_km: float) -> np.ndarray:
+        with self._lock:
+            return self.grid.candidates(lat, lng, radius_km)
+
+
+class SnapshotQuery:
+    """Accumulates a boolean mask over a snapshot, QuerySet-style.
+
+    Each method narrows the mask in place and returns ``self`` so calls can
+    be chained.
+    """
+
+    def __init__(self, snapshot: ListingSnapshot, cols: Dict[str, np.ndarray], mask: np.ndarray):
+        self._snapshot = snapshot
+        self._cols = cols
+        self.mask = mask
+        self._distance: Optional[np.ndarray] = None
+
+    def between(self, field: str, low: Optional[float] = None, high: Optional[float] = None) -> 'SnapshotQuery':
+        col = self._cols[field]
+        if low is not None:
+            self.mask &= col >= low
+        if high is not None:
+            self.mask &= col <= high
+        return self
+
+    def equals(self, field: str, value) -> 'SnapshotQuery':
+        if field in TEXT_FIELDS:
+            code = self._snapshot._vocab[field]._codes.get(value)
+            if code is None:
+                self.mask[:] = False
+                return self
+            value = code
+        self.mask &= self._cols[field] == value
+        return self
+
+    def contains(self, field: str, needle: str) -> 'SnapshotQuery':
+        codes = self._snapshot._vocab[field].containing(needle)
+        self.mask &= np.isin(self._cols[field], codes)
+        return self
+
+    def flag(self, field: str, value: bool) -> 'SnapshotQuery':
+        col = self._cols[field]
+        if col.dtype == bool:
+            self.mask &= col == value
+        else:
+            self.mask &= col == int(value)
+        return self
+
+    def has_images(self) -> 'SnapshotQuery':
+        self.mask &= self._cols['image_count'] > 0
+        return self
+
+    def within_bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> 'SnapshotQuery':
+        return self.between('latitude', min_lat, max_lat).between('longitude', min_lon, max_lon)
+
+    def _candidates(self, lat: float, lng: float, radius_km: float) -> np.ndarray:
+        rows = self._snapshot.geo_candidates(lat, lng, radius_km)
+        # The grid may already index rows appended after this query began.
+        rows = rows[rows < len(self.mask)]
+        return rows[self.mask[rows]]
+
+    def _set_distances(self, rows: np.ndarray, distances: np.ndarray) -> None:
+        self._distance = np.full(len(self.mask), np.nan)
+        self._distance[rows] = distances
+        keep = np.zeros(len(self.mask), dtype=bool)
+        keep[rows] = True
+        self.mask &= keep
+
+    def within_radius(self, lat: float, lng: float, radius_km: float) -> 'SnapshotQuery':
+        """Keep rows whose great-circle distance to (lat, lng) is <= radius_km."""
+        rows = self._candidates(lat, lng, radius_km)
+        distances = haversine_km(lat, lng, self._cols['latitude'][rows], self._cols['longitude'][rows])
+        inside = distances <= radius_km
+        self._set_distances(rows[inside], distances[inside])
+        return self
+
+    def nearest(self, lat: float, lng: float, k: int) -> 'SnapshotQuery':
+        """Keep the ``k`` matching rows closest to (lat, lng).
+
+        The search radius starts at one grid cell and doubles until it holds
+        ``k`` rows, so dense areas never touch the rest of the grid. Rows
+        inside the radius are exact; anything outside is farther than all
+        of them.
+        """
+        k = max(int(k), 0)
+        radius = self._snapshot.grid.cell_km
+        while True:
+            rows = self._candidates(lat, lng, radius)
+            distances = haversine_km(lat, lng, self._cols['latitude'][rows], self._cols['longitude'][rows])
+            inside = distances <= radius
+            if inside.sum() >= k or radius >= MAX_DISTANCE_KM:
+                break
+            radius *= 2
+        rows, distances = rows[inside], distances[inside]
+        order = np.lexsort((self._cols['id'][rows], distances))[:k]
+        self._set_distances(rows[order], distances[order])
+        return self
+
+    def with_distance_from(self, lat: float, lng: float) -> 'SnapshotQuery':
+        """Attach distances without filtering (rows lacking coordinates get NaN)."""
+        rows = np.flatnonzero(self.mask)
+        self._distance = np.full(len(self.mask), np.nan)
+        self._distance[rows] = haversine_km(
+            lat, lng, self._cols['latitude'][rows], self._cols['longitude'][rows],
+        )
+        return self
+
+    def distances_km(self) -> Dict[int, float]:
+        """Distance of each matching row from the last geo reference point."""
+        if self._distance is None:
+            return {}
+        rows = np.flatnonzero(self.mask)
+        return {
+            int(pk): float(d)
+            for pk, d in zip(self._cols['id'][rows], self._distance[rows])
+            if not np.isnan(d)
+        }
+
+    def count(self) -> int:
+        return int(self.mask.sum())
+
+    def values(self, field: str) -> np.ndarray:
+        """The column ``field`` restricted to matching rows."""
+        return self._cols[field][self.mask]
+
+    def label(self, field: str, code: int) -> str:
+        """Decode an interned text code back to its string."""
+        return self._snapshot._vocab[field].value(int(code))
+
+    def ids(self, order_field: str = 'list_date', descending: bool = True,
+            offset: int = 0, limit: Optional[int] = None) -> List[int]:
+        """Listing ids of the matching rows, ordered and sliced.
+
+        Ties are broken on id so pages are stable between requests.
+        """
+        rows = np.flatnonzero(self.mask)
+        if order_field == 'distance':
+            if self._distance is None:
+                raise ValueError('distance ordering needs a reference point')
+            keys = self._distance[rows]
+            # Listings without coordinates trail the results either way.
+            nulls_first = False
+        else:
+            keys = self._cols[order_field][rows]
+            # NULL sorts where the database puts it in ORDER BY: largest on
+            # PostgreSQL, smallest on SQLite and MySQL.
+            nulls_first = descending == connections[Listing.objects.db].features.nulls_order_largest
+        ids = self._cols['id'][rows]
+        nulls = np.isnan(keys)
+        keys = np.where(nulls, 0.0, keys)
+        placement = ~nulls if nulls_first else nulls
+        if descending:
+            order = np.lexsort((-ids, -keys, placement))
+        else:
+            order = np.lexsort((ids, keys, placement))
+        end = None if limit is None else offset + limit
+        return ids[order[offset:end]].tolist()
+
+
+# -- process-wide snapshot and cross-process versioning ------------------
+
+_lock = threading.Lock()
+_snapshot: Optional[ListingSnapshot] = None
+
+
+def _shared_version() -> int:
+    version = SearchIndexVersion.objects.filter(pk=1).values_list('version', flat=True).first()
+    if version is None:
+        version = SearchIndexVersion.objects.get_or_create(pk=1)[0].version
+    return version
+
+
+def _bump_version() -> int:
+    # A single UPDATE, so concurrent bumps from different processes never collide.
+    if not SearchIndexVersion.objects.filter(pk=1).update(version=F('version') + 1):
+        SearchIndexVersion.objects.get_or_create(pk=1, defaults={'version': 2})
+    return _shared_version()
+
+
+def get_snapshot() -> ListingSnapshot:
+    """Return this process's snapshot, rebuilding it if another process wrote since."""
+    global _snapshot
+    version = _shared_version()
+    with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = ListingSnapshot.build(version=version)
+        return _snapshot
+
+
+def _refresh_committed(pk: int) -> None:
+    with _lock:
+        current = _snapshot
+        version = _bump_version()
+        if current is None or current.version != version - 1:
+            # Never built here, or already behind: the next read rebuilds.
+            return
+        try:
+            current.refresh(pk)
+        except Exception:
+            # Leave the local copy behind the published version; it rebuilds.
+            return
+        current.version = version
+
+
+def refresh_listing(pk: int) -> None:
+    """Apply a single listing change to the local snapshot and publish a new version.
+
+    Runs once the current transaction commits (immediately outside one).
+    """
+    transaction.on_commit(functools.partial(_refresh_committed, pk))
+
+
+def mark_stale() -> None:
+    """Invalidate every process's snapshot once the current transaction commits.
+
+    For writes that bypass signals (bulk_create, bulk_update, update()).
+    """
+    transaction.on_commit(_bump_version)
@@ -1,68 +1,46 @@
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.conf import settings
+from django.db import transaction
 
-from .models import Listing
+from .models import Listing, ListingImage
+from . import fragments, search_index, thumbnails
 
-try:
-    from geopy.geocoders import Nominatim
-    from geopy.extra.rate_limiter import RateLimiter
-except Exception:
-    Nominatim = None
-    RateLimiter = None
 
+# Coordinates of a moved listing are cleared in Listing.save(); new ones come
+# later from the geocode queue (listings.geocoding), whose worker bumps the
+# shared index version itself.
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+def refresh_search_index(sender, instance: Listing, **kwargs):
+    # Applied after commit; other processes pick it up from the shared version.
+    search_index.refresh_listing(instance.pk)
 
-def _full_address(instance: Listing, country_hint: str = "") -> str:
-    parts = [instance.address, instance.city, instance.state, instance.zipcode]
-    if country_hint:
-        parts.append(country_hint)
-    return ", ".join([p for p in parts if p])
 
+@receiver(post_save, sender=ListingImage)
+@receiver(post_delete, sender=ListingImage)
+def refresh_search_index_for_image(sender, instance: ListingImage, **kwargs):
+    search_index.refresh_listing(instance.listing_id)
 
-@receiver(pre_save, sender=Listing)
-def clear_coords_on_address_change(sender, instance: Listing, **kwargs):
-    if not instance.pk:
-        return
-    try:
-        old = Listing.objects.get(pk=instance.pk)
-    except Listing.DoesNotExist:
-        return
-    addr_changed = any([
-        old.address != instance.address,
-        old.city != instance.city,
-        old.state != instance.state,
-        old.zipcode != instance.zipcode,
-    ])
-    if addr_changed:
-        instance.latitude = None
-        instance.longitude = None
 
-
-@receiver(post_save, sender=Listing)
-def geocode_if_missing(sender, instance: Listing, created, **kwargs):
-    if instance.latitude is not None and instance.longitude is not None:
+# Listing.save() moves the detail fragment stamp (updated_at) itself.
+@receiver(post_save, sender=ListingImage)
+@receiver(post_delete, sender=ListingImage)
+def invalidate_detail_fragments_for_image(sender, instance: ListingImage, **kwargs):
+    try:
+        fragments.invalidate_listing(instance.listing_id)
+    except Exception:
         return
 
-    # Only attempt when geopy is available
-    if Nominatim is None:
-        return
 
-    # Basic guard: need enough address info
-    if not any([instance.address, instance.city, instance.state, instance.zipcode]):
-        return
+@receiver(post_save, sender=ListingImage)
+def pregenerate_thumbnails(sender, instance: ListingImage, **kwargs):
+    name = instance.image.name if instance.image else ''
+    if name and getattr(settings, 'LISTING_THUMBNAILS_ON_SAVE', True):
+        transaction.on_commit(lambda: thumbnails.schedule([name]))
 
-    try:
-        geolocator = Nominatim(user_agent='coralcity_geocoder_signal')
-        geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1.0)
-        query = _full_address(instance)
-        location = geocode(query)
-        if location is None:
-            return
-        Listing.objects.filter(pk=instance.pk).update(
-            latitude=location.latitude,
-            longitude=location.longitude,
-        )
-    except Exception:
-        # Swallow errors to avoid breaking save paths
-        return
 
+@receiver(post_delete, sender=ListingImage)
+def release_image_blob(sender, instance: ListingImage, **kwargs):
+    # After commit: a rolled-back delete must still find its file.
+    instance.image.storage.release_on_commit(instance.image.name)
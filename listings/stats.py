@@ -0,0 +1,157 @@
+"""Inventory statistics computed in one pass over the listing snapshot.
+
+``chatbot_listings_stats`` used to issue a COUNT per price bucket and per
+feature plus several GROUP BYs. Everything here is derived from the
+columns of ``listings.search_index`` instead: histograms via
+``searchsorted``, group-bys via ``np.unique``. Results are memoized per
+(deal_type, city) under the search index version, the counter every
+process bumps in the database after a listing write commits, so a change
+made by another worker or a management command drops the memo here too.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from .search_index import SnapshotQuery, get_snapshot
+
+# Lower bounds (TL) between price buckets; override with
+# settings.LISTING_STATS_PRICE_BUCKETS.
+DEFAULT_PRICE_BUCKETS = (10000, 25000, 50000, 100000, 250000, 500000, 1000000)
+
+_MEMO_MAX = 256
+
+_memo_lock = threading.Lock()
+_memo: Dict[Tuple[int, Optional[str], Optional[str]], Dict[str, Any]] = {}
+
+
+def _short_amount(value: int) -> str:
+    for divisor, suffix in ((1000000, 'm'), (1000, 'k')):
+        if value >= divisor:
+            return f"{value / divisor:g}{suffix}"
+    return str(value)
+
+
+def price_bucket_labels(bounds: Sequence[int]) -> List[str]:
+    """Labels like ``under_10k``, ``10k_25k`` ... ``over_1m`` for ``bounds``."""
+    names = [_short_amount(b) for b in bounds]
+    labels = [f"under_{names[0]}"]
+    labels += [f"{lo}_{hi}" for lo, hi in zip(names, names[1:])]
+    labels.append(f"over_{names[-1]}")
+    return labels
+
+
+def _price_buckets() -> Tuple[int, ...]:
+    bounds = getattr(settings, 'LISTING_STATS_PRICE_BUCKETS', DEFAULT_PRICE_BUCKETS)
+    return tuple(sorted(int(b) for b in bounds))
+
+
+def _price_ranges(prices: np.ndarray, bounds: Sequence[int]) -> Dict[str, int]:
+    # side='right' puts a price equal to a bound into the bucket above it,
+    # matching the half-open [lo, hi) ranges of the original COUNT queries.
+    buckets = np.searchsorted(np.asarray(bounds, dtype=np.float64), prices, side='right')
+    counts = np.bincount(buckets, minlength=len(bounds) + 1)
+    return dict(zip(price_bucket_labels(bounds), (int(c) for c in counts)))
+
+
+def _group_counts(q: SnapshotQuery, field: str, top: Optional[int] = None,
+                  skip_empty: bool = False) -> List[Dict[str, Any]]:
+    codes, counts = np.unique(q.values(field), return_counts=True)
+    rows = [(q.label(field, code), int(count)) for code, count in zip(codes, counts)]
+    if skip_empty:
+        rows = [row for row in rows if row[0]]
+    if top is None:
+        rows.sort()
+    else:
+        rows = sorted(rows, key=lambda row: (-row[1], row[0]))[:top]
+    return [{field: label, 'count': count} for label, count in rows]
+
+
+def _int_or_none(values: np.ndarray, func) -> Optional[int]:
+    return int(func(values)) if values.size else None
+
+
+def _avg(values: np.ndarray) -> Optional[float]:
+    return float(values.mean()) if values.size else None
+
+
+def compute_stats(q: SnapshotQuery, all_published: SnapshotQuery,
+                  price_buckets: Sequence[int] = DEFAULT_PRICE_BUCKETS) -> Dict[str, Any]:
+    """Build the ``statistics`` payload of the stats endpoint from ``q``.
+
+    ``all_published`` is the unfiltered query; ``by_deal_type`` has always
+    reported the whole inventory regardless of filters.
+    """
+    prices = q.values('price')
+    sqft = q.values('sqft')
+    bedrooms = q.values('bedrooms')
+    avg_price = _avg(prices)
+    avg_sqft = _avg(sqft)
+
+    by_bedrooms = np.unique(bedrooms, return_counts=True)
+    has_coords = ~(np.isnan(q.values('latitude')) | np.isnan(q.values('longitude')))
+
+    return {
+        'total_listings': q.count(),
+        'price': {
+            'min': _int_or_none(prices, np.min),
+            'max': _int_or_none(prices, np.max),
+            'avg': round(avg_price) if avg_price else None,
+            'ranges': _price_ranges(prices, price_buckets),
+        },
+        'size': {
+            'min_sqft': _int_or_none(sqft, np.min),
+            'max_sqft': _int_or_none(sqft, np.max),
+            'avg_sqft': round(avg_sqft) if avg_sqft else None,
+        },
+        'bedrooms': {
+            'min': _int_or_none(bedrooms, np.min),
+            'max': _int_or_none(bedrooms, np.max),
+            'distribution': [
+                {'bedrooms': int(value), 'count': int(count)}
+                for value, count in zip(*by_bedrooms)
+            ],
+        },
+        'by_deal_type': _group_counts(all_published, 'deal_type'),
+        'by_city': _group_counts(q, 'city', top=10),
+        'by_property_type': _group_counts(q, 'property_type', top=10, skip_empty=True),
+        'features': {
+            'with_elevator': int((q.values('elevator') == 1).sum()),
+            'furnished': int((q.values('furnished') == 1).sum()),
+            'in_complex': int((q.values('in_complex') == 1).sum()),
+            'with_parking': int(q.values('has_parking').sum()),
+            'with_images': int((q.values('image_count') > 0).sum()),
+            'with_coordinates': int(has_coords.sum()),
+        },
+    }
+
+
+def listing_stats(deal_type: Optional[str] = None, city: Optional[str] = None) -> Dict[str, Any]:
+    """Memoized statistics for published listings, optionally filtered."""
+    # get_snapshot() catches up with the shared version, so this key does too.
+    snapshot = get_snapshot()
+    key = (snapshot.version, deal_type, city)
+    with _memo_lock:
+        cached = _memo.get(key)
+    if cached is not None:
+        return cached
+
+    q = snapshot.query()
+    if deal_type:
+        q.equals('deal_type', deal_type)
+    if city:
+        q.contains('city', city)
+    stats = compute_stats(q, snapshot.query(), _price_buckets())
+
+    with _memo_lock:
+        stale = [k for k in _memo if k[0] != snapshot.version]
+        for k in stale:
+            del _memo[k]
+        if len(_memo) >= _MEMO_MAX:
+            _memo.clear()
+        _memo[key] = stats
+    return stats
@@ -0,0 +1,120 @@
+"""Content-addressed storage for listing photos.
+
+``ContentAddressedStorage`` ignores the name it is asked to save under and
+stores each upload at ``photos/sha256/ab/cd/<sha256><ext>``, so identical
+bytes end up in one file however many listings use them. A blob's
+reference count is the number of ``ListingImage`` rows naming it;
+``delete`` and ``release`` only remove a blob once nothing points at it;
+row changes hand their old blob to ``release_on_commit``, which counts again
+once the transaction has committed, so a rollback never leaves rows naming
+a removed file.
+Blobs are immutable: an edit writes a new blob (see
+``ListingImage.rewrite_image``) instead of changing the shared file.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import functools
+import tempfile
+from typing import Optional
+
+from django.apps import apps
+from django.db import transaction
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+BLOB_PREFIX = 'photos/sha256'
+CHUNK_SIZE = 64 * 1024
+
+
+def blob_name(digest: str, ext: str) -> str:
+    return f"{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+def normalize_ext(name: str) -> str:
+    ext = os.path.splitext(name or '')[1].lower()
+    if ext == '.jpeg':
+        ext = '.jpg'
+    return ext or '.jpg'
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """``FileSystemStorage`` (same MEDIA_ROOT/MEDIA_URL) with SHA-256 names."""
+
+    def is_blob(self, name: Optional[str]) -> bool:
+        return bool(name) and name.replace('\\', '/').startswith(BLOB_PREFIX + '/')
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content in _save, never from here.
+        return name
+
+    def _save(self, name, content):
+        tmp_dir = self.path(f"{BLOB_PREFIX}/tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks(CHUNK_SIZE):
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode('utf-8')
+                    out.write(chunk)
+                    digest.update(chunk)
+            target = blob_name(digest.hexdigest(), normalize_ext(name))
+            full_path = self.path(target)
+            if os.path.exists(full_path):
+                os.unlink(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                # Same bytes always land at the same name, so a concurrent
+                # writer replacing the file is harmless.
+                os.replace(tmp_path, full_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return target
+
+    def references(self, name: str) -> int:
+        ListingImage = apps.get_model('listings', 'ListingImage')
+        return ListingImage.objects.filter(image=name).count()
+
+    def release(self, name: Optional[str]) -> bool:
+        """Remove blob ``name`` if no row references it; True if removed."""
+        if not self.is_blob(name) or self.references(name):
+            return False
+        super().delete(name)
+        return True
+
+    def release_on_commit(self, name: Optional[str]) -> None:
+        """``release`` once the current transaction commits (now in autocommit)."""
+        if self.is_blob(name):
+            # robust: a failed unlink must not break the committed request.
+            transaction.on_commit(functools.partial(self.release, name), robust=True)
+
+    def delete(self, name):
+        # Files outside the blob tree (legacy per-listing paths) are left to
+        # the dedupe_listing_images command.
+        self.release(name)
+
+
+listing_image_storage = ContentAddressedStorage()
+
+
+def get_listing_image_storage() -> ContentAddressedStorage:
+    return listing_image_storage
@@ -0,0 +1,217 @@
+"""Upsert listings by external_id / original_url for the importers.
+
+``ListingSyncer`` resolves the existing rows for a whole batch in one query
+(by ``external_id`` first, then ``original_url``), compares the imported
+values field by field and writes only what changed: new rows are created,
+changed rows go through ``bulk_update`` grouped by their set of changed
+columns, and unchanged rows cost no query at all.
+
+By default an existing listing only has its gaps filled (empty text, NULL
+numbers, missing coordinates), so edits made in the admin survive a
+re-import; ``overwrite=True`` makes the imported values win.
+
+Importers run in their own process, so nothing is invalidated in memory:
+bulk updates also move ``Listing.updated_at`` (the detail fragment key
+stamp) and the search index version is bumped in the database after
+commit, where every web process reads it.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db.models import Q
+from django.utils import timezone
+
+from . import geocoding, search_index
+from .models import Listing
+
+CREATED = 'created'
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+
+# Never changed on an existing row by an import.
+PROTECTED_FIELDS = ('realtor', 'realtor_id')
+ADDRESS_FIELDS = ('address', 'city', 'state', 'zipcode')
+
+# Sahibinden detail URLs end in "-<ad number>/detay"; the ad number is the
+# listing's external_id, so batches can be resolved before pages are parsed.
+_AD_NUMBER_RE = re.compile(r"-(\d{6,})(?:/detay)?/?(?:[?#].*)?$")
+
+
+def external_id_from_url(url: str) -> str:
+    m = _AD_NUMBER_RE.search(url or '')
+    return m.group(1) if m else ''
+
+
+def _is_empty(value) -> bool:
+    return value is None or value == ''
+
+
+def _comparable(current, new):
+    # Scraped datetimes are naive; stored ones come back aware.
+    if isinstance(new, datetime) and timezone.is_naive(new) and isinstance(current, datetime) \
+            and timezone.is_aware(current):
+        return timezone.make_aware(new)
+    return new
+
+
+@dataclass
+class SyncOutcome:
+    listing: Listing
+    status: str
+    changed: Tuple[str, ...] = field(default_factory=tuple)
+
+    @property
+    def created(self) -> bool:
+        return self.status == CREATED
+
+
+class ListingSyncer:
+    def __init__(self, realtor=None, overwrite: bool = False, dry_run: bool = False,
+                 skip_geocode: bool = False, bulk_create: bool = False, batch_size: int = 500):
+        self.realtor = realtor
+        self.overwrite = overwrite
+        self.dry_run = dry_run
+        self.skip_geocode = skip_geocode
+        self.bulk_create = bulk_create
+        self.batch_size = batch_size
+        self._by_external_id: Dict[str, Listing] = {}
+        self._by_url: Dict[str, Listing] = {}
+        # Keys already looked up (hit or miss), so they are never queried twice.
+        self._seen_ids: set = set()
+        self._seen_urls: set = set()
+
+    # -- lookups -------------------------------------------------------------
+
+    def _remember(self, listing: Listing) -> None:
+        if listing.external_id:
+            self._by_external_id.setdefault(listing.external_id, listing)
+        if listing.original_url:
+            self._by_url.setdefault(listing.original_url, listing)
+
+    def prefetch(self, keys: Iterable[Tuple[str, str]]) -> None:
+        """Load the rows matching any ``(external_id, url)`` pair in one query.
+
+        Images are prefetched too, so the importers' image checks are free.
+        """
+        ids, urls = set(), set()
+        for external_id, url in keys:
+            external_id = external_id or external_id_from_url(url)
+            if external_id and external_id not in self._seen_ids:
+                ids.add(external_id)
+            if url and url not in self._seen_urls:
+                urls.add(url)
+        if not ids and not urls:
+            return
+        self._seen_ids |= ids
+        self._seen_urls |= urls
+        query = Q(external_id__in=ids) | Q(original_url__in=urls)
+        for listing in Listing.objects.filter(query).order_by('pk').prefetch_related('images'):
+            self._remember(listing)
+
+    def prefetch_urls(self, urls: Iterable[str]) -> None:
+        self.prefetch(('', url) for url in urls)
+
+    def find(self, external_id: Optional[str], url: Optional[str]) -> Optional[Listing]:
+        if (external_id and external_id not in self._seen_ids) or (url and url not in self._seen_urls):
+            self.prefetch([(external_id or '', url or '')])
+        listing = self._by_external_id.get(external_id) if external_id else None
+        if listing is None and url:
+            listing = self._by_url.get(url)
+        return listing
+
+    # -- diffing -------------------------------------------------------------
+
+    def diff(self, listing: Listing, fields: dict) -> Dict[str, object]:
+        """The subset of ``fields`` that would change ``listing``."""
+        changes: Dict[str, object] = {}
+        for name, value in fields.items():
+            if name in PROTECTED_FIELDS or name in ('latitude', 'longitude'):
+                continue
+            current = getattr(listing, name)
+            value = _comparable(current, value)
+            if current == value:
+                continue
+            if self.overwrite or (_is_empty(current) and not _is_empty(value)):
+                changes[name] = value
+
+        lat, lng = fields.get('latitude'), fields.get('longitude')
+        if lat is not None and lng is not None:
+            missing = listing.latitude is None or listing.longitude is None
+            if (missing or self.overwrite) and (listing.latitude, listing.longitude) != (lat, lng):
+                changes['latitude'], changes['longitude'] = lat, lng
+        elif any(name in changes for name in ADDRESS_FIELDS) and listing.latitude is not None:
+            # Same rule as Listing.save(): a moved address loses its pin (requeued in _write).
+            changes['latitude'] = changes['longitude'] = None
+        return changes
+
+    # -- writing -------------------------------------------------------------
+
+    def sync(self, rows: List[dict]) -> List[SyncOutcome]:
+        """Create or update one listing per row of Listing field values."""
+        self.prefetch((row.get('external_id') or '', row.get('original_url') or '') for row in rows)
+        outcomes: List[SyncOutcome] = []
+        new: List[Listing] = []
+        changed_by_cols: Dict[Tuple[str, ...], List[Listing]] = defaultdict(list)
+
+        for row in rows:
+            existing = self.find(row.get('external_id'), row.get('original_url'))
+            if existing is None:
+                fields = dict(row)
+                fields.setdefault('realtor', self.realtor)
+                listing = Listing(**fields)
+                new.append(listing)
+                # Later rows in the same run resolve to this one.
+                self._remember(listing)
+                outcomes.append(SyncOutcome(listing, CREATED))
+                continue
+            changes = self.diff(existing, row)
+            if not changes:
+                outcomes.append(SyncOutcome(existing, UNCHANGED))
+                continue
+            for name, value in changes.items():
+                setattr(existing, name, value)
+            cols = tuple(sorted(changes))
+            changed_by_cols[cols].append(existing)
+            outcomes.append(SyncOutcome(existing, UPDATED, cols))
+
+        if not self.dry_run:
+            self._write(new, changed_by_cols)
+        return outcomes
+
+    def sync_one(self, fields: dict) -> SyncOutcome:
+        return self.sync([fields])[0]
+
+    def _write(self, new: List[Listing], changed_by_cols: Dict[Tuple[str, ...], List[Listing]]) -> None:
+        if new:
+            if self.bulk_create:
+                Listing.objects.bulk_create(new, batch_size=self.batch_size)
+                if not self.skip_geocode:
+                    # bulk_create skips save(); queue the new rows in one go.
+                    geocoding.enqueue_created(new, batch_size=self.batch_size)
+            else:
+                for listing in new:
+                    listing.save(skip_geocode=self.skip_geocode)
+        updated = False
+        moved: List[int] = []
+        now = timezone.now()
+        for cols, listings in changed_by_cols.items():
+            # bulk_update skips auto_now; move the detail fragment stamp in the same UPDATE.
+            for listing in listings:
+                listing.updated_at = now
+            Listing.objects.bulk_update(listings, [*cols, 'updated_at'], batch_size=self.batch_size)
+            updated = True
+            if 'latitude' in cols:
+                moved.extend(listing.pk for listing in listings if listing.latitude is None)
+        if moved and not self.skip_geocode:
+            # diff() cleared the pins of moved addresses; bulk_update skips save().
+            geocoding.enqueue_many(moved)
+        if updated or (new and self.bulk_create):
+            # bulk_create/bulk_update skip the post_save receivers. Bumps the
+            # shared index version once the importer's transaction commits.
+            search_index.mark_stale()
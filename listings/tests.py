@@ -1,3 +1,1071 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import http.server
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
+from urllib.parse import urlsplit
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from easy_thumbnails.files import get_thumbnailer
+
+from realtors.models import Realtor
+
+from . import amenities, checkpoints, clustering, fragments, geo, geocoding, import_pool, map_files, page_parsers, parsing, search_index, stats, sync, thumbnails
+from .image_fetch import ImageFetcher
+from .importer import DBLogStream
+from .models import (
+    GeocodeCache, GeocodeTask, Listing, ListingImage, ListingImportJob, ListingImportJobLogLine, SearchIndexVersion,
+)
+from .storage import BLOB_PREFIX
+
+
+def _make_listing(realtor, **overrides):
+    fields = dict(
+        realtor=realtor,
+        title='Listing',
+        address='Cumhuriyet Mah.',
+        city='İstanbul',
+        state='Esenyurt',
+        zipcode='34510',
+        latitude=41.03,
+        longitude=28.67,
+        price=20000,
+        bedrooms=2,
+        bathrooms=1,
+        sqft=90,
+        deal_type='kiralik',
+        property_type='Daire',
+        rooms_text='2+1',
+    )
+    fields.update(overrides)
+    return Listing.objects.create(**fields)
+
+
+class ListingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Each test restarts the shared version at 1; drop what was built on it.
+        search_index._snapshot = None
+        clustering._index = None
+        stats._memo.clear()
+        self.realtor = Realtor.objects.create(name='Agent', phone='0', email='a@example.com')
+
+
+class SearchIndexTests(ListingTestCase):
+    def test_filters_and_ordering_match_orm(self):
+        cheap = _make_listing(self.realtor, price=10000, furnished=True)
+        mid = _make_listing(self.realtor, price=25000, state='Beylikdüzü', rooms_text='3+1')
+        _make_listing(self.realtor, price=40000, deal_type='satis')
+        _make_listing(self.realtor, price=15000, is_published=False)
+
+        q = search_index.get_snapshot().query()
+        q.equals('deal_type', 'kiralik').between('price', high=30000)
+        self.assertEqual(q.count(), 2)
+        self.assertEqual(q.ids('price', descending=True), [mid.pk, cheap.pk])
+
+        q = search_index.get_snapshot().query().contains('state', 'BEYLIK')
+        self.assertEqual(q.ids(), [mid.pk])
+        q = search_index.get_snapshot().query().flag('furnished', True)
+        self.assertEqual(q.ids(), [cheap.pk])
+
+    def test_null_ordering_matches_orm(self):
+        for m2 in (80, None, 120, None):
+            _make_listing(self.realtor, m2_net=m2)
+        unlocated = _make_listing(self.realtor, latitude=None, longitude=None)
+        q = search_index.get_snapshot().query()
+        published = Listing.objects.filter(is_published=True)
+        self.assertEqual(q.ids('m2_net', descending=False),
+                         list(published.order_by('m2_net', 'id').values_list('pk', flat=True)))
+        self.assertEqual(q.ids('m2_net', descending=True),
+                         list(published.order_by('-m2_net', '-id').values_list('pk', flat=True)))
+
+        # Rows without a distance trail in both directions.
+        q.with_distance_from(41.0, 28.7)
+        for descending in (False, True):
+            self.assertEqual(q.ids('distance', descending=descending)[-1], unlocated.pk)
+
+    def test_signals_keep_snapshot_current(self):
+        listing = _make_listing(self.realtor)
+        snapshot = search_index.get_snapshot()
+        version = snapshot.version
+        self.assertIn(listing.pk, snapshot)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ListingImage.objects.create(listing=listing, title='front')
+        self.assertEqual(snapshot.query().has_images().ids(), [listing.pk])
+
+        listing.is_published = False
+        with self.captureOnCommitCallbacks(execute=True):
+            listing.save()
+            # Nothing is published before the write commits.
+            self.assertEqual(search_index._shared_version(), version + 1)
+        self.assertIs(search_index.get_snapshot(), snapshot)
+        self.assertNotIn(listing.pk, snapshot)
+        self.assertEqual(snapshot.version, version + 2)
+
+        # A write this process did not apply leaves the copy stale.
+        with self.captureOnCommitCallbacks(execute=True):
+            search_index.mark_stale()
+        self.assertIsNot(search_index.get_snapshot(), snapshot)
+
+    def test_write_from_another_process_is_seen(self):
+        listing = _make_listing(self.realtor)
+        snapshot = search_index.get_snapshot()
+        # What an import command or the geocoder does: change rows, bump the counter.
+        Listing.objects.filter(pk=listing.pk).update(is_published=False)
+        SearchIndexVersion.objects.filter(pk=1).update(version=F('version') + 1)
+        fresh = search_index.get_snapshot()
+        self.assertIsNot(fresh, snapshot)
+        self.assertNotIn(listing.pk, fresh)
+
+    def test_search_endpoint_uses_snapshot(self):
+        _make_listing(self.realtor, price=10000)
+        wanted = _make_listing(self.realtor, price=30000, bedrooms=3)
+        resp = self.client.get('/api/bot/search', {'min_bedrooms': 3, 'order_by': '-price'})
+        body = resp.json()
+        self.assertEqual(body['count'], 1)
+        self.assertEqual([r['id'] for r in body['results']], [wanted.pk])
+        self.assertIn('X-Listing-Index-Version', resp)
+
+
+class ChatbotSerializationTests(ListingTestCase):
+    def test_query_count_does_not_grow_with_page_size(self):
+        for i in range(6):
+            listing = _make_listing(self.realtor, price=10000 + i)
+            ListingImage.objects.create(listing=listing, title='hidden', is_visible=False)
+            ListingImage.objects.create(listing=listing, title='a', order=1)
+            ListingImage.objects.create(listing=listing, title='b', order=2, is_primary=True, image='photos/b.jpg')
+
+        self.client.get('/api/bot/search')  # build the snapshot
+        counts = {}
+        with self.settings(DEBUG=True):
+            for limit in (1, 6):
+                for fmt in ('summary', 'full'):
+                    resp = self.client.get('/api/bot/search', {'limit': limit, 'format': fmt})
+                    counts[limit, fmt] = int(resp['X-Queries-Executed'])
+                    results = resp.json()['results']
+                    self.assertEqual(len(results), limit)
+        self.assertEqual(counts[1, 'summary'], counts[6, 'summary'])
+        self.assertEqual(counts[1, 'full'], counts[6, 'full'])
+
+        summary = self.client.get('/api/bot/search', {'limit': 1}).json()['results'][0]
+        self.assertEqual(summary['image_count'], 2)
+        self.assertTrue(summary['primary_image'].endswith('/media/photos/b.jpg'))
+        full = self.client.get('/api/bot/search', {'limit': 1, 'format': 'full'}).json()['results'][0]
+        self.assertEqual([img['title'] for img in full['images']['gallery']], ['a', 'b'])
+        self.assertEqual(full['images']['primary']['title'], 'b')
+
+
+class ListingStatsTests(ListingTestCase):
+    def test_price_buckets_are_half_open_and_configurable(self):
+        for price in (9999, 10000, 24999, 2000000):
+            _make_listing(self.realtor, price=price)
+        ranges = stats.listing_stats()['price']['ranges']
+        self.assertEqual(ranges['under_10k'], 1)
+        self.assertEqual(ranges['10k_25k'], 2)
+        self.assertEqual(ranges['over_1m'], 1)
+
+        with self.settings(LISTING_STATS_PRICE_BUCKETS=[15000, 2500000]):
+            with self.captureOnCommitCallbacks(execute=True):
+                search_index.mark_stale()
+            ranges = stats.listing_stats()['price']['ranges']
+        self.assertEqual(ranges, {'under_15k': 2, '15k_2.5m': 2, 'over_2.5m': 0})
+
+    def test_memo_is_invalidated_by_listing_changes(self):
+        _make_listing(self.realtor, furnished=True)
+        first = stats.listing_stats(deal_type='kiralik')
+        self.assertIs(stats.listing_stats(deal_type='kiralik'), first)
+        with self.captureOnCommitCallbacks(execute=True):
+            _make_listing(self.realtor, deal_type='satis')
+        second = stats.listing_stats(deal_type='kiralik')
+        self.assertIsNot(second, first)
+        self.assertEqual(second['features']['furnished'], 1)
+        self.assertEqual(second['by_deal_type'], [
+            {'deal_type': 'kiralik', 'count': 1},
+            {'deal_type': 'satis', 'count': 1},
+        ])
+
+    def test_memo_follows_writes_from_other_processes(self):
+        listing = _make_listing(self.realtor, furnished=True)
+        first = stats.listing_stats()
+        # What another process's committed write leaves behind: the row and the counter.
+        Listing.objects.filter(pk=listing.pk).update(furnished=False)
+        SearchIndexVersion.objects.filter(pk=1).update(version=F('version') + 1)
+        self.assertEqual(stats.listing_stats()['features']['furnished'], 0)
+        self.assertEqual(first['features']['furnished'], 1)
+
+
+class GeoSearchTests(ListingTestCase):
+    def test_grid_candidates_cover_exact_radius(self):
+        grid = geo.GridIndex(cell_km=0.5)
+        lats = 41.0 + np.linspace(-0.05, 0.05, 21)
+        lngs = 28.7 + np.linspace(-0.05, 0.05, 21)
+        grid.add_many(range(21), lats, lngs)
+        exact = np.flatnonzero(geo.haversine_km(41.0, 28.7, lats, lngs) <= 3.0)
+        found = grid.candidates(41.0, 28.7, 3.0)
+        self.assertTrue(set(exact) <= set(found.tolist()))
+        self.assertLess(len(found), 21)
+
+    def test_radius_is_a_circle_and_orders_by_distance(self):
+        center = _make_listing(self.realtor, latitude=41.0, longitude=28.7)
+        near = _make_listing(self.realtor, latitude=41.0, longitude=28.71)
+        # Inside the old bounding box but outside the 1.2 km circle.
+        corner = _make_listing(self.realtor, latitude=41.0095, longitude=28.7125)
+        body = self.client.get('/api/bot/search', {
+            'lat': 41.0, 'lng': 28.7, 'radius_km': 1.2, 'order_by': '-distance',
+        }).json()
+        self.assertEqual([r['id'] for r in body['results']], [near.pk, center.pk])
+        self.assertAlmostEqual(body['results'][0]['distance_km'], 0.839, places=2)
+        self.assertNotIn(corner.pk, [r['id'] for r in body['results']])
+
+    def test_nearest_k(self):
+        far = _make_listing(self.realtor, latitude=41.2, longitude=29.0)
+        near = _make_listing(self.realtor, latitude=41.01, longitude=28.7)
+        mid = _make_listing(self.realtor, latitude=41.05, longitude=28.7)
+        body = self.client.get('/api/bot/search', {'lat': 41.0, 'lng': 28.7, 'nearest': 2}).json()
+        self.assertEqual(body['count'], 2)
+        self.assertEqual([r['id'] for r in body['results']], [near.pk, mid.pk])
+        body = self.client.get('/api/bot/search', {'lat': 41.0, 'lng': 28.7, 'nearest': 5}).json()
+        self.assertEqual([r['id'] for r in body['results']], [near.pk, mid.pk, far.pk])
+
+
+class MapTileTests(ListingTestCase):
+    def _tile(self, z, lat, lng):
+        x, y = clustering.project(np.array([lat]), np.array([lng]))
+        return int(x[0] * 2 ** z), int(y[0] * 2 ** z)
+
+    def test_clusters_at_low_zoom_and_features_at_high_zoom(self):
+        a = _make_listing(self.realtor, latitude=41.0, longitude=28.7, price=10000)
+        _make_listing(self.realtor, latitude=41.003, longitude=28.703, price=30000)
+        _make_listing(self.realtor, latitude=40.65, longitude=29.27, price=5000)
+
+        features = self.client.get('/en/listings/map-tiles/0/0/0.json').json()['features']
+        self.assertEqual(len(features), 1)
+        props = features[0]['properties']
+        self.assertEqual((props['point_count'], props['price_min'], props['price_max']), (3, 5000, 30000))
+        self.assertTrue(props['cluster'])
+
+        x, y = self._tile(12, 41.0, 28.7)
+        features = self.client.get(f'/en/listings/map-tiles/12/{x}/{y}.json').json()['features']
+        self.assertEqual([f['properties']['point_count'] for f in features], [2])
+
+        x, y = self._tile(18, 41.0, 28.7)
+        features = self.client.get(f'/en/listings/map-tiles/18/{x}/{y}.json').json()['features']
+        self.assertEqual([f['properties']['id'] for f in features], [a.pk])
+        self.assertEqual(features[0]['properties']['url'], f'/listings/{a.pk}/')
+        self.assertAlmostEqual(features[0]['geometry']['coordinates'][1], 41.0)
+
+    def test_index_follows_writes_from_other_processes(self):
+        listing = _make_listing(self.realtor, latitude=41.0, longitude=28.7)
+        x, y = self._tile(18, 41.0, 28.7)
+        url = f'/en/listings/map-tiles/18/{x}/{y}.json'
+        self.assertEqual(len(self.client.get(url).json()['features']), 1)
+        # Another process moves the listing and bumps the shared counter on commit.
+        Listing.objects.filter(pk=listing.pk).update(latitude=40.65, longitude=29.27)
+        SearchIndexVersion.objects.filter(pk=1).update(version=F('version') + 1)
+        self.assertEqual(self.client.get(url).json()['features'], [])
+
+    def test_out_of_range_tile(self):
+        self.assertEqual(self.client.get('/en/listings/map-tiles/2/4/0.json').status_code, 404)
+
+
+class MapDataTests(ListingTestCase):
+    def test_streamed_geojson_uses_two_queries(self):
+        for i in range(3):
+            listing = _make_listing(self.realtor, title=f'Daire {i}')
+            ListingImage.objects.create(listing=listing, image=f'photos/{i}.jpg')
+        _make_listing(self.realtor, latitude=0.0, longitude=0.0)
+
+        with self.assertNumQueries(2):
+            resp = self.client.get('/en/listings/map-data/')
+            body = b''.join(resp.streaming_content)
+        data = json.loads(body)
+        self.assertEqual(len(data['features']), 3)
+        self.assertEqual(data['skipped_invalid'], 1)
+        self.assertEqual(data['features'][0]['properties']['photo_url'], '/media/photos/0.jpg')
+        self.assertTrue(body.startswith(b'{"type": "FeatureCollection", "features": [{"type": "Feature"'))
+
+
+class AmenityEngineTests(ListingTestCase):
+    def setUp(self):
+        super().setUp()
+        stop = lambda id, lat, lng: {'id': id, 'name': f'Stop {id}', 'lat': lat, 'lng': lng}
+        self.engine = amenities.AmenityEngine(
+            points={'bus': [stop(1, 41.031, 28.67), stop(2, 41.03, 28.68), stop(3, 41.2, 28.67)]},
+            lines={'minibus': [{'id': 'M1', 'name': 'M1', 'geometry': {
+                'type': 'LineString', 'coordinates': [[28.66, 41.032], [28.68, 41.032]],
+            }}]},
+        )
+
+    def test_nearest_per_category(self):
+        data = self.engine.nearby(41.03, 28.67)
+        self.assertEqual([s['id'] for s in data['closest_bus_stops']], [1, 2])
+        self.assertAlmostEqual(data['closest_bus_stops'][0]['distance_m'], 111.0, delta=1.0)
+        self.assertEqual([line['id'] for line in data['minibus']], ['M1'])
+        self.assertAlmostEqual(data['nearest_distances_m']['minibus_m'], 222.4, delta=1.0)
+        self.assertEqual(data['closest_stations'], [])
+        self.assertIsNone(data['nearest_distances_m']['metro_m'])
+
+    def test_map_data_view_uses_engine(self):
+        listing = _make_listing(self.realtor)
+        amenities._engine = self.engine
+        try:
+            resp = self.client.get(f'/en/listing/{listing.pk}/map-data/')
+        finally:
+            amenities._engine = None
+        data = resp.json()
+        self.assertEqual(data['listing']['id'], str(listing.pk))
+        self.assertEqual(data['nearest_distances_m']['bus_m'], data['closest_bus_stops'][0]['distance_m'])
+
+
+class MapFileTests(ListingTestCase):
+    def test_map_data_from_file_is_cached_with_etag(self):
+        map_files.file_cache.clear()
+        resp = self.client.get('/en/listing/18/map-data/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['listing']['id'], '18')
+        self.assertIs(map_files.get_map_data(18), map_files.get_map_data(18))
+
+        resp = self.client.get('/en/listing/18/map-data/', HTTP_IF_NONE_MATCH=resp['ETag'])
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(self.client.get('/en/listing/999999/map-data/').status_code, 404)
+
+    def test_extract_data(self):
+        html = '<script>const DATA = {"a": "};", "b": [1]};\nmap();</script>'
+        self.assertEqual(map_files.extract_data(html), {'a': '};', 'b': [1]})
+        self.assertIsNone(map_files.extract_data('<html></html>'))
+
+    def test_map_embed_is_cached_and_compressed(self):
+        map_files.file_cache.clear()
+        resp = self.client.get('/en/listing/18/map/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b'injected-map-enhancements', resp.content)
+        self.assertEqual(resp['X-Map-Embed-Injected'], 'head=True,body=True')
+
+        resp = self.client.get('/en/listing/18/map/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(resp.content), self.client.get('/en/listing/18/map/').content)
+        resp = self.client.get('/en/listing/18/map/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=resp['ETag'])
+        self.assertEqual(resp.status_code, 304)
+
+
+class ListingDetailFragmentTests(ListingTestCase):
+    def test_fragments_cached_until_listing_changes(self):
+        listing = _make_listing(self.realtor, description='Deniz manzaralı')
+        url = f'/en/listing/{listing.pk}/'
+        self.assertContains(self.client.get(url), 'Deniz manzaralı')
+
+        # A queryset update leaves the change stamp, so the cached block is served.
+        Listing.objects.filter(pk=listing.pk).update(description='Bahçeli')
+        self.assertContains(self.client.get(url), 'Deniz manzaralı')
+
+        listing.refresh_from_db()
+        listing.save()
+        self.assertContains(self.client.get(url), 'Bahçeli')
+
+        # The key lives in the row, so a write from another process is seen
+        # without touching this process's cache.
+        Listing.objects.filter(pk=listing.pk).update(description='Sahil')
+        fragments.invalidate_listings([listing.pk])
+        self.assertContains(self.client.get(url), 'Sahil')
+
+    def test_inline_map_snippet(self):
+        html, version = map_files.get_body_snippet(18)
+        self.assertTrue(version)
+        self.assertNotIn('<body', html.lower())
+        self.assertIn('const DATA', html)
+        self.assertIs(map_files.get_body_snippet(18)[0], html)
+
+
+class ImportPoolTests(TestCase):
+    def test_pool_streams_results_to_single_writer(self):
+        written = []
+
+        async def open_worker(n):
+            return n
+
+        async def close_worker(state):
+            return None
+
+        async def process(state, index, url):
+            if 'blocked' in url:
+                return import_pool.UrlResult(index, url, import_pool.BLOCKED, attempts=3, message='captcha')
+            return import_pool.UrlResult(index, url, import_pool.CREATED, payload=url)
+
+        async def write(result):
+            written.append(result.payload)
+            result.listing_id = len(written)
+            return result
+
+        urls = ['https://a.example/1', 'https://a.example/blocked', 'https://b.example/2']
+        summary = asyncio.run(import_pool.run_pool(urls, 2, open_worker, close_worker, process, write))
+        self.assertEqual(sorted(written), ['https://a.example/1', 'https://b.example/2'])
+        self.assertEqual(summary.counts[import_pool.CREATED], 2)
+        self.assertEqual([r.url for r in summary.problems], ['https://a.example/blocked'])
+        self.assertIn('BLOCKED after 3 attempt(s)', summary.lines()[1])
+
+    def test_token_bucket_spaces_requests_per_domain(self):
+        async def hit(limiter, urls):
+            start = time.monotonic()
+            for url in urls:
+                await limiter.acquire(url)
+            return time.monotonic() - start
+
+        limiter = import_pool.DomainRateLimiter(rate=20, burst=1)
+        self.assertGreaterEqual(asyncio.run(hit(limiter, ['https://a.example/x'] * 3)), 0.09)
+        limiter = import_pool.DomainRateLimiter(rate=20, burst=1)
+        self.assertLess(asyncio.run(hit(limiter, ['https://a.example/', 'https://b.example/'])), 0.04)
+
+
+class ImageFetchTests(ListingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.hits = []
+        hits = self.hits
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                hits.append(self.path)
+                body = b'same-bytes' if self.path != '/other.jpg' else b'other-bytes'
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f'http://127.0.0.1:{self.server.server_port}'
+        self.media = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.shutdown()
+        shutil.rmtree(self.media, ignore_errors=True)
+
+    def test_downloads_once_and_stores_identical_bytes_once(self):
+        urls = [f'{self.base}/a.jpg', f'{self.base}/b.jpg', f'{self.base}/other.jpg']
+        with self.settings(MEDIA_ROOT=self.media), ImageFetcher(max_workers=4, per_host=2) as fetcher:
+            images = fetcher.fetch_many(urls)
+            again = fetcher.fetch_many(urls[:1])
+            self.assertEqual(len(self.hits), 3)
+            self.assertEqual(images[0].sha256, images[1].sha256)
+            self.assertEqual(images[0].path, images[1].path)
+            self.assertEqual(again[0].path, images[0].path)
+
+            first = _make_listing(self.realtor, external_id='1')
+            second = _make_listing(self.realtor, external_id='2')
+            a = ListingImage(listing=first)
+            fetcher.save_to(a.image, 'x.jpg', images[0])
+            b = ListingImage(listing=second)
+            fetcher.save_to(b.image, 'y.jpg', images[1])
+            self.assertEqual(a.image.name, b.image.name)
+            self.assertEqual(ListingImage.objects.filter(image=a.image.name).count(), 2)
+
+
+def _png_bytes(size=(8, 6), color=(200, 30, 30)):
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.new('RGB', size, color).save(buf, format='PNG')
+    return buf.getvalue()
+
+
+class ContentAddressedStorageTests(ListingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.override = self.settings(MEDIA_ROOT=self.media)
+        self.override.enable()
+        self.listing = _make_listing(self.realtor, external_id='9')
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media, ignore_errors=True)
+
+    def _image(self, name, content):
+        img = ListingImage(listing=self.listing)
+        img.image.save(name, ContentFile(content), save=True)
+        return img
+
+    def test_identical_uploads_share_a_blob_until_the_last_reference(self):
+        a = self._image('a.png', _png_bytes())
+        b = self._image('b.png', _png_bytes())
+        self.assertTrue(a.image.name.startswith(BLOB_PREFIX + '/'))
+        self.assertEqual(a.image.name, b.image.name)
+        path = a.image.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            a.delete()
+        self.assertTrue(os.path.exists(path))
+        with self.captureOnCommitCallbacks(execute=True):
+            ListingImage.objects.filter(pk=b.pk).delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_rolled_back_delete_keeps_the_blob(self):
+        a = self._image('a.png', _png_bytes())
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    a.delete()
+                    raise RuntimeError('import failed')
+            except RuntimeError:
+                pass
+        self.assertTrue(ListingImage.objects.filter(image=a.image.name).exists())
+        self.assertTrue(os.path.exists(a.image.path))
+
+    def test_crop_writes_a_new_blob_and_leaves_shared_one_alone(self):
+        a = self._image('a.png', _png_bytes())
+        b = self._image('b.png', _png_bytes())
+        shared = a.image.name
+        with open(a.image.path, 'rb') as fh:
+            original = fh.read()
+
+        b = ListingImage.objects.get(pk=b.pk)
+        b.crop_x, b.crop_y, b.crop_width, b.crop_height = 0, 0, 4, 3
+        b.save()
+        self.assertNotEqual(b.image.name, shared)
+        self.assertIsNone(b.crop_x)
+        with open(a.image.path, 'rb') as fh:
+            self.assertEqual(fh.read(), original)
+
+        b.rewrite_image(lambda path: None)
+        self.assertTrue(os.path.exists(a.image.path))
+
+    def test_dedupe_command_rewrites_legacy_paths(self):
+        other = _make_listing(self.realtor, external_id='10')
+        names = ['photos/listing_9/x.jpg', 'photos/listing_10/y.jpg', 'photos/listing_10/z.jpg']
+        for name, body in zip(names, [b'same', b'same', b'different']):
+            os.makedirs(os.path.dirname(os.path.join(self.media, name)), exist_ok=True)
+            with open(os.path.join(self.media, name), 'wb') as fh:
+                fh.write(body)
+        ListingImage.objects.bulk_create([
+            ListingImage(listing=self.listing, image=names[0]),
+            ListingImage(listing=other, image=names[1]),
+            ListingImage(listing=other, image=names[2]),
+        ])
+
+        call_command('dedupe_listing_images', '--dry-run', stdout=io.StringIO())
+        self.assertEqual(sorted(ListingImage.objects.values_list('image', flat=True)), sorted(names))
+
+        out = io.StringIO()
+        call_command('dedupe_listing_images', stdout=out)
+        stored = list(ListingImage.objects.order_by('pk').values_list('image', flat=True))
+        self.assertEqual(stored[0], stored[1])
+        self.assertNotEqual(stored[1], stored[2])
+        self.assertTrue(all(name.startswith(BLOB_PREFIX + '/') for name in stored))
+        self.assertTrue(all(os.path.exists(os.path.join(self.media, name)) for name in stored))
+        self.assertFalse(os.path.exists(os.path.join(self.media, 'photos/listing_9')))
+        self.assertIn('blobs=2', out.getvalue())
+
+
+class ThumbnailTests(ListingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.override = self.settings(MEDIA_ROOT=self.media)
+        self.override.enable()
+        self.listing = _make_listing(self.realtor, external_id='9')
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media, ignore_errors=True)
+
+    def _image(self, content):
+        img = ListingImage(listing=self.listing)
+        img.image.save('a.png', ContentFile(content), save=True)
+        return img
+
+    def test_command_renders_each_alias_once_per_blob_in_worker_processes(self):
+        from easy_thumbnails.models import Thumbnail
+        shared = self._image(_png_bytes((640, 480)))
+        self._image(_png_bytes((640, 480)))
+        other = self._image(_png_bytes((640, 480), color=(0, 90, 200)))
+        aliases = thumbnails.alias_options()
+        self.assertEqual(thumbnails.missing_aliases(shared.image.name), list(aliases))
+
+        out = io.StringIO()
+        call_command('generate_thumbnails', '--workers', '1', stdout=out)
+        self.assertIn(f'{2 * len(aliases)} rendition(s) to generate for 2 photo(s)', out.getvalue())
+        self.assertIn(f'renditions={2 * len(aliases)}, failed photos=0', out.getvalue())
+        for img in (shared, other):
+            self.assertEqual(thumbnails.missing_aliases(img.image.name), [])
+        card = get_thumbnailer(shared.image).get_existing_thumbnail(aliases['card'])
+        self.assertEqual((card.width, card.height), (600, 400))
+        self.assertTrue(card.path.startswith(self.media))
+        self.assertEqual(Thumbnail.objects.count(), 2 * len(aliases))
+
+        out = io.StringIO()
+        call_command('generate_thumbnails', '--workers', '0', stdout=out)
+        self.assertIn('0 rendition(s) to generate', out.getvalue())
+
+    def test_saved_image_is_scheduled_after_commit(self):
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                img = self._image(_png_bytes())
+            schedule.assert_called_with([img.image.name])
+            schedule.reset_mock()
+            with self.settings(LISTING_THUMBNAILS_ON_SAVE=False), self.captureOnCommitCallbacks(execute=True):
+                img.save()
+            schedule.assert_not_called()
+
+    def test_save_time_pool_is_a_thread_by_default(self):
+        self.addCleanup(thumbnails._close_shared_pool)
+        pool = thumbnails._shared_pool()
+        self.assertEqual(pool.workers, 0)
+        self.assertIs(thumbnails._shared_pool(), pool)
+        thumbnails._close_shared_pool()
+        self.assertIsNone(thumbnails._pool)
+
+
+class ImportListingsCsvTests(ListingTestCase):
+    HEADER = 'realtor,title,address,city,state,zipcode,description,price,bedrooms,property_type,bathrooms,garage,sqft,lot_size,is_published\n'
+
+    def _csv(self, rows):
+        return io.StringIO(self.HEADER + ''.join(
+            f'{realtor},Flat {i},Street {i},Istanbul,Esenyurt,34510,,{1000 + i},2,Daire,1,0,90,0,true\n'
+            for i, realtor in enumerate(rows)
+        ))
+
+    def test_bulk_mode_reads_stdin_in_batches(self):
+        rows = [self.realtor.pk] * 5 + [999999]
+        out = io.StringIO()
+        with self.assertNumQueries(10):
+            # 2 realtor lookups + 3 batched inserts + 3 geocode task inserts + the savepoint pair
+            call_command('import_listings', '-', '--bulk', '--batch-size', '2',
+                         stdin=self._csv(rows), stdout=out)
+        self.assertEqual(Listing.objects.count(), 5)
+        self.assertTrue(Listing.objects.filter(latitude__isnull=True).exists())
+        self.assertIn('rows/s', out.getvalue())
+        self.assertIn('5 listings queued for geocoding', out.getvalue())
+
+    def test_bulk_dry_run_writes_nothing(self):
+        out = io.StringIO()
+        call_command('import_listings', '-', '--bulk', '--dry-run', '--geocode-after',
+                     stdin=self._csv([self.realtor.pk] * 3), stdout=out)
+        self.assertEqual(Listing.objects.count(), 0)
+        self.assertNotIn('queued for geocoding', out.getvalue())
+
+
+class ListingSyncerTests(ListingTestCase):
+    URL = 'https://www.sahibinden.com/ilan/emlak-konut-satilik-daire-{}/detay'
+
+    def _fields(self, n, **overrides):
+        fields = dict(
+            title=f'Flat {n}', address='Street', city='Istanbul', state='Esenyurt', zipcode='',
+            description='', price=1000 + n, bedrooms=2, bathrooms=1, sqft=90,
+            external_id=str(1283421000 + n), original_url=self.URL.format(1283421000 + n),
+            latitude=41.03, longitude=28.67,
+        )
+        fields.update(overrides)
+        return fields
+
+    def test_external_id_from_url(self):
+        self.assertEqual(sync.external_id_from_url(self.URL.format(1283421028)), '1283421028')
+        self.assertEqual(sync.external_id_from_url('https://example.com/ilan/foo'), '')
+
+    def test_rerun_over_unchanged_listings_costs_one_query(self):
+        rows = [self._fields(n) for n in range(20)]
+        sync.ListingSyncer(self.realtor, bulk_create=True).sync(rows)
+        self.assertEqual(Listing.objects.count(), 20)
+
+        syncer = sync.ListingSyncer(self.realtor)
+        with self.assertNumQueries(2):  # listings + prefetched images
+            syncer.prefetch_urls(r['original_url'] for r in rows)
+            outcomes = [syncer.sync_one(r) for r in rows]
+        self.assertEqual({o.status for o in outcomes}, {sync.UNCHANGED})
+
+    def test_updates_write_only_changed_columns(self):
+        sync.ListingSyncer(self.realtor).sync([self._fields(1), self._fields(2)])
+        rows = [self._fields(1, description='Balkon: Var', price=5), self._fields(2, heating='Kombi')]
+
+        with CaptureQueriesContext(connection) as ctx:
+            outcomes = sync.ListingSyncer(self.realtor).sync(rows)
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        self.assertTrue(all('"price"' not in sql and '"title"' not in sql for sql in updates))
+        self.assertEqual(outcomes[0].changed, ('description',))
+        listing = Listing.objects.get(external_id=rows[0]['external_id'])
+        self.assertEqual((listing.description, listing.price), ('Balkon: Var', 1001))
+
+        outcome = sync.ListingSyncer(self.realtor, overwrite=True).sync_one(rows[0])
+        self.assertEqual(outcome.changed, ('price',))
+        self.assertEqual(Listing.objects.get(pk=listing.pk).price, 5)
+
+    def test_bulk_writes_are_published_after_commit(self):
+        sync.ListingSyncer(self.realtor).sync([self._fields(1)])
+        listing = Listing.objects.get()
+        version = search_index.get_snapshot().version
+        with self.captureOnCommitCallbacks(execute=True):
+            sync.ListingSyncer(self.realtor).sync([self._fields(1, description='Balkon: Var')])
+            self.assertEqual(SearchIndexVersion.objects.get(pk=1).version, version)
+        self.assertEqual(SearchIndexVersion.objects.get(pk=1).version, version + 1)
+        self.assertGreater(Listing.objects.get().updated_at, listing.updated_at)
+
+    def test_moved_address_clears_coordinates(self):
+        sync.ListingSyncer(self.realtor).sync_one(self._fields(1))
+        moved = self._fields(1, city='Ankara')
+        del moved['latitude'], moved['longitude']
+        outcome = sync.ListingSyncer(self.realtor, overwrite=True).sync_one(moved)
+        self.assertEqual(outcome.changed, ('city', 'latitude', 'longitude'))
+        listing = Listing.objects.get(pk=outcome.listing.pk)
+        self.assertIsNone(listing.latitude)
+        task = GeocodeTask.objects.get(listing=listing)
+        self.assertEqual((task.status, task.query), (GeocodeTask.PENDING, 'Street, Ankara, Esenyurt'))
+
+        GeocodeTask.objects.all().delete()
+        Listing.objects.filter(pk=listing.pk).update(latitude=41.03, longitude=28.67)
+        for syncer in (sync.ListingSyncer(self.realtor, overwrite=True, skip_geocode=True),
+                       sync.ListingSyncer(self.realtor, overwrite=True, dry_run=True)):
+            syncer.sync_one(self._fields(1, city='İzmir', latitude=None, longitude=None))
+        self.assertFalse(GeocodeTask.objects.exists())
+
+
+class GeocodeQueueTests(ListingTestCase):
+    class Location:
+        latitude, longitude = 41.01, 28.97
+
+    def _geocoder(self, result=Location):
+        calls = []
+
+        def geocode(query):
+            calls.append(query)
+            return result
+        return geocode, calls
+
+    def test_save_queues_instead_of_geocoding(self):
+        listing = _make_listing(self.realtor, latitude=None, longitude=None)
+        task = GeocodeTask.objects.get(listing=listing)
+        self.assertEqual(task.status, GeocodeTask.PENDING)
+        self.assertEqual(task.query, 'Cumhuriyet Mah., İstanbul, Esenyurt, 34510')
+        listing.save()
+        self.assertEqual(GeocodeTask.objects.count(), 1)
+        _make_listing(self.realtor)
+        _make_listing(self.realtor, latitude=None, longitude=None).save(skip_geocode=True)
+        self.assertEqual(GeocodeTask.objects.count(), 2)
+
+    def test_loaded_listing_saves_without_reading_the_row_again(self):
+        listing = Listing.objects.get(pk=_make_listing(self.realtor).pk)
+        listing.is_published = False
+        with CaptureQueriesContext(connection) as ctx:
+            listing.save()
+        self.assertTrue(ctx.captured_queries[0]['sql'].startswith('UPDATE "listings_listing"'))
+        self.assertFalse(GeocodeTask.objects.exists())
+
+        listing.city = 'Ankara'
+        self.assertTrue(listing.address_changed())
+        listing.save()
+        self.assertIsNone(Listing.objects.get(pk=listing.pk).latitude)
+        self.assertEqual(GeocodeTask.objects.get(listing=listing).query, 'Cumhuriyet Mah., Ankara, Esenyurt, 34510')
+        self.assertEqual(listing.changed_fields(), set())
+
+    def test_deferred_and_refreshed_fields_are_tracked(self):
+        pk = _make_listing(self.realtor).pk
+        partial = Listing.objects.only('title').get(pk=pk)
+        partial.city = 'Ankara'
+        self.assertIsNone(partial.address_changed())
+        partial.save()  # falls back to reading the stored address
+        self.assertIsNone(Listing.objects.get(pk=pk).latitude)
+
+        listing = Listing.objects.get(pk=pk)
+        Listing.objects.filter(pk=pk).update(city='İzmir', latitude=38.4, longitude=27.1)
+        listing.refresh_from_db()
+        self.assertFalse(listing.address_changed())
+        listing.save()
+        self.assertEqual(Listing.objects.get(pk=pk).latitude, 38.4)
+
+    def test_worker_writes_coordinates_and_marks_done(self):
+        listing = _make_listing(self.realtor, latitude=None, longitude=None)
+        stamp, version = listing.updated_at, search_index.get_snapshot().version
+        geocode, calls = self._geocoder()
+        with self.captureOnCommitCallbacks(execute=True):
+            counts = geocoding.GeocodeWorker(geocode, min_delay=0).run()
+        self.assertEqual(counts[GeocodeTask.DONE], 1)
+        self.assertEqual(len(calls), 1)
+        listing.refresh_from_db()
+        self.assertEqual((listing.latitude, listing.longitude), (41.01, 28.97))
+        # Web processes see the write through the shared version and stamp.
+        self.assertGreater(SearchIndexVersion.objects.get(pk=1).version, version)
+        self.assertGreater(listing.updated_at, stamp)
+        self.assertEqual(GeocodeTask.objects.get(listing=listing).status, GeocodeTask.DONE)
+        self.assertEqual(geocoding.GeocodeWorker(geocode, min_delay=0).run(), {})
+
+    def test_not_found_and_failures_are_recorded(self):
+        missing = _make_listing(self.realtor, latitude=None, longitude=None)
+        geocode, _ = self._geocoder(result=None)
+        geocoding.GeocodeWorker(geocode, min_delay=0).run()
+        self.assertEqual(GeocodeTask.objects.get(listing=missing).status, GeocodeTask.NOT_FOUND)
+
+        def broken(query):
+            raise OSError('timed out')
+        failing = _make_listing(self.realtor, address='Yakuplu Mah.', latitude=None, longitude=None)
+        worker = geocoding.GeocodeWorker(broken, min_delay=0, max_attempts=2)
+        worker.run()
+        worker.run()
+        task = GeocodeTask.objects.get(listing=failing)
+        self.assertEqual((task.status, task.attempts, task.last_error), (GeocodeTask.FAILED, 2, 'timed out'))
+        self.assertFalse(worker.queued().exists())
+
+    def test_address_changed_while_geocoding_is_not_overwritten(self):
+        listing = _make_listing(self.realtor, latitude=None, longitude=None)
+
+        def geocode(query):
+            Listing.objects.filter(pk=listing.pk).update(city='Ankara')
+            return self.Location
+        self.assertEqual(geocoding.GeocodeWorker(geocode, min_delay=0).run()['moved'], 1)
+        listing.refresh_from_db()
+        self.assertIsNone(listing.latitude)
+
+    def test_cache_answers_same_street_once(self):
+        first = _make_listing(self.realtor, latitude=None, longitude=None)
+        second = _make_listing(self.realtor, address='CUMHURİYET MAHALLESİ', city='Istanbul',
+                               latitude=None, longitude=None)
+        geocode, calls = self._geocoder()
+        worker = geocoding.GeocodeWorker(geocode, min_delay=0)
+        self.assertEqual(worker.run()[GeocodeTask.DONE], 2)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((worker.cache.hits, worker.cache.misses), (1, 1))
+        self.assertIn('1/2 hits (50%)', worker.cache.summary())
+        second.refresh_from_db()
+        self.assertEqual(second.latitude, 41.01)
+        self.assertEqual(GeocodeCache.objects.get().key, geocoding.address_key(first.__dict__))
+
+    def test_misses_are_cached_until_negative_ttl(self):
+        _make_listing(self.realtor, latitude=None, longitude=None)
+        _make_listing(self.realtor, latitude=None, longitude=None)
+        geocode, calls = self._geocoder(result=None)
+        geocoding.GeocodeWorker(geocode, min_delay=0).run()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(GeocodeTask.objects.filter(status=GeocodeTask.NOT_FOUND).count(), 2)
+
+        GeocodeCache.objects.update(updated_at=timezone.now() - timedelta(days=30))
+        cache = geocoding.AddressCache(negative_ttl=3600)
+        self.assertIsNone(cache.get(GeocodeCache.objects.get().key))
+
+    def test_batch_resolves_each_address_once_from_gazetteer(self):
+        path = os.path.join(tempfile.mkdtemp(), 'gazetteer.csv')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('city,district,neighborhood,latitude,longitude\n'
+                    'İstanbul,Esenyurt,Cumhuriyet,41.031,28.672\n'
+                    'İstanbul,Beylikdüzü,,40.982,28.640\n')
+        same = [_make_listing(self.realtor, address=a, latitude=None, longitude=None)
+                for a in ('Cumhuriyet Mah.', 'CUMHURİYET MAHALLESİ', 'Cumhuriyet Mh.')]
+        district = _make_listing(self.realtor, address='Kavaklı Mh.', state='Beylikdüzü', latitude=None, longitude=None)
+        unknown = _make_listing(self.realtor, address='Yakuplu Mh.', state='Tuzla', latitude=None, longitude=None)
+
+        worker = geocoding.GeocodeWorker(geocoding.get_provider('gazetteer', path=path))
+        with CaptureQueriesContext(connection) as ctx:
+            counts = worker.run_batch()
+        self.assertEqual((counts[GeocodeTask.DONE], counts[GeocodeTask.NOT_FOUND]), (4, 1))
+        self.assertEqual(sum(q['sql'].startswith('UPDATE "listings_listing"') for q in ctx.captured_queries), 1)
+        self.assertEqual({Listing.objects.get(pk=l.pk).latitude for l in same}, {41.031})
+        self.assertEqual(Listing.objects.get(pk=district.pk).longitude, 28.640)
+        self.assertIsNone(Listing.objects.get(pk=unknown.pk).latitude)
+        self.assertFalse(GeocodeCache.objects.exists())
+        with self.assertRaises(ValueError):
+            geocoding.get_provider('google')
+        with self.assertRaisesMessage(CommandError, '--gazetteer PATH'):
+            call_command('geocode_missing_listings', '--provider', 'gazetteer', stdout=io.StringIO())
+
+    def test_bulk_import_queues_new_listings(self):
+        rows = [dict(title=f'Flat {n}', address='Street', city='Istanbul', price=n, bedrooms=2, bathrooms=1, sqft=90)
+                for n in range(3)]
+        sync.ListingSyncer(self.realtor, bulk_create=True).sync(rows)
+        self.assertEqual(GeocodeTask.objects.filter(status=GeocodeTask.PENDING).count(), 3)
+        GeocodeTask.objects.update(status=GeocodeTask.DONE)
+        Listing.objects.filter(title='Flat 0').update(city='Ankara')
+        self.assertEqual(geocoding.enqueue_many(Listing.objects.values_list('pk', flat=True)), 3)
+
+
+class ParsingTests(TestCase):
+    FIXTURES = os.path.join(os.path.dirname(__file__), 'fetches')
+
+    def test_scalar_parsers(self):
+        self.assertEqual(parsing.parse_tr_date('19 KASIM 2025').date().isoformat(), '2025-11-19')
+        self.assertEqual(parsing.parse_tr_date('1 Şubat 2024').month, 2)
+        self.assertIsNone(parsing.parse_tr_date('31 Şubat 2024'))
+        self.assertEqual(parsing.parse_deal_and_type('SATILIK Villa'), ('satis', 'Villa'))
+        self.assertEqual(parsing.parse_bedrooms_from_oda_sayisi('3+1'), 3)
+        self.assertEqual(parsing.clean_int_from_text('15.500 TL'), 15500)
+        self.assertEqual(parsing.extract_lat_lon_from_url('https://maps.google.com/?q=41.02,28.64'), (41.02, 28.64))
+        self.assertIs(parsing.parse_bool_text('HAYIR'), False)
+
+    def _fixture_html(self):
+        name = sorted(f for f in os.listdir(self.FIXTURES) if f.endswith('.html'))[0]
+        with open(os.path.join(self.FIXTURES, name), encoding='utf-8') as f:
+            return f.read()
+
+    def test_fixture_page_and_batch_api(self):
+        raw = page_parsers.get_page_parser('bs4').parse(self._fixture_html(), 'u')
+        fields = parsing.listing_fields(raw)
+        self.assertEqual(fields['external_id'], '1284029407')
+        self.assertEqual((fields['deal_type'], fields['property_type']), ('kiralik', 'Daire'))
+        self.assertEqual((fields['city'], fields['state'], fields['address']), ('İstanbul', 'Esenyurt', 'Piri Reis Mh.'))
+        self.assertEqual((fields['price'], fields['bedrooms'], fields['maintenance_fee']), (15500, 1, 1500))
+        self.assertIn('latitude', fields)
+
+        rows = [dict(raw, price_text=f'{n} TL') for n in range(5)]
+        self.assertEqual(parsing.parse_listings(rows), [parsing.listing_fields(r) for r in rows])
+
+    def _assert_agrees_with_bs4(self, name):
+        html = self._fixture_html()
+        expected = page_parsers.get_page_parser('bs4').parse(html, 'u')
+        self.assertEqual(len(expected['details']), 23)
+        self.assertEqual(page_parsers.get_page_parser(name).parse(html, 'u'), expected)
+
+    @skipUnless(page_parsers.lxml_html is not None, 'lxml is not installed (see requirements.txt)')
+    def test_lxml_agrees_with_bs4(self):
+        self._assert_agrees_with_bs4('lxml')
+
+    @skipUnless(page_parsers.SelectolaxHTMLParser is not None, 'selectolax is not installed (see requirements.txt)')
+    def test_selectolax_agrees_with_bs4(self):
+        self._assert_agrees_with_bs4('selectolax')
+        self.assertEqual(page_parsers.get_page_parser('auto').name, 'selectolax')
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            page_parsers.get_page_parser('html5lib')
+
+
+class ImportListingsFromLinksTests(ListingTestCase):
+    def setUp(self):
+        super().setUp()
+        name = sorted(f for f in os.listdir(ParsingTests.FIXTURES) if f.endswith('.html'))[0]
+        with open(os.path.join(ParsingTests.FIXTURES, name), 'rb') as f:
+            page = f.read()
+        self.hits = []
+        self.status = {'/busy': 503, '/gone': 404}
+        hits, statuses = self.hits, self.status
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                hits.append(self.path)
+                status = statuses.get(self.path, 200)
+                body = page if status == 200 else b''
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{self.server.server_port}'
+        self.tmp = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.tmp, 'links.csv')
+        with open(self.csv_path, 'w') as f:
+            f.write(f'url\n{base}/ilan/daire-1284029407/detay\n{base}/busy\n{base}/gone\n')
+        dirs = self.settings(LISTING_IMPORT_RUNS_DIR=os.path.join(self.tmp, 'runs'),
+                             LISTING_FETCH_CACHE_DIR=os.path.join(self.tmp, 'cache'))
+        dirs.enable()
+        self.addCleanup(dirs.disable)
+
+    def tearDown(self):
+        self.server.shutdown()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _import(self, *args):
+        out = io.StringIO()
+        call_command('import_listings_from_links', self.csv_path, '--realtor-id', str(self.realtor.pk),
+                     '--delay', '0', '--retries', '0', '--parse-workers', '0', *args, stdout=out)
+        return out.getvalue()
+
+    def test_fetches_concurrently_parses_in_worker_process_and_syncs(self):
+        out = io.StringIO()
+        call_command('import_listings_from_links', self.csv_path, '--realtor-id', str(self.realtor.pk),
+                     '--delay', '0', '--retries', '1', '--cooldown', '0.01', '--parse-workers', '1',
+                     '--parser', 'bs4', stdout=out)
+        listing = Listing.objects.get(external_id='1284029407')
+        self.assertTrue(listing.original_url.endswith('/ilan/daire-1284029407/detay'))
+        self.assertEqual(self.hits.count('/busy'), 2)
+        self.assertEqual(self.hits.count('/gone'), 1)
+        self.assertIn('Created=1, updated=0, unchanged=0, skipped=2, total=3', out.getvalue())
+        self.assertIn('HTTP 503', out.getvalue())
+
+    def test_resume_skips_imported_urls_and_cache_avoids_refetching(self):
+        first = self._import('--cache')
+        run_id = first.split()[1].rstrip(':')
+        self.assertIn('skipped=2, total=3', first)
+        self.hits.clear()
+        self.status['/gone'] = 200
+
+        second = self._import('--resume', run_id)
+        self.assertIn(f'Run {run_id}: 1 of 3 URL(s) already done', second)
+        self.assertEqual(sorted(self.hits), ['/busy', '/gone'])
+        self.assertIn('unchanged=1, skipped=1, total=2', second)
+
+        journal = checkpoints.ImportJournal.resume(run_id)
+        self.assertEqual([urlsplit(u).path for u in journal.pending(journal.states)], ['/busy'])
+        self.assertEqual(journal.counts, {'created': 1, 'unchanged': 1, 'skipped': 1})
+        journal.close()
+
+        self.hits.clear()
+        self._import('--cache', '--dry-run')
+        self.assertNotIn('/ilan/daire-1284029407/detay', self.hits)
+
+    def test_fetch_cache_expires_entries_after_ttl(self):
+        fetch_cache = checkpoints.FetchCache(os.path.join(self.tmp, 'ttl'), ttl=60)
+        self.assertIsNone(fetch_cache.get('https://a.example/1'))
+        fetch_cache.put('https://a.example/1', '<h1>İlan</h1>')
+        self.assertEqual(fetch_cache.get('https://a.example/1'), '<h1>İlan</h1>')
+        old = time.time() - 120
+        os.utime(fetch_cache.path('https://a.example/1'), (old, old))
+        self.assertIsNone(fetch_cache.get('https://a.example/1'))
+        self.assertEqual((fetch_cache.hits, fetch_cache.misses), (1, 2))
+
+
+class ImportJobLogTests(TransactionTestCase):
+    def setUp(self):
+        realtor = Realtor.objects.create(name='Agent', phone='0', email='a@example.com')
+        self.job = ListingImportJob.objects.create(realtor=realtor, single_url='https://example.com/1')
+
+    def test_stream_batches_lines_into_log_table(self):
+        stream = DBLogStream(self.job.pk, interval=60, max_lines=100)
+        for i in range(250):
+            stream.write(f'line {i}\n')
+        stream.write('partial')
+        deadline = time.monotonic() + 5
+        # The size threshold flushes without waiting for the interval.
+        while ListingImportJobLogLine.objects.filter(job=self.job).count() < 200 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertGreaterEqual(ListingImportJobLogLine.objects.filter(job=self.job).count(), 200)
+        stream.close()
+        texts = list(self.job.log_lines.values_list('text', flat=True))
+        self.assertEqual(texts, [f'line {i}' for i in range(250)] + ['partial'])
+        self.assertEqual(self.job.log_text(tail=2), 'line 249\npartial')
+
+    def test_admin_tail_endpoint_returns_lines_after_cursor(self):
+        ListingImportJobLogLine.objects.bulk_create(
+            [ListingImportJobLogLine(job=self.job, text=t) for t in ('one', 'two', 'three')]
+        )
+        first = self.job.log_lines.first().pk
+        admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(admin)
+        url = reverse('admin:listings_listingimportjob_log', args=[self.job.pk])
+        data = self.client.get(url, {'after': first}).json()
+        self.assertEqual(data['lines'], ['two', 'three'])
+        self.assertFalse(data['finished'])
+        self.assertEqual(self.client.get(url, {'after': data['last']}).json()['lines'], [])
+        page = self.client.get(reverse('admin:listings_listingimportjob_change', args=[self.job.pk]))
+        self.assertContains(page, 'id="import-job-log"')
+        self.assertContains(page, 'one\ntwo\nthree')
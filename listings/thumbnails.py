@@ -0,0 +1,184 @@
+"""Pre-generated easy-thumbnails renditions of listing photos.
+
+The listing templates render ``{% thumbnail im.image 'card' %}`` and the
+other THUMBNAIL_ALIASES; a rendition that does not exist yet is resized
+inside the request. ``ThumbnailPool`` produces every alias of a photo
+ahead of time in worker processes. Workers only run Pillow and write the
+files; the parent records each rendition in easy-thumbnails' Source and
+Thumbnail tables, which it consults instead of the filesystem for
+non-local storages.
+
+Saved ListingImages are scheduled after commit (``schedule``) on one
+background thread per process, unless LISTING_THUMBNAIL_WORKERS asks for
+worker processes; the ``generate_thumbnails`` command backfills the whole
+library with its own process pool. Renditions are keyed by blob name, so
+a photo shared by several listings is resized once.
+"""
+
+from __future__ import annotations
+
+import atexit
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import connection
+
+from .storage import get_listing_image_storage
+
+# Aliases defined for ListingImage.image include the project-wide ones.
+ALIAS_TARGET = 'listings.ListingImage.image'
+
+# (alias, thumbnail name, width, height)
+Rendition = Tuple[str, str, int, int]
+
+
+def alias_options() -> Dict[str, dict]:
+    from easy_thumbnails.alias import aliases
+    return aliases.all(ALIAS_TARGET)
+
+
+def _thumbnailer(name: str):
+    from easy_thumbnails.files import get_thumbnailer
+    return get_thumbnailer(get_listing_image_storage(), relative_name=name)
+
+
+def missing_aliases(name: str) -> List[str]:
+    """Aliases of blob ``name`` without an up-to-date rendition."""
+    thumbnailer = _thumbnailer(name)
+    return [alias for alias, options in alias_options().items()
+            if not thumbnailer.get_existing_thumbnail(options)]
+
+
+def render(name: str, aliases: Sequence[str]) -> Tuple[str, List[Rendition], str]:
+    """Write the renditions ``aliases`` of blob ``name``; runs in the workers.
+
+    Returns ``(name, renditions written, error message)``; no database access.
+    """
+    thumbnailer = _thumbnailer(name)
+    options = alias_options()
+    storage = thumbnailer.thumbnail_storage
+    written: List[Rendition] = []
+    try:
+        for alias in aliases:
+            thumbnail = thumbnailer.generate_thumbnail(options[alias])
+            # Replace in place; FileSystemStorage would pick a new name otherwise.
+            if storage.exists(thumbnail.name):
+                storage.delete(thumbnail.name)
+            storage.save(thumbnail.name, thumbnail)
+            written.append((alias, thumbnail.name, thumbnail.width, thumbnail.height))
+    except Exception as e:
+        return name, written, f"{type(e).__name__}: {e}"
+    return name, written, ''
+
+
+def record(name: str, renditions: Iterable[Rendition]) -> None:
+    """Register written renditions the way ``Thumbnailer.save_thumbnail`` does."""
+    from easy_thumbnails.conf import settings as thumbnail_settings
+    from easy_thumbnails.models import ThumbnailDimensions
+
+    thumbnailer = _thumbnailer(name)
+    for _alias, thumb_name, width, height in renditions:
+        cached = thumbnailer.get_thumbnail_cache(thumb_name, create=True, update=True)
+        if thumbnail_settings.THUMBNAIL_CACHE_DIMENSIONS and cached is not None:
+            ThumbnailDimensions.objects.update_or_create(
+                thumbnail=cached, defaults={'width': width, 'height': height},
+            )
+
+
+def _init_worker(media_root: str) -> None:
+    # spawn starts from scratch: load Django, and write where the parent does.
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coralcity.settings')
+    import django
+    django.setup()
+    settings.MEDIA_ROOT = media_root
+
+
+def default_workers() -> int:
+    return max(0, min(4, (os.cpu_count() or 1) - 1))
+
+
+class ThumbnailPool:
+    """``render`` in ``workers`` processes, or in one background thread when 0."""
+
+    def __init__(self, workers: int = 0):
+        self.workers = max(0, int(workers))
+        if self.workers:
+            # spawn: callers are threaded (web workers, importer pools), and
+            # forking a threaded process is unsafe.
+            self._executor: Executor = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker, initargs=(str(settings.MEDIA_ROOT),),
+            )
+        else:
+            self._executor = ThreadPoolExecutor(1, thread_name_prefix='thumbnails')
+
+    def submit(self, name: str, aliases: Optional[Sequence[str]] = None) -> Future:
+        return self._executor.submit(render, name, list(alias_options() if aliases is None else aliases))
+
+    def close(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def __enter__(self) -> 'ThumbnailPool':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+_pool: Optional[ThumbnailPool] = None
+_pool_lock = threading.Lock()
+
+
+def _shared_pool() -> ThumbnailPool:
+    # A thread unless configured otherwise: web workers and importers should
+    # not each carry a pool of Django processes.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThumbnailPool(getattr(settings, 'LISTING_THUMBNAIL_WORKERS', 0))
+            atexit.register(_close_shared_pool)
+        return _pool
+
+
+def _close_shared_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close(wait=False)
+            _pool = None
+
+
+def _record_result(future: Future, caller: int) -> None:
+    try:
+        name, renditions, _error = future.result()
+        record(name, renditions)
+    except Exception:
+        # A missing rendition is generated on render; nothing to recover here.
+        return
+    finally:
+        # Runs in the pool's thread, unless the future was already done.
+        if threading.get_ident() != caller:
+            connection.close()
+
+
+def schedule(names: Iterable[str]) -> List[Future]:
+    """Generate the missing renditions of each blob in the shared pool.
+
+    Called after commit for saved ListingImages; returns the futures.
+    """
+    futures = []
+    for name in dict.fromkeys(n for n in names if n):
+        try:
+            aliases = missing_aliases(name)
+        except Exception:
+            continue
+        if aliases:
+            future = _shared_pool().submit(name, aliases)
+            future.add_done_callback(functools.partial(_record_result, caller=threading.get_ident()))
+            futures.append(future)
+    return futures
@@ -9,5 +9,6 @@ urlpatterns = [
     path('search/',views.search , name='search'),
     path('map/', views.map_view, name='map'),
     path('map-data/', views.map_data, name='map_data'),
+    path('map-tiles/<int:z>/<int:x>/<int:y>.json', views.map_tiles, name='map_tiles'),
 
 ]
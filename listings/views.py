@@ -1,15 +1,28 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.conf import settings
+from django.utils.http import parse_etags
+from django.core.serializers.json import DjangoJSONEncoder
 from django.views.decorators.clickjacking import xframe_options_exempt
-import re, json
-from django.templatetags.static import static
+import gzip
+import hashlib
+import logging
+import os
+import json
+from typing import NamedTuple, Optional
 
 from listings.choices import price_choices , bedroom_choices , state_choices, type_choices
 
 from .models import Listing
 
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 # Create your views here
 def index(request):
 	listings = Listing.objects.all().order_by('-list_date').filter(is_published=True)
@@ -37,79 +50,23 @@ def new_properties(request, page=None):
 
 
 def new_listing_detail(request, listing_id):
-        listing = get_object_or_404(Listing, pk=listing_id)
-        # Attempt to embed the pre-generated map HTML directly (without iframe)
-        from django.template.loader import select_template
-        map_embed_html = None
-        try:
-            t = select_template([
-                f'newfrontend/maps/listing_{listing_id}_map_only.html',
-                f'newfrontend/maps/listing_{listing_id}.html',
-            ])
-            raw = t.render({}, request)
-            # Extract <body>...</body> content if present to avoid nested HTML tags
-            low = raw.lower()
-            b0 = low.find('<body')
-            if b0 != -1:
-                # find end of <body ...>
-                b_tag_end = low.find('>', b0)
-                b1 = b_tag_end + 1 if b_tag_end != -1 else b0
-                b2 = low.rfind('</body>')
-                if b2 != -1 and b2 > b1:
-                    snippet = raw[b1:b2]
-                else:
-                    snippet = raw
-            else:
-                snippet = raw
-
-            # Inject Leaflet CSS so body-only map HTML renders correctly when inlined
-            leaflet_css_url = static('newfront/vendor/leaflet/leaflet.css')
-            leaflet_js_url = static('newfront/vendor/leaflet/leaflet.js')
-            inject_css = """
-    <link rel=\"stylesheet\" href=\"{leaflet_css_url}\">
-    <style>
-      .map-guide-toggle { position:absolute; left:10px; bottom:10px; z-index:1001; border:0; padding:8px 10px; border-radius:9999px; background:#fff; color:#111827; box-shadow:0 2px 10px rgba(0,0,0,.15); cursor:pointer; font-size:12px; }
-      .map-guide-toggle:hover { background:#f3f4f6; }
-      .map-guide-panel { position:absolute; left:10px; bottom:56px; z-index:1001; background:#fff; border-radius:10px; padding:10px 12px; box-shadow:0 8px 24px rgba(0,0,0,.15); max-width:280px; display:none; }
-      .map-guide-row { display:flex; align-items:center; gap:8px; margin:6px 0; font-size:13px; color:#111827; }
-      .map-guide-dot { width:10px; height:10px; border-radius:50%; flex:0 0 auto; }
-    </style>
-    """
-            # Ensure Leaflet JS exists when inlining map-only snippets
-            inject_js = """
-    <script src=\"{leaflet_js_url}\" onerror=\"window.__leafletLocalFailed=true\"></script>
-    <script>if(!window.L){{document.write('<script src=\\'https://unpkg.com/leaflet@1.9.4/dist/leaflet.js\\'>\\x3C/script>');}}</script>
-    <script>(function(){
-      function ready(fn){ if(document.readyState!=='loading'){ fn(); } else { document.addEventListener('DOMContentLoaded', fn); } }
-      ready(function(){
-        try{
-          var mapEl = document.getElementById('map');
-          if(!mapEl) return; if(mapEl.querySelector('.map-guide-toggle')) return;
-          mapEl.style.position = mapEl.style.position || 'relative';
-          var btn = document.createElement('button'); btn.type='button'; btn.className='map-guide-toggle'; btn.textContent='Map guide';
-          var panel = document.createElement('div'); panel.className='map-guide-panel';
-          panel.innerHTML = [
-            '<div class="map-guide-row"><span class="map-guide-dot" style="background:#1d4ed8"></span> Listing location</div>',
-            '<div class="map-guide-row"><span class="map-guide-dot" style="background:#dc2626"></span> Metrobus stop</div>',
-            '<div class="map-guide-row"><span class="map-guide-dot" style="background:#16a34a"></span> Bus stop</div>',
-            '<div class="map-guide-row"><span class="map-guide-dot" style="background:#f59e0b"></span> Grocery</div>',
-            '<div class="map-guide-row"><span class="map-guide-dot" style="background:#8b5cf6"></span> Clothing store</div>',
-            '<div class="map-guide-row"><span class="map-guide-dot" style="background:#0ea5e9"></span> Taxi stand</div>',
-            '<div class="map-guide-row"><span class="map-guide-dot" style="background:#6b7280"></span> Minibus line</div>',
-            '<div class="map-guide-row"><span class="map-guide-dot" style="background:#22c55e"></span> Bicycle path</div>'
-          ].join('');
-          btn.addEventListener('click', function(){ panel.style.display = (panel.style.display==='none'||!panel.style.display) ? 'block' : 'none'; });
-          panel.style.display='none';
-          mapEl.appendChild(btn); mapEl.appendChild(panel);
-        }catch(e){}
-      });
-    })();</script>
+    """Listing detail page with the pre-generated map inlined (no iframe).
+
+    The map's <body> snippet is extracted once per map file version, and
+    the template caches its gallery, details and map blocks per listing
+    (see ``listings.fragments``).
     """
-            map_embed_html = snippet
-        except Exception:
-            map_embed_html = None
+    from . import fragments
+    from .map_files import get_body_snippet
 
-        return render(request, 'newfrontend/property-details.html', {'listing': listing, 'map_embed_html': map_embed_html})
+    listing = get_object_or_404(Listing, pk=listing_id)
+    map_embed_html, map_version = get_body_snippet(listing_id)
+    return render(request, 'newfrontend/property-details.html', {
+        'listing': listing,
+        'map_embed_html': map_embed_html,
+        'map_version': int(map_version),
+        'fragment_timeout': fragments.fragment_timeout(),
+    })
 
 
 def new_property_details_preview(request):
@@ -212,21 +169,22 @@ def map_view(request):
     return render(request, 'listings/map.html')
 
 
-def map_data(request):
-    # Get initial queryset and check total count
-    qs = Listing.objects.filter(is_published=True)
-    initial_count = qs.count()
-    print(f"Initial published listings count: {initial_count}")
+def _valid_coord(lat, lng):
+    try:
+        latf = float(lat)
+        lngf = float(lng)
+    except (TypeError, ValueError):
+        return False
+    if not (-90.0 <= latf <= 90.0 and -180.0 <= lngf <= 180.0):
+        return False
+    # Heuristic: skip obviously placeholder zeros
+    if latf == 0.0 and lngf == 0.0:
+        return False
+    return True
 
-    # Check how many have coordinates
-    has_coords = qs.exclude(latitude__isnull=True).exclude(longitude__isnull=True).count()
-    print(f"Listings with coordinates: {has_coords}")
 
-    # Print a sample of listings to check coordinate values
-    sample = qs[:5]
-    print("\nSample listings:")
-    for listing in sample:
-        print(f"ID: {listing.id}, Title: {listing.title}, Lat: {listing.latitude}, Lng: {listing.longitude}")
+def _map_data_queryset(request):
+    qs = Listing.objects.filter(is_published=True)
 
     # Optional filters to mirror search behavior
     keywords = request.GET.get('keywords')
@@ -250,29 +208,160 @@ def map_data(request):
         qs = qs.filter(price__lte=price)
 
     # Filter for listings with non-null coordinates (further validated below)
-    qs = qs.exclude(latitude__isnull=True).exclude(longitude__isnull=True)
-    final_count = qs.count()
-    print(f"\nFinal filtered listings count: {final_count}")
-
-    def _valid_coord(lat, lng):
-        try:
-            latf = float(lat)
-            lngf = float(lng)
-        except (TypeError, ValueError):
-            return False
-        if not (-90.0 <= latf <= 90.0 and -180.0 <= lngf <= 180.0):
-            return False
-        # Heuristic: skip obviously placeholder zeros
-        if latf == 0.0 and lngf == 0.0:
-            return False
-        return True
-
-    features = []
+    return qs.exclude(latitude__isnull=True).exclude(longitude__isnull=True)
+
+
+def _photo_urls_by_listing(listing_qs):
+    """All photo URLs per listing id (gallery order), in a single query."""
+    from .models import ListingImage
+    storage = ListingImage._meta.get_field('image').storage
+    photos = {}
+    rows = (
+        ListingImage.objects
+        .filter(listing_id__in=listing_qs.values('id'))
+        .order_by('listing_id', 'order', 'id')
+        .values_list('listing_id', 'image')
+    )
+    for listing_id, name in rows:
+        if name:
+            photos.setdefault(listing_id, []).append(storage.url(name))
+    return photos
+
+
+def iter_map_geojson(qs):
+    """Encode the map FeatureCollection for ``qs`` chunk by chunk.
+
+    The output is byte-for-byte what ``JsonResponse`` produced for the
+    equivalent dict, so the distilled ``listings/map-data/`` file keeps
+    the same format.
+    """
+    encoder = DjangoJSONEncoder()
+    rows = qs.values(
+        'id', 'title', 'price', 'bedrooms', 'bathrooms', 'city', 'state', 'address',
+        'latitude', 'longitude',
+    )
+    photos_by_listing = _photo_urls_by_listing(qs)
+
+    yield '{"type": "FeatureCollection", "features": ['
+    served = 0
     skipped_invalid = 0
-    for obj in qs:
-        if not _valid_coord(obj.latitude, obj.longitude):
+    for row in rows:
+        if not _valid_coord(row['latitude'], row['longitude']):
             skipped_invalid += 1
             continue
+        properties = {
+            "id": row['id'],
+            "title": row['title'],
+            "price": row['price'],
+            "bedrooms": row['bedrooms'],
+            "bathrooms": row['bathrooms'],
+            "city": row['city'],
+            "state": row['state'],
+            "address": row['address'],
+            "url": f"/listings/{row['id']}/",
+        }
+        photos = photos_by_listing.get(row['id'])
+        if photos:
+            properties["photos"] = photos
+            # Keep legacy single photo key for backward-compat
+            properties["photo_url"] = photos[0]
+        feature = {
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [float(row['longitude']), float(row['latitude'])],
+            },
+            "properties": properties,
+        }
+        yield (', ' if served else '') + encoder.encode(feature)
+        served += 1
+    yield ']'
+    if skipped_invalid:
+        yield f', "skipped_invalid": {skipped_invalid}'
+    yield '}'
+    logger.info(
+        "map_data served",
+        extra={"features": served, "skipped_invalid": skipped_invalid},
+    )
+
+
+def map_data(request):
+    """Published listings with coordinates as a streamed GeoJSON FeatureCollection."""
+    return StreamingHttpResponse(
+        iter_map_geojson(_map_data_queryset(request)), content_type='application/json',
+    )
+
+
+def map_data_static(request):
+    """Buffered ``map_data`` for static builds; django-distill reads ``.content``."""
+    return HttpResponse(
+        ''.join(iter_map_geojson(_map_data_queryset(request))), content_type='application/json',
+    )
+
+
+def map_tiles(request, z: int, x: int, y: int):
+    """Pre-clustered GeoJSON for one slippy-map tile of published listings.
+
+    Up to LISTING_MAP_CLUSTER_MAX_ZOOM every feature is an aggregate
+    (count, weighted centroid, price range); deeper zooms return the
+    individual listings with the same properties as ``map_data``.
+    """
+    from .clustering import get_cluster_index, unproject
+
+    if not (0 <= z <= 22 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return JsonResponse({"error": "tile out of range"}, status=404)
+
+    index = get_cluster_index()
+    level_zoom, members = index.tile(z, x, y)
+    level = index.levels[level_zoom]
+    lats, lngs = unproject(level.x[members], level.y[members])
+
+    features = []
+    if z > index.max_zoom:
+        ids = [int(pk) for pk in level.listing_id[members]]
+        rows = _map_feature_rows(Listing.objects.filter(pk__in=ids))
+        for i, pk in enumerate(ids):
+            properties = rows.get(pk)
+            if properties is None:
+                continue
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [float(lngs[i]), float(lats[i])]},
+                "properties": properties,
+            })
+    else:
+        for i, idx in enumerate(members):
+            count = int(level.count[idx])
+            properties = {
+                "cluster": count > 1,
+                "cluster_id": f"{level_zoom}:{int(idx)}",
+                "point_count": count,
+                "price_min": int(level.price_min[idx]),
+                "price_max": int(level.price_max[idx]),
+            }
+            if count > 1:
+                properties["expansion_zoom"] = index.expansion_zoom(level_zoom, int(idx))
+            else:
+                properties["id"] = int(level.listing_id[idx])
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [float(lngs[i]), float(lats[i])]},
+                "properties": properties,
+            })
+
+    return JsonResponse({"type": "FeatureCollection", "zoom": z, "features": features})
+
+
+def _map_feature_rows(qs):
+    """Popup properties (with photo URLs) for the listings in ``qs``, keyed by id."""
+    from .models import ListingImage
+    from django.db.models import Prefetch
+
+    qs = qs.prefetch_related(
+        Prefetch('images', queryset=ListingImage.objects.order_by('order', 'id'), to_attr='map_images')
+    )
+    rows = {}
+    for obj in qs:
         properties = {
             "id": obj.id,
             "title": obj.title,
@@ -284,35 +373,12 @@ def map_data(request):
             "address": obj.address,
             "url": f"/listings/{obj.id}/",
         }
-        # Collect available photos for swipeable gallery in popup from related images
-        photos = []
-        try:
-            for img in obj.images.order_by('order', 'id'):
-                if getattr(img, 'image', None):
-                    photos.append(img.image.url)
-        except Exception:
-            pass
+        photos = [img.image.url for img in obj.map_images if img.image]
         if photos:
             properties["photos"] = photos
-            # Keep legacy single photo key for backward-compat
             properties["photo_url"] = photos[0]
-
-        features.append({
-            "type": "Feature",
-            "geometry": {
-                "type": "Point",
-                "coordinates": [float(obj.longitude), float(obj.latitude)],
-            },
-            "properties": properties,
-        })
-
-    resp = {
-        "type": "FeatureCollection",
-        "features": features,
-    }
-    if skipped_invalid:
-        resp["skipped_invalid"] = skipped_invalid
-    return JsonResponse(resp)
+        rows[obj.id] = properties
+    return rows
 
 
 def new_map_view(request):
@@ -325,39 +391,10 @@ def new_map_view_copy(request):
 	return render(request, 'newfrontend/map_copy.html')
 
 
-@xframe_options_exempt
-def listing_map_embed(request, listing_id: int):
-    """Render the pre-generated Leaflet map HTML for a specific listing.
-
-    - Loads newfrontend/maps/listing_<id>.html (or _map_only fallback)
-    - Injects enhancement styles and a light info panel fed by DATA
-    - Returns full HTML in an iframe-safe response
-    """
-    from django.template.loader import select_template
-    print(f"[map-embed] Incoming request: listing_id={listing_id}")
-    try:
-        template = select_template([
-            f'newfrontend/maps/listing_{listing_id}.html',
-            f'newfrontend/maps/listing_{listing_id}_map_only.html',
-        ])
-    except Exception:
-        print(f"[map-embed] No template found for listing_id={listing_id}")
-        return render(request, 'newfrontend/page-404.html', status=404)
-    # Try to log selected template name for visibility
-    try:
-        tname = getattr(template, 'template', None)
-        tname = getattr(tname, 'name', None) or getattr(template, 'name', 'unknown')
-    except Exception:
-        tname = 'unknown'
-    print(f"[map-embed] Using template: {tname}")
-
-    html = template.render({}, request)
-    print(f"[map-embed] Rendered HTML length: {len(html)} bytes")
-    has_data_literal = ('const DATA' in html) or ('window.DATA' in html)
-    print(f"[map-embed] DATA present in HTML: {has_data_literal}")
-
-    # Enhancement CSS from user (scoped to iframe)
-    css = r"""
+# Enhancements spliced into every pre-generated map page served by
+# listing_map_embed: styles for the info panel and map guide, a panel fed
+# by the page's DATA object, and a bottom-left map legend.
+_EMBED_CSS = r"""
     /* injected-map-enhancements */
     /* Info Panel */
     .info-panel { position:absolute; top:10px; right:10px; z-index:1000; max-height:80vh; overflow-y:auto; background:#fff; border-radius:.75rem; box-shadow:0 10px 15px -3px rgba(0,0,0,.1),0 4px 6px -2px rgba(0,0,0,.05); min-width:300px; max-width:400px; opacity:0; visibility:hidden; transition:opacity .3s ease, visibility .3s ease; }
@@ -392,8 +429,7 @@ def listing_map_embed(request, listing_id: int):
     .map-guide-dot { width:10px; height:10px; border-radius:50%; flex:0 0 auto; }
     """
 
-    # Lightweight panel builder that uses DATA from the map HTML if present
-    script = r"""
+_EMBED_SCRIPT = r"""
     <script id="injected-map-enhancements">(function(){
       try{
         var DATA = window.DATA || null;
@@ -491,8 +527,7 @@ def listing_map_embed(request, listing_id: int):
     })();</script>
     """
 
-    # Small helper to add a bottom-left Map Guide legend with a toggle button
-    guide_script = r"""
+_EMBED_GUIDE_SCRIPT = r"""
     <script id="injected-map-guide">(function(){
       function ready(fn){ if(document.readyState!=='loading'){ fn(); } else { document.addEventListener('DOMContentLoaded', fn); } }
       ready(function(){
@@ -523,77 +558,158 @@ def listing_map_embed(request, listing_id: int):
     })();</script>
     """
 
-    # Insert CSS before </head> and script before </body>
-    head_injected = False
-    body_injected = False
+
+def _inject_map_enhancements(html: str):
+    """Splice the embed CSS before ``</head>`` and the scripts before ``</body>``.
+
+    Returns (html, head_injected, body_injected).
+    """
+    style = f'<style>{_EMBED_CSS}</style>'
+    scripts = _EMBED_SCRIPT + _EMBED_GUIDE_SCRIPT
     lower_html = html.lower()
-    # Inject CSS before closing head (case-insensitive)
     head_idx = lower_html.rfind('</head>')
-    if head_idx != -1:
-        html = html[:head_idx] + f'<style>{css}</style>' + html[head_idx:]
-        head_injected = True
-    else:
-        html = f'<!-- no </head>; prepended CSS -->\n<style>{css}</style>' + html
-    # Inject script before closing body (fallback to before </html>)
-    lower_html = html.lower()
     body_idx = lower_html.rfind('</body>')
+    html_idx = lower_html.rfind('</html>')
+
     if body_idx != -1:
-        html = html[:body_idx] + script + guide_script + html[body_idx:]
-        body_injected = True
+        html = html[:body_idx] + scripts + html[body_idx:]
+    elif html_idx != -1:
+        html = html[:html_idx] + scripts + html[html_idx:]
+    else:
+        html = html + scripts + '\n<!-- no </body> or </html>; appended script -->'
+    # The head precedes the scripts, so inserting there last keeps head_idx valid.
+    if head_idx != -1:
+        html = html[:head_idx] + style + html[head_idx:]
     else:
-        html_lower2 = html.lower()
-        html_idx = html_lower2.rfind('</html>')
-        if html_idx != -1:
-            html = html[:html_idx] + script + guide_script + html[html_idx:]
-        else:
-            html = html + script + guide_script + '\n<!-- no </body> or </html>; appended script -->'
-    print(f"[map-embed] Injected CSS into head: {head_injected}; Injected script into body: {body_injected}")
-
-    response = HttpResponse(html)
+        html = f'<!-- no </head>; prepended CSS -->\n<style>{_EMBED_CSS}</style>' + html
+    return html, head_idx != -1, body_idx != -1
+
+
+class _MapEmbed(NamedTuple):
+    identity: bytes
+    gzip: bytes
+    br: Optional[bytes]
+    etag: str
+    template: str
+    injected: str
+
+
+def _build_map_embed(path: str) -> _MapEmbed:
+    from .map_files import etag_for, read_text
+
+    html, head_injected, body_injected = _inject_map_enhancements(read_text(path))
+    raw = html.encode('utf-8')
+    return _MapEmbed(
+        identity=raw,
+        gzip=gzip.compress(raw, compresslevel=9),
+        br=brotli.compress(raw) if brotli is not None else None,
+        etag=etag_for(raw),
+        template=f'newfrontend/maps/{os.path.basename(path)}',
+        injected=f"head={head_injected},body={body_injected}",
+    )
+
+
+def _accepted_encoding(request, embed: _MapEmbed) -> Optional[str]:
+    accepted = {
+        part.split(';')[0].strip().lower()
+        for part in request.headers.get('Accept-Encoding', '').split(',')
+    }
+    if embed.br is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+@xframe_options_exempt
+def listing_map_embed(request, listing_id: int):
+    """Serve the pre-generated Leaflet map HTML for a specific listing.
+
+    - Uses newfrontend/maps/listing_<id>.html (or the _map_only fallback)
+    - Injects enhancement styles and a light info panel fed by DATA
+    - The injected page is built once per file version and kept
+      pre-compressed (gzip, and brotli when installed) with strong ETags
+    """
+    from .map_files import file_cache, find_map_file
+
+    path = find_map_file(listing_id)
+    embed = file_cache.get(path, 'embed', _build_map_embed) if path else None
+    if embed is None:
+        logger.info("No map template for listing_id=%s", listing_id)
+        return render(request, 'newfrontend/page-404.html', status=404)
+
+    encoding = _accepted_encoding(request, embed)
+    body = {'br': embed.br, 'gzip': embed.gzip}.get(encoding, embed.identity)
+    # Each representation gets its own strong validator.
+    etag = embed.etag if encoding is None else f'{embed.etag[:-1]}-{encoding}"'
+    response = _etag_response(request, body, etag, 'text/html; charset=utf-8')
+    if encoding is not None and response.status_code == 200:
+        response['Content-Encoding'] = encoding
+    response['Vary'] = 'Accept-Encoding'
     # Avoid COOP warnings on non-HTTPS dev origins
     response['Cross-Origin-Opener-Policy'] = 'unsafe-none'
     response['X-Map-Embed'] = 'ok'
-    response['X-Map-Embed-Template'] = str(tname)
-    response['X-Map-Embed-Injected'] = f"head={head_injected},body={body_injected}"
-    print(f"[map-embed] Returning response length: {len(html)} bytes")
+    response['X-Map-Embed-Template'] = embed.template
+    response['X-Map-Embed-Injected'] = embed.injected
     return response
 
 
-def listing_map_data(request, listing_id: int):
-    """Return the DATA object from the pre-generated map HTML as JSON.
+def _etag_response(request, body: bytes, etag: str, content_type: str):
+    """``body`` with a strong ETag, or a bare 304 when the client already has it."""
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type=content_type)
+    response['ETag'] = etag
+    return response
 
-    Allows embedding the map directly in the property details page without an iframe
-    while still reusing the same precomputed amenities distances from the exported files.
-    """
-    from django.template.loader import select_template
-    print(f"[map-data] Incoming request: listing_id={listing_id}")
-    try:
-        template = select_template([
-            f'newfrontend/maps/listing_{listing_id}.html',
-            f'newfrontend/maps/listing_{listing_id}_map_only.html',
-        ])
-    except Exception:
-        print(f"[map-data] No template found for listing_id={listing_id}")
-        return JsonResponse({"error": "map not found"}, status=404)
 
-    html = template.render({}, request)
-    print(f"[map-data] Rendered HTML length: {len(html)} bytes")
+def _listing_map_payload(listing):
+    """Encoded map DATA for a geocoded listing, cached per listing and location."""
+    from django.core.cache import cache
+    from .amenities import get_amenity_engine
+    from .map_files import etag_for
 
-    # Extract JS const DATA = {...}; using a tolerant regex
-    m = re.search(r"const\\s+DATA\\s*=\\s*(\{[\\s\\S]*?\})\\s*;", html)
-    if not m:
-        print("[map-data] DATA object not found in HTML")
-        return JsonResponse({"error": "data not found"}, status=500)
+    head = {
+        'id': str(listing.id),
+        'title': listing.title,
+        'price': listing.price,
+        'lat': listing.latitude,
+        'lng': listing.longitude,
+    }
+    engine = get_amenity_engine()
+    digest = hashlib.md5(json.dumps(head, cls=DjangoJSONEncoder).encode('utf-8')).hexdigest()
+    key = f"listings:map-data:{engine.fingerprint}:{listing.pk}:{digest}"
+    payload = cache.get(key)
+    if payload is None:
+        data = {'listing': head}
+        data.update(engine.nearby(listing.latitude, listing.longitude))
+        body = json.dumps(data, cls=DjangoJSONEncoder).encode('utf-8')
+        payload = (body, etag_for(body))
+        cache.set(key, payload, None)
+    return payload
 
-    data_str = m.group(1)
-    try:
-        data = json.loads(data_str)
-    except Exception as e:
-        print(f"[map-data] Failed to parse DATA JSON: {e}")
-        # As a fallback, attempt to fix trailing commas etc. (minimal)
-        try:
-            data = json.loads(data_str.replace("\n", " "))
-        except Exception:
-            return JsonResponse({"error": "invalid data"}, status=500)
-
-    return JsonResponse(data)
+
+def listing_map_data(request, listing_id: int):
+    """Return the map DATA object (listing plus nearest amenities) as JSON.
+
+    Geocoded listings are answered by the in-process amenity engine
+    (``listings.amenities``); others fall back to the DATA blob of the
+    pre-generated map file, parsed once per file version.
+    """
+    from .map_files import get_map_data
+
+    listing = (
+        Listing.objects.filter(pk=listing_id)
+        .only('id', 'title', 'price', 'latitude', 'longitude')
+        .first()
+    )
+    if listing is not None and listing.latitude is not None and listing.longitude is not None:
+        body, etag = _listing_map_payload(listing)
+        return _etag_response(request, body, etag, 'application/json')
+
+    map_data = get_map_data(listing_id)
+    if map_data is None:
+        logger.info("No map data for listing_id=%s", listing_id)
+        return JsonResponse({"error": "map not found"}, status=404)
+    return _etag_response(request, map_data.body, map_data.etag, 'application/json')
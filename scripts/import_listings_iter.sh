@@ -4,6 +4,10 @@ set -euo pipefail
 # Import listings one-by-one from a CSV by feeding the management command
 # a temporary single-URL CSV each run. This helps when sites block rapid
 # sequential navigation within a single browser session.
+#
+# To pick up an interrupted import, run the command once with
+# --resume <run_id> (printed at the start of every run) instead; it skips
+# the URLs that run already imported without a process per URL.
 
 # Defaults (override via env/flags)
 CSV_PATH=${CSV_PATH:-"listings/links.csv"}